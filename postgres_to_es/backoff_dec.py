@@ -1,43 +1,254 @@
-"""Параметрический декоратор для осуществления паузы между повторными вызовами функции."""
+"""Параметрический декоратор для осуществления паузы между повторными вызовами функции.
 
+Пауза между попытками выбирается случайно (decorrelated jitter): после сбоя ES или PostgreSQL
+клиенты не повторяют вызовы одновременно, а распределяют их во времени. Количество попыток
+и общее время повторов можно ограничить, повторяются только указанные (временные) ошибки.
+Бюджет повторов (RetryBudget) ограничивает частоту повторов всех вызовов, которые его
+разделяют: при длительном сбое лишние повторы не выполняются, а ошибка сразу передаётся
+вызывающему.
+
+Повторы вызовов PostgreSQL и ES в ETL ограничены настройками секции [Retry] файла settings.ini
+(ETL_MAX_ATTEMPTS, ETL_RETRY_DEADLINE) и расходуют общий бюджет etl_retry_budget.
+"""
+
+import asyncio
+import configparser
+import inspect
 import logging
+import random
+import threading
 import time
 from functools import wraps
 
 
-def backoff(start_sleep_time=0.1, factor=2, border_sleep_time=10):
-    """Декоратор для паузы между вызовами одной и той же функции в случае ошибки.
+class RetryBudget:
+    """Бюджет повторов (token bucket): каждый повтор расходует один токен.
+
+    Токены пополняются с постоянной скоростью до ёмкости корзины, поэтому после исчерпания
+    бюджета повторяется не больше refill_rate вызовов в секунду.
+    """
+
+    def __init__(self, capacity=10, refill_rate=1.0):
+        """Инициализация бюджета.
 
-    Использует наивный экспоненциальный рост времени повтора (factor)
-    до граничного времени ожидания (border_sleep_time)
+        Args:
+            capacity: Ёмкость корзины (допустимый всплеск повторов)
+            refill_rate: Скорость пополнения (токенов в секунду)
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_spend(self):
+        """Расходует токен на повтор, если он есть.
+
+        Returns:
+            True, если повтор разрешён
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.refill_rate,
+            )
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def decorrelated_jitter(previous, start_sleep_time, border_sleep_time, factor=3):
+    """Пауза перед следующей попыткой (decorrelated jitter).
 
     Формула:
-        t = start_sleep_time * 2^(n) if t < border_sleep_time
-        t = border_sleep_time if t >= border_sleep_time
+        t = min(border_sleep_time, random(start_sleep_time, previous * factor))
 
     Args:
-        start_sleep_time: начальное время повтора
-        factor: во сколько раз нужно увеличить время ожидания
-        border_sleep_time: граничное время ожидания
+        previous: Предыдущая пауза
+        start_sleep_time: Минимальная пауза
+        border_sleep_time: Граничное время ожидания
+        factor: Во сколько раз пауза может вырасти по сравнению с предыдущей
 
     Returns:
-        Функция-обёртка
+        Пауза в секундах
     """
-    def func_wrapper(func):
+    upper = max(start_sleep_time, previous * factor)
+    return min(border_sleep_time, random.uniform(start_sleep_time, upper))
+
+
+class RetryPolicy:
+    """Политика повторов: паузы, ограничения и классификация ошибок."""
+
+    def __init__(
+        self,
+        start_sleep_time=0.1,
+        factor=3,
+        border_sleep_time=10,
+        max_attempts=None,
+        deadline=None,
+        retry_on=(Exception,),
+        giveup=None,
+        budget=None,
+    ):
+        """Инициализация политики.
+
+        Args:
+            start_sleep_time: Минимальная пауза между попытками
+            factor: Во сколько раз пауза может вырасти по сравнению с предыдущей
+            border_sleep_time: Граничное время ожидания
+            max_attempts: Максимальное количество попыток (None - без ограничения)
+            deadline: Время в секундах, после которого повторы прекращаются (None - без срока)
+            retry_on: Типы ошибок, при которых вызов повторяется
+            giveup: Функция, по ошибке решающая, что повторять вызов бессмысленно
+            budget: Бюджет повторов, общий для нескольких вызовов
+        """
+        self.start_sleep_time = start_sleep_time
+        self.factor = factor
+        self.border_sleep_time = border_sleep_time
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.giveup = giveup
+        self.budget = budget
+
+    def is_retryable(self, err):
+        """Проверяет, временная ли ошибка (есть ли смысл повторять вызов).
+
+        Args:
+            err: Ошибка вызова
+
+        Returns:
+            True, если вызов можно повторить
+        """
+        if not isinstance(err, self.retry_on):
+            return False
+        return self.giveup is None or not self.giveup(err)
+
+    def next_pause(self, err, attempt, previous, started):
+        """Пауза перед следующей попыткой или None, если повторять нельзя.
+
+        Args:
+            err: Ошибка последней попытки
+            attempt: Номер последней попытки (с 1)
+            previous: Предыдущая пауза
+            started: Момент первой попытки (по time.monotonic)
+
+        Returns:
+            Пауза в секундах или None
+        """
+        if not self.is_retryable(err):
+            return None
+        if self.max_attempts is not None and attempt >= self.max_attempts:
+            return None
+        pause = decorrelated_jitter(
+            previous, self.start_sleep_time, self.border_sleep_time, self.factor,
+        )
+        if self.deadline is not None:
+            remaining = self.deadline - (time.monotonic() - started)
+            if pause >= remaining:
+                return None
+        if self.budget is not None and not self.budget.try_spend():
+            logging.warning('Бюджет повторов исчерпан, ошибка не повторяется: %s', err)
+            return None
+        return pause
+
+    def __call__(self, func):
+        """Оборачивает функцию (обычную или корутину) повторами.
+
+        Args:
+            func: Функция
+
+        Returns:
+            Функция-обёртка
+        """
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_inner(*args, **kwargs):
+                attempt, pause, started = 0, self.start_sleep_time, time.monotonic()
+                while True:
+                    attempt += 1
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as err:
+                        pause = self._on_error(func, err, attempt, pause, started)
+                    await asyncio.sleep(pause)
+            return async_inner
+
         @wraps(func)
         def inner(*args, **kwargs):
-            logging.debug('Выполнение функции %s' % func.__name__)
-            pwr = 0
+            logging.debug('Выполнение функции %s', func.__name__)
+            attempt, pause, started = 0, self.start_sleep_time, time.monotonic()
             while True:
+                attempt += 1
                 try:
                     return func(*args, **kwargs)
                 except Exception as err:
-                    logging.warning('Ошибка %s выполнения функции %s' % (err, func.__name__))
-                    pwr += 1
-                    pause = start_sleep_time * factor**pwr
-                    if pause >= border_sleep_time:
-                        pause = border_sleep_time
-                    logging.debug('Пауза до следующего выполнения функции: %s сек' % pause)
-                    time.sleep(pause)
+                    pause = self._on_error(func, err, attempt, pause, started)
+                time.sleep(pause)
         return inner
-    return func_wrapper
+
+    def _on_error(self, func, err, attempt, previous, started):
+        logging.warning('Ошибка %s выполнения функции %s', err, func.__name__)
+        pause = self.next_pause(err, attempt, previous, started)
+        if pause is None:
+            raise err
+        logging.debug('Пауза до следующего выполнения функции: %.3f сек', pause)
+        return pause
+
+
+def backoff(
+    start_sleep_time=0.1,
+    factor=3,
+    border_sleep_time=10,
+    max_attempts=None,
+    deadline=None,
+    retry_on=(Exception,),
+    giveup=None,
+    budget=None,
+):
+    """Декоратор для паузы между вызовами одной и той же функции в случае ошибки.
+
+    Пауза растёт случайно (decorrelated jitter) до граничного времени ожидания
+    (border_sleep_time). Подходит и для обычных функций, и для корутин (пауза через
+    asyncio.sleep). Без ограничений (max_attempts, deadline, budget) вызов повторяется,
+    пока не завершится успешно или ошибкой не из retry_on.
+
+    Args:
+        start_sleep_time: начальное (минимальное) время повтора
+        factor: во сколько раз время ожидания может вырасти по сравнению с предыдущим
+        border_sleep_time: граничное время ожидания
+        max_attempts: максимальное количество попыток
+        deadline: время в секундах, после которого повторы прекращаются
+        retry_on: типы ошибок, при которых вызов повторяется
+        giveup: функция, по ошибке решающая, что повторять вызов бессмысленно
+        budget: бюджет повторов (RetryBudget), общий для нескольких функций
+
+    Returns:
+        Функция-обёртка
+    """
+    return RetryPolicy(
+        start_sleep_time=start_sleep_time,
+        factor=factor,
+        border_sleep_time=border_sleep_time,
+        max_attempts=max_attempts,
+        deadline=deadline,
+        retry_on=retry_on,
+        giveup=giveup,
+        budget=budget,
+    )
+
+
+_config = configparser.ConfigParser()
+_config.read('settings.ini')
+
+# ограничения повторов вызовов PostgreSQL и ES в ETL: после них ошибка передаётся вызывающему
+ETL_MAX_ATTEMPTS = _config.getint('Retry', 'max_attempts', fallback=8)
+ETL_RETRY_DEADLINE = _config.getfloat('Retry', 'deadline', fallback=60)
+# бюджет повторов, общий для всех вызовов PostgreSQL и ES процесса ETL
+etl_retry_budget = RetryBudget(
+    capacity=_config.getint('Retry', 'budget_capacity', fallback=20),
+    refill_rate=_config.getfloat('Retry', 'budget_refill_rate', fallback=1.0),
+)
@@ -0,0 +1,148 @@
+"""Замер задержки запросов top-N к индексу movies до и после профиля для чтения.
+
+Скрипт копирует документы индекса movies (его должен заполнить ETL) в два временных индекса:
+- movies_bench_base - прежняя раскладка: общие настройки, без сортировки индекса;
+- movies_bench_read - профиль для чтения из Load (сортировка по рейтингу, eager ordinals и т.д.),
+после чего выполняет одинаковые запросы популярных фильмов (как в API) и выводит перцентили.
+
+Запуск (переменные окружения ES_HOST и ES_PORT как у ETL):
+    python benchmark.py [--rounds 200] [--size 50]
+"""
+import argparse
+import copy
+import logging
+import os
+import statistics
+import time
+
+from dotenv import find_dotenv, load_dotenv
+from elasticsearch import Elasticsearch
+from load import Load
+
+load_dotenv(find_dotenv())
+
+SOURCE_INDEX = 'movies'
+BASE_INDEX = 'movies_bench_base'
+READ_INDEX = 'movies_bench_read'
+
+
+def base_mappings() -> dict:
+    """Маппинг movies без оптимизаций профиля для чтения.
+
+    Returns:
+        Маппинг индекса
+    """
+    mappings = copy.deepcopy(Load.index_movies_mappings)
+
+    def strip(properties: dict):
+        for field in properties.values():
+            for option in ('eager_global_ordinals', 'norms'):
+                field.pop(option, None)
+            if field.get('type') == 'keyword' and field.get('index', True):
+                field.pop('doc_values', None)
+            strip(field.get('properties', {}))
+
+    strip(mappings['properties'])
+    return mappings
+
+
+def create_copy(es: Elasticsearch, index: str, settings: dict, mappings: dict):
+    """Создаёт индекс и копирует в него документы из movies.
+
+    Args:
+        es: Соединение с ES
+        index: Имя создаваемого индекса
+        settings: Настройки индекса
+        mappings: Маппинг индекса
+    """
+    es.indices.delete(index=index, ignore_unavailable=True)
+    es.indices.create(index=index, settings=settings, mappings=mappings)
+    es.reindex(source={'index': SOURCE_INDEX}, dest={'index': index}, refresh=True)
+    # один сегмент в обоих индексах, чтобы сравнение не зависело от истории записи
+    es.indices.forcemerge(index=index, max_num_segments=1)
+
+
+def measure(
+    es: Elasticsearch, index: str, rounds: int, size: int, genre: str | None,
+) -> list[float]:
+    """Выполняет запрос популярных фильмов rounds раз.
+
+    Args:
+        es: Соединение с ES
+        index: Имя индекса
+        rounds: Количество повторов
+        size: Размер страницы
+        genre: UUID жанра для фильтрации или None
+
+    Returns:
+        Список задержек в миллисекундах
+    """
+    body = {
+        'size': size,
+        'sort': [{'imdb_rating': {'order': 'desc', 'mode': 'max'}}],
+        'track_total_hits': False,
+    }
+    if genre:
+        body['query'] = {'bool': {'filter': [{'term': {'genre_uuids': genre}}]}}
+
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        # кэш запросов отключён, чтобы измерять выполнение запроса, а не чтение из кэша
+        es.search(index=index, request_cache=False, **body)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    """Выводит перцентили задержек.
+
+    Args:
+        name: Название замера
+        latencies: Задержки в миллисекундах
+    """
+    centiles = statistics.quantiles(latencies, n=100)
+    logging.info(
+        '%-40s p50=%.2f ms  p95=%.2f ms  p99=%.2f ms',
+        name,
+        centiles[49],
+        centiles[94],
+        centiles[98],
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--size', type=int, default=50)
+    args = parser.parse_args()
+
+    es = Elasticsearch(
+        'http://{0}:{1}/'.format(os.environ.get('ES_HOST'), os.environ.get('ES_PORT')),
+    )
+
+    create_copy(es, BASE_INDEX, Load.indexes_settings, base_mappings())
+    create_copy(
+        es, READ_INDEX, Load.get_index_settings(SOURCE_INDEX), Load.index_movies_mappings,
+    )
+
+    sample = es.search(index=SOURCE_INDEX, size=1, query={'exists': {'field': 'genre_uuids'}})
+    hits = sample['hits']['hits']
+    genre_uuid = hits[0]['_source']['genre_uuids'][0] if hits else None
+
+    try:
+        for index in (BASE_INDEX, READ_INDEX):
+            measure(es, index, args.rounds // 10 or 1, args.size, None)  # прогрев
+            report(
+                '{0} top-{1}'.format(index, args.size),
+                measure(es, index, args.rounds, args.size, None),
+            )
+            if genre_uuid:
+                report(
+                    '{0} top-{1} genre'.format(index, args.size),
+                    measure(es, index, args.rounds, args.size, genre_uuid),
+                )
+    finally:
+        es.indices.delete(index=[BASE_INDEX, READ_INDEX], ignore_unavailable=True)
@@ -0,0 +1,68 @@
+"""Модуль инвалидации кэша API в Redis.
+
+API кэширует агрегаты по индексам (например, фасеты фильмов) и готовые ответы списков
+на время CACHE_TIME_LIFE. После переиндексации ETL удаляет такие ключи,
+чтобы API пересчитал их по новым данным.
+"""
+import logging
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+# ключ кэша фасетов фильмов, должен совпадать с FACETS_CACHE_KEY в src/services/film.py
+MOVIES_FACETS_CACHE_KEY = 'movies::facets'
+# готовые ответы: response::<кодировка>::<индекс>::<параметры>,
+# см. RESPONSE_CACHE_PREFIX в src/services/response_cache.py
+RESPONSE_CACHE_PATTERN = 'response::*'
+# ключи удаляются порциями, чтобы не держать в памяти весь список
+DELETE_BATCH_SIZE = 500
+
+
+def invalidate_cache(host: str, port: int, keys: list[str]) -> None:
+    """Удаляет ключи из кэша API.
+
+    Недоступность Redis не должна останавливать ETL: ключи в любом случае
+    устареют по истечении времени жизни кэша.
+
+    Args:
+        host: Имя или IP адрес хоста с Redis
+        port: Номер порта для связи с Redis
+        keys: Список удаляемых ключей
+    """
+    try:
+        with Redis(host=host, port=port) as redis:
+            redis.delete(*keys)
+    except RedisError as err:
+        logging.warning('Кэш %s не инвалидирован: %s' % (', '.join(keys), err))
+        return
+    logging.info('Инвалидирован кэш: %s' % ', '.join(keys))
+
+
+def invalidate_responses(host: str, port: int, indexes: set[str]) -> None:
+    """Удаляет из кэша API готовые ответы, построенные по данным индексов.
+
+    Ключи ищутся командой SCAN (не блокирует Redis, в отличие от KEYS)
+    и удаляются UNLINK (память освобождается в фоне).
+
+    Args:
+        host: Имя или IP адрес хоста с Redis
+        port: Номер порта для связи с Redis
+        indexes: Изменившиеся индексы ES
+    """
+    deleted = 0
+    try:
+        with Redis(host=host, port=port) as redis:
+            batch = []
+            for key in redis.scan_iter(match=RESPONSE_CACHE_PATTERN, count=DELETE_BATCH_SIZE):
+                if key.decode().split('::')[2] not in indexes:
+                    continue
+                batch.append(key)
+                if len(batch) >= DELETE_BATCH_SIZE:
+                    deleted += redis.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += redis.unlink(*batch)
+    except RedisError as err:
+        logging.warning('Ответы API по индексам %s не инвалидированы: %s', ', '.join(indexes), err)
+        return
+    logging.info('Инвалидированы ответы API по индексам %s: %s', ', '.join(indexes), deleted)
@@ -9,11 +9,25 @@ import psycopg2.extensions as pg_extensions
 import statemanager
 import configparser
 
-from models import FilmworkModel, PersonModel, GenreModel, Schema
+from models import FilmworkModel, PersonModel, GenreModel, Schema, SimilarFilmsModel
+from similar import compute_similar
 from transform import Transform
 from psycopg2.extensions import connection as _connection
 from datetime import datetime
-from backoff_dec import backoff
+from backoff_dec import ETL_MAX_ATTEMPTS, ETL_RETRY_DEADLINE, backoff, etl_retry_budget
+from cache import MOVIES_FACETS_CACHE_KEY, invalidate_cache, invalidate_responses
+from replica import build_replica
+
+# временные ошибки PostgreSQL (соединение, перезапуск сервера): запрос имеет смысл повторить
+PG_TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# повторы вызовов PostgreSQL: конечное число попыток и общий с ES бюджет повторов
+pg_backoff = backoff(
+    retry_on=PG_TRANSIENT_ERRORS,
+    max_attempts=ETL_MAX_ATTEMPTS,
+    deadline=ETL_RETRY_DEADLINE,
+    budget=etl_retry_budget,
+)
 
 
 class LoggingCursor(pg_extensions.cursor):
@@ -44,14 +58,19 @@ class Extractor:
     # ключ, похожий на GENRE_MODIFIED_KEY, но этот необходим для контроля статуса записи в индексе: genres
     GENRE_IN_FILMS_MODIFIED_KEY = '_gen_in_films_modified'
 
+    # ключ отслеживающий дату фильма, изменения которого (название, рейтинг) записаны в индекс: persons
+    FILM_IN_PERSONS_MODIFIED_KEY = '_film_in_persons_modified'
+
     cnt_load = 0
     cnt_part_load = 0
     cnt_successes = 0
 
-    def __init__(self, connection: _connection, dsl: dict):
+    def __init__(self, connection: _connection, dsl: dict, redis_dsl: dict):
         self.conn = connection
         self.es_host = dsl['host']
         self.es_port = int(dsl['port'])
+        self.redis_host = redis_dsl['host']
+        self.redis_port = int(redis_dsl['port'])
 
         self.films_to_es = []
 
@@ -70,6 +89,23 @@ class Extractor:
         self.fetch_size = int(config['Extractor']['fetch_size'])
         self.pause = int(config['Extractor']['pause_between'])
 
+        # настройки расчёта похожих фильмов
+        self.similar_top_n = config.getint('Similar', 'top_n', fallback=20)
+        self.similar_genre_weight = config.getfloat('Similar', 'genre_weight', fallback=0.5)
+        self.similar_cast_weight = config.getfloat('Similar', 'cast_weight', fallback=0.5)
+        self.similar_block_size = config.getint('Similar', 'block_size', fallback=256)
+        # признак того, что в текущей сессии сканирования изменились фильмы в индексе movies
+        self.movies_changed = False
+        # индексы, записанные с последней инвалидации готовых ответов API
+        self.changed_indexes: set[str] = set()
+
+        # настройки локальной реплики для чтения (снимок индексов в файле LMDB)
+        self.replica_enabled = config.getboolean('Replica', 'enabled', fallback=False)
+        self.replica_path = config.get('Replica', 'path', fallback='replica.lmdb')
+        self.replica_map_size = config.getint('Replica', 'map_size_mb', fallback=1024) * 1024 ** 2
+        # признак того, что в ES изменились данные после последней сборки реплики
+        self.replica_outdated = self.replica_enabled
+
         logging.info(f'Размер кипы: {self.chunk}')
         logging.info(f'Размер порций fetch: {self.fetch_size}')
 
@@ -83,7 +119,7 @@ class Extractor:
                 """
         return query
 
-    @backoff()
+    @pg_backoff
     def query_exec(self, cursor, query_to_exec):
         logging.debug(query_to_exec)
         cursor.execute(query_to_exec)
@@ -114,7 +150,13 @@ class Extractor:
 
     def get_data_and_send_to_es(self, model: Schema, entities: list):
         query = ""
-        if model.table == 'person':
+        if model.es_index == 'persons':
+            # персоны переиндексируются как при изменении самих персон,
+            # так и при изменении их фильмов (название и рейтинг хранятся в фильмографии).
+            # LIMIT не ставим: у порции фильмов персон может быть больше, чем chunk,
+            # а состояние сдвигается после обработки порции, и отброшенные персоны
+            # больше не были бы переиндексированы. Строки всё равно читаются по fetch_size.
+            person_filter = 'person_id' if model.table == 'person' else 'film_work_id'
             query = \
                 f"""
                     SELECT row_to_json(info) as view
@@ -129,24 +171,26 @@ class Extractor:
                                 (
                                     SELECT 
                                         pfw.film_work_id uuid,
+                                        fw.title,
+                                        fw.rating imdb_rating,
                                         json_agg(pfw."role") roles 
                                     FROM 
                                         content.person_film_work pfw
+                                        JOIN content.film_work fw ON fw.id = pfw.film_work_id
                                     WHERE 
                                         pfw.person_id = p.id
-                                    GROUP BY 1
+                                    GROUP BY 1, 2, 3
                                 ) film_group
                             ) as films
                         FROM
                             content.person p
                             LEFT JOIN content.person_film_work tfw ON tfw.person_id = p.id
                         WHERE
-                            tfw.person_id in ({', '.join(f"'{el}'" for el in entities)})
+                            tfw.{person_filter} in ({', '.join(f"'{el}'" for el in entities)})
                         GROUP BY 1
-                        LIMIT {self.chunk}
                     ) info;
                 """
-        elif model.table == 'genre':
+        elif model.es_index == 'genres':
             query = \
                 f"""
                     SELECT row_to_json(info) as view
@@ -246,8 +290,12 @@ class Extractor:
             data = self.get_key_value(Extractor.GENRE_IN_FILMS_MODIFIED_KEY)
             objects.append(Schema('genre', GenreModel, Extractor.GENRE_IN_FILMS_MODIFIED_KEY, data, 'genres'))
 
+            data = self.get_key_value(Extractor.FILM_IN_PERSONS_MODIFIED_KEY)
+            objects.append(Schema('film_work', PersonModel, Extractor.FILM_IN_PERSONS_MODIFIED_KEY, data, 'persons'))
+
             # перебираем последовательно 'person', 'genre', 'film_work' для записи в индекс movies
             # а также далее 'person' и 'genre' для записи в индексы persons и genres соответственно
+            # и 'film_work' для обновления фильмографии в индексе persons
             for cur_model in objects:
                 # Считывание данных из PG
                 with self.conn.cursor() as cur:
@@ -268,9 +316,70 @@ class Extractor:
                             else:
                                 self.get_data_and_send_to_es(cur_model, changed_entities)
 
+            # похожие фильмы пересчитываются по всему каталогу, если изменился хотя бы один фильм,
+            # а агрегаты по фильмам, закэшированные API, устаревают
+            if self.movies_changed:
+                invalidate_cache(self.redis_host, self.redis_port, [MOVIES_FACETS_CACHE_KEY])
+                try:
+                    self.update_similar_films()
+                    self.movies_changed = False
+                except Exception as e:
+                    logging.exception('%s: %s' % (e.__class__.__name__, e))
+
+            # готовые ответы API (страницы фильмов, список жанров) устарели - в том числе
+            # из-за пересчёта похожих фильмов, поэтому удаляются после него
+            if self.changed_indexes:
+                invalidate_responses(self.redis_host, self.redis_port, self.changed_indexes)
+                self.changed_indexes = set()
+
+            # реплика собирается после пересчёта похожих фильмов, чтобы содержать и их
+            if self.replica_enabled and self.replica_outdated:
+                try:
+                    build_replica(
+                        self.es_host, self.es_port, self.replica_path, self.replica_map_size,
+                    )
+                    self.replica_outdated = False
+                except Exception as e:
+                    logging.exception('%s: %s' % (e.__class__.__name__, e))
+
             Extractor.cnt_part_load = 0
             Extractor.cnt_successes = 0
 
+    def update_similar_films(self):
+        """Пересчитывает списки похожих фильмов и записывает их в индекс movies.
+
+        Похожесть рассчитывается по совпадению жанров и персон для всего каталога,
+        результат частично обновляет документы фильмов (поле similar).
+        """
+        with self.conn.cursor() as cur:
+            cur = self.query_exec(cur, 'SELECT id FROM content.film_work;')
+            films = [record[0] for record in cur.fetchall()]
+            cur = self.query_exec(cur, 'SELECT film_work_id, genre_id FROM content.genre_film_work;')
+            genre_pairs = [(record[0], record[1]) for record in cur.fetchall()]
+            cur = self.query_exec(cur, 'SELECT film_work_id, person_id FROM content.person_film_work;')
+            person_pairs = [(record[0], record[1]) for record in cur.fetchall()]
+
+        similar = compute_similar(
+            films,
+            genre_pairs,
+            person_pairs,
+            top_n=self.similar_top_n,
+            genre_weight=self.similar_genre_weight,
+            cast_weight=self.similar_cast_weight,
+            block_size=self.similar_block_size,
+        )
+        data_to_elastic = [
+            SimilarFilmsModel(uuid=film, similar=similar_films)
+            for film, similar_films in similar.items()
+        ]
+        Transform.prepare_and_update(
+            data_to_elastic,
+            es_index='movies',
+            host_name=self.es_host,
+            port=self.es_port,
+            chunk_size=self.chunk,
+        )
+
     @staticmethod
     def make_names(film_work: FilmworkModel) -> FilmworkModel:
         """Уточнение данных, для соответствия
@@ -356,7 +465,14 @@ class Extractor:
                                 gfw.film_work_id = fw.id 
                             AND 
                                 gfw.genre_id = g.id
-                        ) as genre
+                        ) as genre,
+                        (
+                            SELECT json_agg(gfw.genre_id)
+                            FROM
+                                content.genre_film_work gfw
+                            WHERE 
+                                gfw.film_work_id = fw.id 
+                        ) as genre_uuids
                 FROM content.film_work as fw
                 WHERE fw.id IN ({', '.join(f"'{el}'" for el in self.films_to_es)})
                 ) film;
@@ -370,10 +486,13 @@ class Extractor:
                 raw_records = [FilmworkModel(**record['films']) for record in records]
                 film_works_to_elastic = [self.make_names(record) for record in raw_records]
                 self.push_to_es(film_works_to_elastic, es_index='movies')
+                self.movies_changed = True
 
     def push_to_es(self, data_to_elastic: list, es_index: str):
         t = Transform()
         cnt = len(data_to_elastic)
+        self.replica_outdated = self.replica_enabled
+        self.changed_indexes.add(es_index)
 
         Extractor.cnt_load += cnt
         Extractor.cnt_part_load = cnt
@@ -2,13 +2,41 @@
 
 Описание класса Load, который реализует необходимые методы для записи данных.
 """
+import configparser
 import logging
 from typing import Literal
 
-from backoff_dec import backoff
+from backoff_dec import ETL_MAX_ATTEMPTS, ETL_RETRY_DEADLINE, backoff, etl_retry_budget
+from elastic_transport import ApiError, TransportError
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import streaming_bulk
 
+# ответы ES, после которых запрос имеет смысл повторить (перегрузка, недоступность узла)
+ES_RETRYABLE_STATUSES = frozenset((429, 502, 503, 504))
+
+
+def is_permanent_es_error(err: Exception) -> bool:
+    """Проверяет, что ошибка ES не исчезнет при повторе запроса (например, ошибка маппинга).
+
+    Args:
+        err: Ошибка вызова ES
+
+    Returns:
+        True, если повторять запрос бессмысленно
+    """
+    return isinstance(err, ApiError) and err.status_code not in ES_RETRYABLE_STATUSES
+
+
+# повторяются ошибки соединения и ответы ES о перегрузке: конечное число попыток
+# и общий с PostgreSQL бюджет повторов
+es_backoff = backoff(
+    retry_on=(TransportError, ApiError),
+    giveup=is_permanent_es_error,
+    max_attempts=ETL_MAX_ATTEMPTS,
+    deadline=ETL_RETRY_DEADLINE,
+    budget=etl_retry_budget,
+)
+
 
 class Load:
     """Класс взаимодействия с БД Elasticsearch.
@@ -61,17 +89,49 @@ class Load:
         },
     }
 
+    # Профиль индекса movies, оптимизированный для чтения:
+    # сегменты отсортированы по рейтингу, поэтому запросы top-N с сортировкой по imdb_rating
+    # (и track_total_hits=false) завершаются досрочно, не обходя все подходящие документы.
+    # ES не разрешает сортировку индекса с полями типа nested, поэтому actors и writers
+    # хранятся как object: API читает их только из _source и nested-запросов не делает
+    index_movies_settings = {
+        'sort.field': 'imdb_rating',
+        'sort.order': 'desc',
+    }
+
+    # Маппинг индекса movies (профиль для чтения):
+    # - eager_global_ordinals у полей фильтров и агрегаций строит ordinals при refresh,
+    #   а не на первом запросе после него;
+    # - norms отключены у текстовых полей, по которым не нужна релевантность по длине поля;
+    # - doc_values отключены у полей, по которым нет сортировки и агрегаций.
     index_movies_mappings = {
         'dynamic': 'strict',
         'properties': {
             'uuid': {
                 'type': 'keyword',
+                'doc_values': False,
             },
             'imdb_rating': {
                 'type': 'float',
             },
+            'type': {
+                'type': 'keyword',
+                'eager_global_ordinals': True,
+            },
             'genre': {
                 'type': 'keyword',
+                'eager_global_ordinals': True,
+            },
+            # UUID жанров позволяют API фильтровать фильмы по жанру одним запросом
+            'genre_uuids': {
+                'type': 'keyword',
+                'eager_global_ordinals': True,
+            },
+            # ранжированный список UUID похожих фильмов, рассчитывается ETL
+            'similar': {
+                'type': 'keyword',
+                'index': False,
+                'doc_values': False,
             },
             'title': {
                 'type': 'text',
@@ -82,45 +142,57 @@ class Load:
                     },
                 },
             },
+            # подсказки (автодополнение) по префиксу названия
+            'title_suggest': {
+                'type': 'completion',
+            },
             'description': {
                 'type': 'text',
                 'analyzer': 'ru_en',
+                'norms': False,
             },
             'director': {
                 'type': 'text',
                 'analyzer': 'ru_en',
+                'norms': False,
             },
             'actors_names': {
                 'type': 'text',
                 'analyzer': 'ru_en',
+                'norms': False,
             },
             'writers_names': {
                 'type': 'text',
                 'analyzer': 'ru_en',
+                'norms': False,
             },
             'actors': {
-                'type': 'nested',
+                'type': 'object',
                 'dynamic': 'strict',
                 'properties': {
                     'uuid': {
                         'type': 'keyword',
+                        'doc_values': False,
                     },
                     'full_name': {
                         'type': 'text',
                         'analyzer': 'ru_en',
+                        'norms': False,
                     },
                 },
             },
             'writers': {
-                'type': 'nested',
+                'type': 'object',
                 'dynamic': 'strict',
                 'properties': {
                     'uuid': {
                         'type': 'keyword',
+                        'doc_values': False,
                     },
                     'full_name': {
                         'type': 'text',
                         'analyzer': 'ru_en',
+                        'norms': False,
                     },
                 },
             },
@@ -137,6 +209,10 @@ class Load:
                 'type': 'text',
                 'analyzer': 'ru_en',
             },
+            # подсказки (автодополнение) по префиксу имени
+            'full_name_suggest': {
+                'type': 'completion',
+            },
             'films': {
                 'type': 'nested',
                 'dynamic': 'strict',
@@ -144,6 +220,13 @@ class Load:
                     'uuid': {
                         'type': 'keyword',
                     },
+                    'title': {
+                        'type': 'text',
+                        'analyzer': 'ru_en',
+                    },
+                    'imdb_rating': {
+                        'type': 'float',
+                    },
                     'roles': {
                         'type': 'text',
                         'analyzer': 'ru_en',
@@ -176,6 +259,11 @@ class Load:
         'genres': index_genres_mappings,
     }
 
+    # настройки, дополняющие общие indexes_settings для отдельных индексов
+    indexes_extra_settings = {
+        'movies': index_movies_settings,
+    }
+
     def __init__(
         self,
         data_to_es: list,
@@ -196,7 +284,7 @@ class Load:
         self.data_to_es = data_to_es
         self.es_index = es_index  # текущий индекс с которым будет работать вставка данных
 
-    @backoff()
+    @es_backoff
     def connect_to_es(self):
         """Создание соединения с Elasticsearch.
 
@@ -205,17 +293,44 @@ class Load:
         """
         return Elasticsearch(self.es_socket)
 
-    @backoff()
+    @staticmethod
+    def get_index_settings(es_index: str) -> dict:
+        """Собирает настройки индекса.
+
+        Общие настройки дополняются настройками индекса и раскладкой по шардам и репликам
+        из секции [Index] файла settings.ini (ключи <индекс>_shards и <индекс>_replicas).
+        Если раскладка не задана, используются значения ES по умолчанию.
+
+        Args:
+            es_index: Наименование индекса
+
+        Returns:
+            Настройки для создания индекса
+        """
+        settings = {**Load.indexes_settings, **Load.indexes_extra_settings.get(es_index, {})}
+
+        config = configparser.ConfigParser()
+        config.read('settings.ini')
+        shards_option = '{0}_shards'.format(es_index)
+        replicas_option = '{0}_replicas'.format(es_index)
+        if config.has_option('Index', shards_option):
+            settings['number_of_shards'] = config.getint('Index', shards_option)
+        if config.has_option('Index', replicas_option):
+            settings['number_of_replicas'] = config.getint('Index', replicas_option)
+
+        return settings
+
+    @es_backoff
     def create_index(self):
         """Создание индекса, который задан в свойстве self.es_index."""
         mappings = Load.indexes[self.es_index]
         self.es.indices.create(
             index=self.es_index,
-            settings=Load.indexes_settings,
+            settings=Load.get_index_settings(self.es_index),
             mappings=mappings,
         )
 
-    @backoff()
+    @es_backoff
     def check_index(self):
         """Проверка на наличие индекса.
 
@@ -248,7 +363,52 @@ class Load:
             logging.debug('Запись данных в ElasticSearch: %s' % doc)
             yield doc
 
-    @backoff()
+    def get_partial_data(self) -> dict:
+        """Генераторная функция. Получение частичных обновлений документов для метода bulk.
+
+        Yields:
+            Возвращается генератор со строкой (типа словарь) для обновления полей документа
+        """
+        for record in self.data_to_es:
+            fields = record.model_dump(mode='json', exclude={'uuid'})
+            yield {
+                '_op_type': 'update',
+                '_id': str(record.uuid),
+                '_index': self.es_index,
+                'doc': fields,
+            }
+
+    @es_backoff
+    def update_data(self, chunk_size: int) -> int:
+        """Функция для частичного обновления пачки документов в ES.
+
+        Документы, которых ещё нет в индексе, пропускаются - они будут обновлены
+        при следующем запуске.
+
+        Args:
+            chunk_size: размер пачки данных
+
+        Returns:
+            Число успешно обновленных записей
+        """
+        if not self.check_index():
+            return 0
+
+        successful_records = 0
+        for ok, _ in streaming_bulk(
+            self.es,
+            index=self.es_index,
+            actions=self.get_partial_data(),
+            chunk_size=chunk_size,
+            raise_on_error=False,
+        ):
+            successful_records += ok
+
+        logging.info('Обновлено записей в ElasticSearch: %s' % successful_records)
+
+        return successful_records
+
+    @es_backoff
     def insert_data(self, chunk_size: int) -> int:
         """Функция для вставки пачки записей с данными (фильмы, жанры, персоны) в ES.
 
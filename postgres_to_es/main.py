@@ -12,7 +12,6 @@ from contextlib import closing
 
 import extractor
 import psycopg2
-from backoff_dec import backoff
 from dotenv import find_dotenv, load_dotenv
 from psycopg2.extras import DictCursor
 
@@ -30,7 +29,7 @@ load_dotenv(find_dotenv())
 #  Перейти к следующей пачке данных, пока есть данные
 
 
-@backoff()
+@extractor.pg_backoff
 def query_exec(cursor, query_to_exec):
     """Отправляет SQL запрос в PostgreSQL.
 
@@ -45,7 +44,7 @@ def query_exec(cursor, query_to_exec):
     return cursor
 
 
-@backoff()
+@extractor.pg_backoff
 def connect_to_db(dsl):
     """Соединение с PostgreSQL.
 
@@ -80,13 +79,17 @@ if __name__ == '__main__':
     pg_port = int(os.environ.get('POSTGRES_PORT'))
     es_host = os.environ.get('ES_HOST')
     es_port = int(os.environ.get('ES_PORT'))
+    # Redis нужен только для сброса кэша API, поэтому у него есть значения по умолчанию
+    redis_host = os.environ.get('REDIS_HOST', 'localhost')
+    redis_port = int(os.environ.get('REDIS_PORT', 6379))
 
     pg_dsl = {'dbname': pg_db, 'user': usr, 'password': pwd, 'host': pg_host, 'port': pg_port}
     es_dsl = {'host': es_host, 'port': es_port}
+    redis_dsl = {'host': redis_host, 'port': redis_port}
 
     try:
         with closing(connect_to_db(pg_dsl)) as connection:
-            extract = extractor.Extractor(connection, es_dsl)
+            extract = extractor.Extractor(connection, es_dsl, redis_dsl)
             extract.postgres_producer()
 
     except Exception as err:
@@ -4,7 +4,34 @@ from datetime import datetime
 from typing import Literal, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
+
+
+# количество слов, с которых может начинаться подсказка (поиск по фамилии, по второму слову и т.д.)
+SUGGEST_MAX_WORDS = 5
+
+
+def suggest_inputs(text: str) -> list[str]:
+    """Формирует варианты ввода для поля автодополнения (completion).
+
+    Completion-поле ищет только по началу строки, поэтому в него записываются
+    все окончания строки, начинающиеся с границы слова.
+
+    Args:
+        text: Название фильма или имя персоны
+
+    Returns:
+        Список вариантов ввода
+    """
+    words = text.split()
+    return [' '.join(words[start:]) for start in range(min(len(words), SUGGEST_MAX_WORDS))]
+
+
+class Suggest(BaseModel):
+    """Модель значения поля автодополнения (completion) в ES."""
+
+    input: list[str]
+    weight: int = 0
 
 
 class PersonMixin(BaseModel):
@@ -21,21 +48,33 @@ class FilmworkModel(BaseModel):
     title: str
     description: str | None
     imdb_rating: Optional[float] = None
-    type: str = Field(exclude=True)
+    type: str
     created_at: datetime = Field(exclude=True)
     updated_at: datetime = Field(exclude=True)
     actors: Optional[list[PersonMixin]] = None
     writers: Optional[list[PersonMixin]] = None
     director: Optional[list[str]] = []
     genre: Optional[list[str]] = None
+    genre_uuids: Optional[list[UUID]] = None
     writers_names: Optional[list[str]] = None
     actors_names: Optional[list[str]] = None
 
+    @computed_field  # type: ignore[misc]
+    @property
+    def title_suggest(self) -> Suggest:
+        """Подсказки по названию: более популярные фильмы предлагаются первыми."""
+        return Suggest(
+            input=suggest_inputs(self.title),
+            weight=int((self.imdb_rating or 0) * 10),
+        )
+
 
 class PortfolioFilm(BaseModel):
     """Модель портфолио."""
 
     uuid: UUID
+    title: Optional[str] = None
+    imdb_rating: Optional[float] = None
     roles: list[str]
 
 
@@ -46,6 +85,15 @@ class PersonModel(PersonMixin):
     full_name: str
     films: Optional[list[PortfolioFilm]]
 
+    @computed_field  # type: ignore[misc]
+    @property
+    def full_name_suggest(self) -> Suggest:
+        """Подсказки по имени: персоны с большим количеством фильмов предлагаются первыми."""
+        return Suggest(
+            input=suggest_inputs(self.full_name),
+            weight=len(self.films or []),
+        )
+
 
 class GenreModel(BaseModel):
     """Модель жанра."""
@@ -55,6 +103,13 @@ class GenreModel(BaseModel):
     description: Optional[str] = None
 
 
+class SimilarFilmsModel(BaseModel):
+    """Модель списка похожих фильмов (частичное обновление документа фильма)."""
+
+    uuid: UUID
+    similar: list[UUID]
+
+
 @dataclass
 class Schema:
     """Класс описания схемы. Используется для соблюдения стиля DRY."""
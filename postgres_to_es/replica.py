@@ -0,0 +1,78 @@
+"""Модуль построения локальной реплики для чтения (снимок индексов ES в файле LMDB).
+
+API открывает файл только на чтение и отображает его в память (mmap), поэтому
+все рабочие процессы API на узле делят одну копию данных через страничный кэш ОС,
+а получение фильма, персоны или жанра по UUID не требует обращения по сети.
+
+Снимок каждый раз строится заново во временном файле и атомарно подменяет
+предыдущий (os.replace): читатели продолжают работать со старым файлом,
+пока не откроют новый.
+"""
+import json
+import logging
+import os
+
+import lmdb
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import scan
+
+# индексы, документы которых попадают в реплику
+REPLICA_INDEXES = ('movies', 'persons', 'genres')
+# количество документов, записываемых в одной транзакции LMDB
+REPLICA_TXN_SIZE = 1000
+
+
+def replica_key(es_index: str, uuid: str) -> bytes:
+    """Ключ документа в реплике, должен совпадать с ключом в src/db/replica.py.
+
+    Args:
+        es_index: Наименование индекса
+        uuid: UUID документа
+
+    Returns:
+        Ключ записи LMDB
+    """
+    return '{0}::{1}'.format(es_index, uuid).encode()
+
+
+def build_replica(host: str, port: int, path: str, map_size: int) -> int:
+    """Строит снимок индексов ES в файле LMDB и атомарно заменяет им предыдущий.
+
+    Args:
+        host: Имя или IP адрес хоста с ES
+        port: Номер порта для связи с ES
+        path: Путь к файлу реплики
+        map_size: Максимальный размер файла реплики в байтах
+
+    Returns:
+        Количество записанных документов
+    """
+    tmp_path = '{0}.tmp'.format(path)
+    if os.path.exists(tmp_path):
+        # остаток прерванной сборки
+        os.remove(tmp_path)
+
+    es = Elasticsearch('http://{0}:{1}/'.format(host, port))
+    # единственный писатель - ETL, а файл до подмены никто не читает, поэтому блокировки не нужны
+    env = lmdb.open(tmp_path, map_size=map_size, subdir=False, lock=False, sync=False)
+    written = 0
+    try:
+        for es_index in REPLICA_INDEXES:
+            if not es.indices.exists(index=es_index):
+                continue
+            txn = env.begin(write=True)
+            for hit in scan(es, index=es_index, query={'query': {'match_all': {}}}):
+                txn.put(replica_key(es_index, hit['_id']), json.dumps(hit['_source']).encode())
+                written += 1
+                if written % REPLICA_TXN_SIZE == 0:
+                    txn.commit()
+                    txn = env.begin(write=True)
+            txn.commit()
+        env.sync(True)
+    finally:
+        env.close()
+        es.close()
+
+    os.replace(tmp_path, path)
+    logging.info('Реплика для чтения %s обновлена: %s документов' % (path, written))
+    return written
@@ -0,0 +1,120 @@
+"""Модуль расчёта похожих фильмов.
+
+Похожесть фильмов оценивается по мере Жаккара для множеств жанров и множеств
+персон (актёры, сценаристы, режиссёры). Расчёт выполняется векторно по
+разреженной матрице инцидентности фильм x признак блоками строк, чтобы память
+не росла квадратично с размером каталога.
+"""
+import logging
+
+import numpy as np
+from scipy import sparse
+
+
+def incidence_matrix(pairs: list, films_index: dict) -> sparse.csr_matrix:
+    """Строит бинарную разреженную матрицу инцидентности фильм x признак.
+
+    Args:
+        pairs: Список пар (UUID фильма, UUID признака)
+        films_index: Словарь UUID фильма -> номер строки матрицы
+
+    Returns:
+        Матрица в формате CSR, где 1 означает наличие признака у фильма
+    """
+    features_index: dict = {}
+    rows = []
+    cols = []
+    for film_id, feature_id in pairs:
+        row = films_index.get(str(film_id))
+        if row is None:
+            continue
+        rows.append(row)
+        cols.append(features_index.setdefault(str(feature_id), len(features_index)))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(films_index), max(len(features_index), 1)),
+    )
+    # повторяющиеся пары (персона в нескольких ролях) не должны увеличивать вес признака
+    matrix.data[:] = 1
+    return matrix
+
+
+def jaccard_block(matrix: sparse.csr_matrix, start: int, stop: int) -> np.ndarray:
+    """Считает меру Жаккара строк [start, stop) матрицы со всеми её строками.
+
+    Args:
+        matrix: Бинарная матрица инцидентности
+        start: Первая строка блока
+        stop: Строка, следующая за последней строкой блока
+
+    Returns:
+        Плотная матрица (stop - start) x n с мерой Жаккара
+    """
+    sizes = np.asarray(matrix.sum(axis=1), dtype=np.float32).ravel()
+    intersection = (matrix[start:stop] @ matrix.T).toarray()
+    union = sizes[start:stop, None] + sizes[None, :] - intersection
+    return np.divide(
+        intersection,
+        union,
+        out=np.zeros_like(intersection),
+        where=union > 0,
+    )
+
+
+def compute_similar(
+    films: list,
+    genre_pairs: list,
+    person_pairs: list,
+    top_n: int = 10,
+    genre_weight: float = 0.5,
+    cast_weight: float = 0.5,
+    block_size: int = 256,
+) -> dict[str, list[str]]:
+    """Рассчитывает для каждого фильма ранжированный список похожих фильмов.
+
+    Args:
+        films: Список UUID всех фильмов
+        genre_pairs: Пары (UUID фильма, UUID жанра)
+        person_pairs: Пары (UUID фильма, UUID персоны)
+        top_n: Количество похожих фильмов для каждого фильма
+        genre_weight: Вес совпадения жанров
+        cast_weight: Вес совпадения персон
+        block_size: Количество строк, обрабатываемых за один шаг
+
+    Returns:
+        Словарь UUID фильма -> список UUID похожих фильмов (от более похожих к менее)
+    """
+    films = [str(film) for film in films]
+    films_index = {film: row for row, film in enumerate(films)}
+    genres = incidence_matrix(genre_pairs, films_index)
+    persons = incidence_matrix(person_pairs, films_index)
+
+    films_count = len(films)
+    top_n = min(top_n, films_count - 1)
+    similar: dict[str, list[str]] = {}
+    if top_n <= 0:
+        return {film: [] for film in films}
+
+    for start in range(0, films_count, block_size):
+        stop = min(start + block_size, films_count)
+        scores = genre_weight * jaccard_block(genres, start, stop)
+        scores += cast_weight * jaccard_block(persons, start, stop)
+        # фильм не может быть похож сам на себя
+        scores[np.arange(stop - start), np.arange(start, stop)] = -1
+
+        candidates = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        ranked = np.take_along_axis(
+            candidates,
+            np.argsort(-candidate_scores, axis=1, kind='stable'),
+            axis=1,
+        )
+        for offset, row in enumerate(ranked):
+            row_scores = scores[offset, row]
+            similar[films[start + offset]] = [
+                films[col] for col, score in zip(row, row_scores) if score > 0
+            ]
+
+    logging.info('Рассчитаны похожие фильмы для %s фильмов' % films_count)
+    return similar
@@ -32,3 +32,26 @@ class Transform:
         """
         load_to_es = Load(data_to_es, es_index, host_name, port)
         return load_to_es.insert_data(chunk_size)
+
+    @staticmethod
+    def prepare_and_update(
+        data_to_es: list,
+        es_index: Literal['movies', 'persons', 'genres'],
+        host_name: str,
+        port: int,
+        chunk_size: int = 500,
+    ) -> int:
+        """Метод частично обновляет документы в ES.
+
+        Args:
+            data_to_es: Список моделей с обновляемыми полями (и uuid документа)
+            es_index: Index ES в котором необходимо обновить документы
+            host_name: ElasticSearch server HOST
+            port: ElasticSearch server PORT
+            chunk_size: Size of data to push per time
+
+        Returns:
+            Количество успешно обновленных в ЭС документов
+        """
+        load_to_es = Load(data_to_es, es_index, host_name, port)
+        return load_to_es.update_data(chunk_size)
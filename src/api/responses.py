@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Ответы API со списками объектов.
+
+Список моделей сервиса приводится к модели ответа API и кодируется в JSON одним вызовом
+TypeAdapter. Большие списки (больше STREAM_THRESHOLD объектов) отдаются потоком: JSON-массив
+кодируется частями по STREAM_CHUNK_SIZE объектов в рабочем потоке, поэтому в памяти
+находится только текущая часть тела ответа, а цикл событий между частями обслуживает
+другие запросы. Потоком идёт только сериализация: список моделей к этому моменту уже
+загружен из ES целиком, поэтому его размер ограничен MAX_PAGE_SIZE.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Sequence
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+from src.core import config
+from src.core.timing import SERIALIZE, span
+
+JSON_MEDIA_TYPE = 'application/json'
+
+
+def list_response(items: Sequence[Any], adapter: TypeAdapter) -> Response:
+    """Формирует ответ со списком объектов.
+
+    Args:
+        items: Список моделей сервиса
+        adapter: TypeAdapter списка моделей ответа API
+
+    Returns:
+        Ответ целиком (небольшой список) или потоковый ответ (большой список)
+    """
+    if len(items) <= config.settings.STREAM_THRESHOLD:
+        return Response(encode_items(items, adapter), media_type=JSON_MEDIA_TYPE)
+    return StreamingResponse(
+        stream_items(items, adapter, config.settings.STREAM_CHUNK_SIZE),
+        media_type=JSON_MEDIA_TYPE,
+    )
+
+
+def encode_items(items: Sequence[Any], adapter: TypeAdapter) -> bytes:
+    """Приводит модели сервиса к модели ответа API и кодирует их в JSON-массив.
+
+    Args:
+        items: Список моделей сервиса
+        adapter: TypeAdapter списка моделей ответа API
+
+    Returns:
+        JSON-массив
+    """
+    # from_attributes: поля моделей сервиса, которых нет в модели ответа, отбрасываются
+    with span(SERIALIZE):
+        return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+async def stream_items(
+    items: Sequence[Any],
+    adapter: TypeAdapter,
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    """Потоково кодирует список объектов в JSON-массив.
+
+    Args:
+        items: Список моделей сервиса
+        adapter: TypeAdapter списка моделей ответа API
+        chunk_size: Количество объектов, кодируемых за один раз
+
+    Yields:
+        Части JSON-массива
+    """
+    yield b'['
+    for start in range(0, len(items), chunk_size):
+        chunk = await asyncio.to_thread(encode_items, items[start:start + chunk_size], adapter)
+        if start:
+            yield b','
+        # у каждой части отбрасываются собственные скобки массива
+        yield chunk[1:-1]
+    yield b']'
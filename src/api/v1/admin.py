@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Модуль реализует служебное API для диагностики производительности."""
+import asyncio
+import secrets
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from src.core import config
+from src.core.profiler import StackSampler, profile_log
+from src.db.slow_queries import slow_query_log
+from src.models.admin import RequestProfile, SlowQuery
+
+# максимальная длительность профилирования процесса (сек.)
+PROFILE_MAX_SECONDS = 60
+# профилирование процесса выполняется не более одного раза одновременно
+profiling = asyncio.Lock()
+
+
+async def verify_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Проверка доступа к служебному API.
+
+    Args:
+        x_admin_token: Значение заголовка X-Admin-Token
+
+    Raises:
+        HTTPException: NOT_FOUND - Служебное API отключено (не задан ADMIN_TOKEN)
+        HTTPException: FORBIDDEN - Неверный токен
+    """
+    if not config.settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='Not Found')
+    # сравнение за постоянное время, чтобы токен нельзя было подобрать по времени ответа
+    token = (x_admin_token or '').encode()
+    if not secrets.compare_digest(token, config.settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail='admin token required')
+
+
+router = APIRouter(dependencies=[Depends(verify_admin)])
+
+
+@router.get(
+    '/slow-queries',
+    response_model=list[SlowQuery],
+    summary='Медленные запросы к Elasticsearch.',
+    description='Последние запросы дольше SLOW_QUERY_THRESHOLD: параметры, длительность, профиль.',
+)
+async def slow_queries() -> list[SlowQuery]:
+    """Журнал медленных запросов, начиная с самых новых.
+
+    Returns:
+        Список медленных запросов
+    """
+    return slow_query_log.get_queries()
+
+
+@router.delete(
+    '/slow-queries',
+    status_code=HTTPStatus.NO_CONTENT,
+    summary='Очистить журнал медленных запросов.',
+)
+async def clear_slow_queries() -> None:
+    """Очищает журнал медленных запросов (например, после исправления запроса)."""
+    slow_query_log.clear()
+
+
+@router.get(
+    '/profile',
+    response_class=PlainTextResponse,
+    summary='Профиль рабочего процесса API.',
+    description='Статистический профиль процесса за seconds секунд в формате collapsed stacks.',
+)
+async def profile(
+    seconds: float = Query(10, description='Profiling duration', gt=0, le=PROFILE_MAX_SECONDS),
+) -> PlainTextResponse:
+    """Профилирует рабочий процесс, получивший запрос, и отдаёт стеки для flamegraph.
+
+    Args:
+        seconds: Длительность профилирования (сек.)
+
+    Returns:
+        Стеки в формате collapsed stacks (flamegraph.pl, speedscope)
+
+    Raises:
+        HTTPException: CONFLICT - Профилирование уже выполняется
+    """
+    if profiling.locked():
+        raise HTTPException(status_code=HTTPStatus.CONFLICT, detail='profiling already running')
+
+    async with profiling:
+        sampler = StackSampler(config.settings.PROFILE_INTERVAL)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+    return PlainTextResponse(sampler.collapsed())
+
+
+@router.get(
+    '/profile/requests',
+    response_model=list[RequestProfile],
+    summary='Профили отдельных запросов.',
+    description='Последние запросы, выполненные с заголовками X-Profile и X-Admin-Token.',
+)
+async def request_profiles() -> list[RequestProfile]:
+    """Профили запросов рабочего процесса, начиная с самых новых.
+
+    Returns:
+        Список профилей запросов
+    """
+    return profile_log.get_profiles()
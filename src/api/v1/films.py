@@ -4,15 +4,25 @@ from http import HTTPStatus
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-
-from src.models.film import Film, FilmDetailed
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+from src.api.responses import encode_items, list_response
+from src.core import config
+from src.core.etag import conditional_json
+from src.db.redis import generate_cache_key
+from src.models.film import Film, FilmDetailed, FilmFacets
 from src.services.film import (FilmService, MultipleFilmsService,
                                get_film_service, get_multiple_films_service)
+from src.services.response_cache import ResponseCache, get_response_cache
 
 # Объект router, в котором регистрируем обработчики
 router = APIRouter()
 
+FILMS_ADAPTER = TypeAdapter(list[Film])
+FILM_DETAILED_ADAPTER = TypeAdapter(FilmDetailed)
+
 # FastAPI в качестве моделей использует библиотеку pydantic
 # https://pydantic-docs.helpmanual.io
 # У неё есть встроенные механизмы валидации, сериализации и десериализации
@@ -33,9 +43,9 @@ router = APIRouter()
 # 2. Жанр и популярные фильмы в нём. Это просто фильтрация.
 # GET /api/v1/films?genre=<uuid:UUID>&sort=-imdb_rating&page_size=50&page_number=1
 
-# 5. Похожие фильмы. Похожесть можно оценить с помощью ElasticSearch, но цель модуля не в этом.
-# Сделаем просто: покажем фильмы того же жанра.
-# /api/v1/films?...
+# 5. Похожие фильмы. Списки похожих фильмов (по совпадению жанров и персон) заранее
+# рассчитывает ETL, выдача идёт в порядке убывания похожести, параметр sort не применяется.
+# /api/v1/films?similar=<uuid:UUID>&page_size=50&page_number=1
 
 # в основном эндпойнте с использованием параметра similar
 
@@ -45,12 +55,17 @@ router = APIRouter()
     description='Популярное кино в своем жанре с сортировкой результата, указать количество и номер страницы',
 )
 async def get_popular_films(
-    similar: Optional[UUID] = Query(None, description='Get films of same genre as similar'),
+    similar: Optional[UUID] = Query(None, description='Get films similar to the given one'),
     genre: Optional[UUID] = Query(None, description='Get films of given genres'),
     sort: str = Query('-imdb_rating', description='Sort by field'),
-    page_size: int = Query(50, description='Number of items per page', ge=1),
+    page_size: int = Query(
+        50, description='Number of items per page', ge=1, le=config.settings.MAX_PAGE_SIZE,
+    ),
     page_number: int = Query(1, description='Page number', ge=1),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
     film_service: MultipleFilmsService = Depends(get_multiple_films_service),
+    response_cache: ResponseCache = Depends(get_response_cache),
 ):
     valid_sort_fields = ('imdb_rating', '-imdb_rating')
     if sort not in valid_sort_fields:
@@ -61,13 +76,45 @@ async def get_popular_films(
 
     desc = sort[0] == '-'
 
-    return await film_service.get_multiple_films(
-        similar=similar,
-        genre=genre,
-        desc_order=desc,
-        page_size=page_size,
-        page_number=page_number,
+    async def get_films():
+        return await film_service.get_multiple_films(
+            similar=similar,
+            genre=genre,
+            desc_order=desc,
+            page_size=page_size,
+            page_number=page_number,
+        )
+
+    # Большие страницы отдаются потоком и не кэшируются целиком
+    if page_size > config.settings.STREAM_THRESHOLD:
+        films = await get_films()
+        if films is None:
+            return None
+        return list_response(films, FILMS_ADAPTER)
+
+    async def build() -> Optional[bytes]:
+        films = await get_films()
+        if films is None:
+            return None
+        return encode_items(films, FILMS_ADAPTER)
+
+    # Копия каталога в памяти отвечает быстрее Redis: кэш ответов для неё не используется
+    if film_service.serves_from_catalog(similar):
+        body = await build()
+        return None if body is None else conditional_json(body, if_none_match)
+
+    # Страницы популярных фильмов хранятся в кэше готовыми и сжатыми
+    cache_key = generate_cache_key(
+        'movies',
+        {
+            'similar': similar,
+            'genre': genre,
+            'sort': sort,
+            'page_size': page_size,
+            'page_number': page_number,
+        },
     )
+    return await response_cache.get_or_build(cache_key, accept_encoding, build, if_none_match)
 
 
 # 3. Поиск по фильмам (2.1. из т.з.)
@@ -81,16 +128,66 @@ async def get_popular_films(
 )
 async def fulltext_search_filmworks(
     query: str = Query('Star', description='Film title or part of film title'),
-    page_size: int = Query(50, description='Number of items per page', ge=1),
+    page_size: int = Query(
+        50, description='Number of items per page', ge=1, le=config.settings.MAX_PAGE_SIZE,
+    ),
     page_number: int = Query(1, description='Page number', ge=1),
     pop_film_service: MultipleFilmsService = Depends(get_multiple_films_service),
 ) -> list[Film]:
 
-    return await pop_film_service.search_films(
+    films = await pop_film_service.search_films(
         query,
         page_number,
         page_size,
     )
+    return list_response(films, FILMS_ADAPTER)
+
+
+# 6. Подсказки (автодополнение) по началу названия фильма
+# GET /api/v1/films/suggest?prefix=sta&size=10
+
+@router.get(
+    '/suggest',
+    response_model=list[Film],
+    summary='Подсказки по началу названия фильма',
+    description='Автодополнение: популярные фильмы, название которых начинается с prefix',
+)
+async def suggest_films(
+    prefix: str = Query(..., description='Beginning of film title (or its word)', min_length=1),
+    size: int = Query(10, description='Number of suggestions', ge=1, le=50),
+    film_service: MultipleFilmsService = Depends(get_multiple_films_service),
+) -> list[Film]:
+    return await film_service.suggest_films(prefix, size)
+
+
+# 7. Фасеты каталога: количество фильмов по жанрам, типам и гистограмма рейтинга
+# GET /api/v1/films/facets
+
+@router.get(
+    '/facets',
+    response_model=FilmFacets,
+    summary='Фасеты каталога фильмов',
+    description='Количество фильмов по жанрам и типам, гистограмма рейтинга (шаг 1)',
+)
+async def film_facets(
+    film_service: MultipleFilmsService = Depends(get_multiple_films_service),
+) -> FilmFacets:
+    return await film_service.get_facets()
+
+
+# 8. Выгрузка всех фильмов для внешних потребителей (NDJSON, по фильму в строке)
+# GET /api/v1/films/export
+
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    summary='Выгрузка всех фильмов',
+    description='Полная информация о всех фильмах в формате NDJSON (один фильм в строке)',
+)
+async def export_films(
+    film_service: MultipleFilmsService = Depends(get_multiple_films_service),
+) -> StreamingResponse:
+    return StreamingResponse(film_service.export_films(), media_type='application/x-ndjson')
 
 
 # 4. Полная информация по фильму (т.з. 3.1.)
@@ -104,17 +201,29 @@ async def fulltext_search_filmworks(
 )
 async def film_details(
     film_id: str,
+    if_none_match: Optional[str] = Header(None),
     film_service: FilmService = Depends(get_film_service),
-) -> FilmDetailed:
-    film = await film_service.get_by_uuid(film_id)
-    if not film:
+    response_cache: ResponseCache = Depends(get_response_cache),
+) -> Response:
+    async def build() -> Optional[bytes]:
+        film = await film_service.get_by_uuid(film_id)
+        if not film:
+            return None
+        # Перекладываем данные из models.Film в Film
+        # У модели бизнес-логики есть поле description, которое отсутствует в модели ответа API.
+        # Если бы использовалась общая модель для бизнес-логики и формирования ответов API
+        # вы бы предоставляли клиентам секретные данные и/или данные, которые им не нужны
+        return FILM_DETAILED_ADAPTER.dump_json(film)
+
+    # Если у клиента та же версия фильма (ETag из кэша), отдаём 304, не читая фильм
+    response = await response_cache.conditional_detail(
+        generate_cache_key('movies', {'uuid': film_id}),
+        build,
+        if_none_match,
+    )
+    if response is None:
         # Если фильм не найден, отдаём 404 статус
         # Желательно пользоваться уже определёнными HTTP-статусами, которые содержат enum
         # Такой код будет более поддерживаемым
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='film not found')
-
-    # Перекладываем данные из models.Film в Film
-    # У модели бизнес-логики есть поле description, которое отсутствует в модели ответа API.
-    # Если бы использовалась общая модель для бизнес-логики и формирования ответов API
-    # вы бы предоставляли клиентам секретные данные и/или данные, которые им не нужны
-    return film
+    return response
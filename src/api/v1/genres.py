@@ -1,17 +1,22 @@
 # -*- coding: utf-8 -*-
 """Модуль реализует API для доступа к информации о жанрах."""
 
-import json
 import logging
 from http import HTTPStatus
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 
-from src.models.validation import check_uuid, serialize_uuid
-from src.services.genre import GenreService, get_genre_service
+from src.api.responses import encode_items
+from src.db.redis import generate_cache_key
+from src.models.validation import check_uuid
+from src.services.genre import GENRES_CACHE_KEY, GenreService, get_genre_service
+from src.services.response_cache import ResponseCache, get_response_cache
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -23,6 +28,30 @@ class Genre(BaseModel):
     name: str
 
 
+GENRES_ADAPTER = TypeAdapter(list[Genre])
+GENRE_ADAPTER = TypeAdapter(Genre)
+
+
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    summary='Выгрузка всех жанров.',
+    description='Все жанры в формате NDJSON (один жанр в строке).',
+)
+async def export_genres(
+    genre_service: GenreService = Depends(get_genre_service),
+) -> StreamingResponse:
+    """Потоковая выгрузка всех жанров при обращении к ручке api/v1/genres/export.
+
+    Args:
+        genre_service: Связь с сервисом для доступа жанров
+
+    Returns:
+        Потоковый ответ в формате NDJSON
+    """
+    return StreamingResponse(genre_service.export_genres(), media_type='application/x-ndjson')
+
+
 # Регистрируем обработчик genre_details
 # на обработку запросов по адресу <some_prefix>/some_id
 # позже подключим роутер к корневому роутеру
@@ -35,16 +64,20 @@ class Genre(BaseModel):
 )
 async def genre_details(
     genre_id: str,
+    if_none_match: Optional[str] = Header(None),
     genre_service: GenreService = Depends(get_genre_service),
-) -> Genre:
+    response_cache: ResponseCache = Depends(get_response_cache),
+) -> Response:
     """Детализация персоны при обращении к ручке api/v1/{person_id}.
 
     Args:
         genre_id: UUID персоны (актера, сценариста или режиссера).
+        if_none_match: ETag версии жанра, которая уже есть у клиента
         genre_service: DI - соединение с БД Elasticsearch и Redis.
+        response_cache: DI - кэш ответов (хэши карточек для ETag).
 
     Returns:
-        Genre - информация о жанре
+        Genre - информация о жанре (или 304, если у клиента та же версия)
 
     Raises:
         HTTPException: BAD_REQUEST - Если ошибка в запросе в формате UUID
@@ -54,18 +87,26 @@ async def genre_details(
         # Если не формат UUID, отдаём 400 статус
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='UUID type incorrect')
 
-    genre = await genre_service.get_by_id(genre_id)
-    if not genre:
+    async def build() -> Optional[bytes]:
+        genre = await genre_service.get_by_id(genre_id)
+        if not genre:
+            return None
+        # Перекладываем данные из `models.Genre` в `Genre`
+        # Модель бизнес-логики (для ответа API), как правило, отличается от общей модели данных
+        genre = Genre(uuid=genre.uuid, name=genre.name)
+        logger.debug('Объект для выдачи %s: %s', genre.__class__, genre)
+        return GENRE_ADAPTER.dump_json(genre)
+
+    # Если у клиента та же версия жанра (ETag из кэша), отдаём 304, не читая жанр
+    response = await response_cache.conditional_detail(
+        generate_cache_key('genres', {'uuid': genre_id}),
+        build,
+        if_none_match,
+    )
+    if response is None:
         # Если не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='genre not found')
-
-    # Перекладываем данные из `models.Genre` в `Genre`
-    # Модель бизнес-логики (для ответа API), как правило, отличается от общей модели данных
-
-    genre = Genre(uuid=genre.uuid, name=genre.name)
-    pretty_object = json.dumps(genre.model_dump(), default=serialize_uuid, indent=4)
-    logging.debug('Объект для выдачи {0}:\n{1}'.format(genre.__class__, pretty_object))
-    return genre
+    return response
 
 
 @router.get(
@@ -75,14 +116,20 @@ async def genre_details(
     description='Будут выданы все существующие жанры.',
 )
 async def all_genres(
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
     genre_service: GenreService = Depends(get_genre_service),
-) -> list[Genre]:
+    response_cache: ResponseCache = Depends(get_response_cache),
+) -> Response:
     """Функция для обработки запроса к еndpoint api/v1/genres/.
 
     Возвращает информацию о всех жанрах (не более 100).
 
     Args:
+        accept_encoding: Допустимые клиентом сжатия ответа
+        if_none_match: ETag версии списка, которая уже есть у клиента
         genre_service: Связь с сервисом для доступа жанров
+        response_cache: Кэш сжатых ответов
 
     Returns:
         Список жанров
@@ -90,12 +137,22 @@ async def all_genres(
     Raises:
         HTTPException: NOT_FOUND - Не найден ни один жанр
     """
-    genres = await genre_service.get_genres()
-    if not genres:
+    async def build() -> Optional[bytes]:
+        genres = await genre_service.get_genres()
+        if not genres:
+            return None
+        logger.debug('Объект для выдачи list[Genres]: %s', genres)
+        # Ответ клиенту без без description. Трансформация из model.Genre в Genre на лету
+        return encode_items(genres, GENRES_ADAPTER)
+
+    # Готовый ответ хранится в кэше сразу в нескольких сжатиях
+    response = await response_cache.get_or_build(
+        GENRES_CACHE_KEY,
+        accept_encoding,
+        build,
+        if_none_match,
+    )
+    if response is None:
         # Если не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='no genres in database')
-
-    logging.debug('Объект для выдачи list[Genres]:\n{0}'.format(genres))
-
-    # Ответ клиенту без без description. Трансформация из model.Genre в Genre на лету
-    return genres
+    return response
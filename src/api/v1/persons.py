@@ -1,18 +1,23 @@
 # -*- coding: utf-8 -*-
 """Модуль реализует API для доступа к информации о персоналиях."""
-import json
 import logging
 from http import HTTPStatus
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 
-from src.models.person import Filmography, PersonSearchQuery
-from src.models.validation import check_uuid, serialize_uuid
+from src.api.responses import list_response
+from src.db.redis import generate_cache_key
+from src.models.person import Filmography, PersonSearchQuery, PersonSuggestion
+from src.models.validation import check_uuid
 from src.services.film import FilmService, get_film_service
 from src.services.person import PersonService, get_person_service
+from src.services.response_cache import ResponseCache, get_response_cache
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -45,6 +50,10 @@ class Person(BaseModel):
     films: list[PortfolioFilm]
 
 
+PERSONS_ADAPTER = TypeAdapter(list[Person])
+PERSON_ADAPTER = TypeAdapter(Person)
+
+
 # Описываем обработчик для поиска персоны
 @router.get(
     '/search',
@@ -65,11 +74,56 @@ async def search_persons(
     Returns:
         Список персон удовлетворяющих поисковому запросу.
     """
-    return await person_service.search_person(
+    persons = await person_service.search_person(
         query_params.query,
         query_params.page_number,
         query_params.page_size,
     )
+    return list_response(persons, PERSONS_ADAPTER)
+
+
+@router.get(
+    '/suggest',
+    response_model=list[PersonSuggestion],
+    summary='Подсказки по началу имени персоны.',
+    description='Автодополнение: персоны, имя или фамилия которых начинается с prefix.',
+)
+async def suggest_persons(
+    prefix: str = Query(..., description='Beginning of person name or surname', min_length=1),
+    size: int = Query(10, description='Number of suggestions', ge=1, le=50),
+    person_service: PersonService = Depends(get_person_service),
+) -> list[PersonSuggestion]:
+    """Подсказки персон для поисковой строки (вызывается на каждое нажатие клавиши).
+
+    Args:
+        prefix: Начало имени или фамилии
+        size: Количество подсказок
+        person_service: Связь с сервисом для доступа к персонам
+
+    Returns:
+        Список подсказок (UUID и имя персоны)
+    """
+    return await person_service.suggest_persons(prefix, size)
+
+
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    summary='Выгрузка всех персоналий.',
+    description='Все персоны в формате NDJSON (одна персона в строке), без ограничения числа.',
+)
+async def export_persons(
+    person_service: PersonService = Depends(get_person_service),
+) -> StreamingResponse:
+    """Потоковая выгрузка всех персон при обращении к ручке api/v1/persons/export.
+
+    Args:
+        person_service: Связь с сервисом для доступа к персонам
+
+    Returns:
+        Потоковый ответ в формате NDJSON
+    """
+    return StreamingResponse(person_service.export_persons(), media_type='application/x-ndjson')
 
 
 # С помощью декоратора регистрируем обработчик person_details
@@ -84,16 +138,20 @@ async def search_persons(
 )
 async def person_details(
     person_id: str,
+    if_none_match: Optional[str] = Header(None),
     person_service: PersonService = Depends(get_person_service),
-) -> Person:
+    response_cache: ResponseCache = Depends(get_response_cache),
+) -> Response:
     """Детализация персоны при обращении к ручке api/v1/{person_id}.
 
     Args:
         person_id: UUID персоны (актера, сценариста или режиссера).
+        if_none_match: ETag версии персоны, которая уже есть у клиента
         person_service: DI - соединение с БД Elasticsearch и Redis.
+        response_cache: DI - кэш ответов (хэши карточек для ETag).
 
     Returns:
-        Person - информация о персоне
+        Person - информация о персоне (или 304, если у клиента та же версия)
 
     Raises:
         HTTPException: BAD_REQUEST - Если ошибка в запросе в формате UUID
@@ -103,20 +161,28 @@ async def person_details(
         # Если не формат UUID, отдаём 400 статус
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='UUID type incorrect')
 
-    person = await person_service.get_by_id(person_id)
-    if not person:
+    async def build() -> Optional[bytes]:
+        person = await person_service.get_by_id(person_id)
+        if not person:
+            return None
+        # Перекладываем данные из `models.Person` в `Person`
+        # Модель бизнес-логики (для ответа API), как правило, отличается от общей модели данных
+        # Если бы использовалась общая модель для бизнес-логики и формирования ответов API
+        # клиентам будут доступны лишние или секретные данные
+        person = Person(**person.model_dump())
+        logger.debug('Объект для выдачи %s: %s', person.__class__, person)
+        return PERSON_ADAPTER.dump_json(person)
+
+    # Если у клиента та же версия персоны (ETag из кэша), отдаём 304, не читая персону
+    response = await response_cache.conditional_detail(
+        generate_cache_key('persons', {'uuid': person_id}),
+        build,
+        if_none_match,
+    )
+    if response is None:
         # Если не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
-
-    # Перекладываем данные из `models.Person` в `Person`
-    # Модель бизнес-логики (для ответа API), как правило, отличается от общей модели данных
-    # Если бы использовалась общая модель для бизнес-логики и формирования ответов API
-    # клиентам будут доступны лишние или секретные данные
-
-    person = Person(**person.model_dump())
-    pretty_object = json.dumps(person.model_dump(), default=serialize_uuid, indent=4)
-    logging.debug('Объект для выдачи {0}:\n{1}'.format(person.__class__, pretty_object))
-    return person
+    return response
 
 
 @router.get(
@@ -155,6 +221,15 @@ async def person_films(
 
     filmography = []
     for film in person.films:
+        # название и рейтинг фильма хранятся в документе персоны (рейтинга у фильма может
+        # не быть), к сервису фильмов обращаемся только для документов, проиндексированных
+        # без денормализованных полей - у них нет названия
+        if film.title is not None:
+            filmography.append(
+                Filmography(uuid=film.uuid, title=film.title, imdb_rating=film.imdb_rating),
+            )
+            continue
+
         film_info = await film_service.get_by_uuid(str(film.uuid))
         if film_info:
             filmography.append(
@@ -172,13 +247,13 @@ async def person_films(
                 )
             else:
                 error_msg = 'Формат UUID фильма в БД неверный: {0}'.format(str(film.uuid))
-            logging.error(error_msg)
+            logger.error(error_msg)
 
     if not filmography:
         # Если не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='filmography not found')
 
-    logging.debug('Объект для выдачи list[Filmography]:\n{0}'.format(filmography))
+    logger.debug('Объект для выдачи list[Filmography]: %s', filmography)
     return filmography
 
 
@@ -209,7 +284,7 @@ async def all_persons(
         # Если не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='no genres in database')
 
-    logging.debug('Объект для выдачи list[Persons]:\n{0}'.format(persons))
+    logger.debug('Объект для выдачи list[Persons]: %s', persons)
 
-    # Ответ клиенту. Трансформация из model.Person в Person 'на лету'
-    return persons
+    # Ответ клиенту. Трансформация из model.Person в Person 'на лету' (большой список - потоком)
+    return list_response(persons, PERSONS_ADAPTER)
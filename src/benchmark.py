@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Микробенчмарк декодирования ответов Elasticsearch в модели по эндпойнтам API.
+
+Сравниваются три способа на синтетических документах той же формы, что пишет ETL:
+- прежний: полный _source документа и модель на каждый документ (Model(**source));
+- с фильтрацией: только поля модели (фильтрация _source), модель на каждый документ;
+- текущий: только поля модели и один вызов TypeAdapter на страницу.
+Во всех способах каждый документ проверяется pydantic полностью, поэтому выигрыш дают
+в основном поля, которые модели не нужны: в замер входит разбор JSON-ответа (его
+выполняет клиент ES) и проверка этих полей. Отдельно от фильтрации видна только
+экономия на обходе страницы внутри pydantic-core.
+
+Запуск:
+    python -m src.benchmark [--rounds 300] [--page-size 50]
+"""
+import argparse
+import json
+import time
+import uuid
+from typing import Callable, Optional
+
+from pydantic import TypeAdapter
+
+from src.models.decoding import decode_hits, source_fields
+from src.models.film import Film, FilmDetailed
+from src.models.genre import Genre
+from src.models.person import Person
+
+FILMS_ADAPTER = TypeAdapter(list[Film])
+PERSONS_ADAPTER = TypeAdapter(list[Person])
+GENRES_ADAPTER = TypeAdapter(list[Genre])
+
+
+def make_participants(count: int) -> list[dict]:
+    """Персоны фильма в формате документа movies.
+
+    Args:
+        count: Количество персон
+
+    Returns:
+        Список персон
+    """
+    return [
+        {'uuid': str(uuid.uuid4()), 'full_name': 'Firstname Lastname {0}'.format(num)}
+        for num in range(count)
+    ]
+
+
+def make_film() -> dict:
+    """Документ индекса movies (со служебными полями ETL).
+
+    Returns:
+        Исходные данные документа
+    """
+    actors = make_participants(8)
+    writers = make_participants(3)
+    return {
+        'uuid': str(uuid.uuid4()),
+        'title': 'Star Wars: Episode IV - A New Hope',
+        'imdb_rating': 8.6,
+        'type': 'movie',
+        'description': 'The Imperial Forces are holding Princess Leia hostage. ' * 5,
+        'genre': ['Action', 'Adventure', 'Fantasy'],
+        'genre_uuids': [str(uuid.uuid4()) for _ in range(3)],
+        'director': ['George Lucas'],
+        'actors_names': [actor['full_name'] for actor in actors],
+        'writers_names': [writer['full_name'] for writer in writers],
+        'actors': actors,
+        'writers': writers,
+        'similar': [str(uuid.uuid4()) for _ in range(20)],
+        'title_suggest': [{'input': ['Star Wars', 'Wars', 'Episode'], 'weight': 86}],
+    }
+
+
+def make_person() -> dict:
+    """Документ индекса persons.
+
+    Returns:
+        Исходные данные документа
+    """
+    films = [
+        {'uuid': str(uuid.uuid4()), 'title': 'Film', 'imdb_rating': 7.1, 'roles': ['actor']}
+        for _ in range(10)
+    ]
+    return {
+        'uuid': str(uuid.uuid4()),
+        'full_name': 'Firstname Lastname',
+        'films': films,
+        'full_name_suggest': [{'input': ['Firstname Lastname', 'Lastname'], 'weight': 10}],
+    }
+
+
+def make_genre() -> dict:
+    """Документ индекса genres.
+
+    Returns:
+        Исходные данные документа
+    """
+    return {'uuid': str(uuid.uuid4()), 'name': 'Action', 'description': 'Action films'}
+
+
+def search_response(sources: list[dict], fields: Optional[list[str]] = None) -> bytes:
+    """Тело ответа ES на поисковый запрос (с фильтрацией _source, если заданы поля).
+
+    Args:
+        sources: Исходные данные документов
+        fields: Возвращаемые поля документа
+
+    Returns:
+        JSON ответа
+    """
+    if fields is not None:
+        sources = [{key: source[key] for key in fields if key in source} for source in sources]
+    hits = [{'_index': 'idx', '_id': source['uuid'], '_source': source} for source in sources]
+    return json.dumps({'hits': {'hits': hits}}).encode()
+
+
+def measure(decode: Callable[[], object], rounds: int) -> float:
+    """Среднее время декодирования в микросекундах.
+
+    Args:
+        decode: Функция декодирования ответа
+        rounds: Количество повторов
+
+    Returns:
+        Время одного вызова (мкс)
+    """
+    decode()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        decode()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def endpoints(page_size: int) -> list[tuple]:
+    """Эндпойнты и соответствующие им способы декодирования.
+
+    Args:
+        page_size: Количество документов на странице выдачи
+
+    Returns:
+        Список (эндпойнт, прежний способ, с фильтрацией _source, текущий способ)
+    """
+    films = [make_film() for _ in range(page_size)]
+    persons = [make_person() for _ in range(page_size)]
+    genres = [make_genre() for _ in range(page_size)]
+
+    films_full = search_response(films)
+    films_short = search_response(films, source_fields(Film))
+    film_full = json.dumps(films[0]).encode()
+    film_short = json.dumps(
+        {key: films[0][key] for key in source_fields(FilmDetailed)},
+    ).encode()
+    persons_full = search_response(persons)
+    persons_short = search_response(persons, source_fields(Person))
+    genres_body = search_response(genres)
+
+    def hits(body: bytes) -> list[dict]:
+        return json.loads(body)['hits']['hits']
+
+    return [
+        (
+            'GET /films, /films/search',
+            lambda: [Film(**hit['_source']) for hit in hits(films_full)],
+            lambda: [Film(**hit['_source']) for hit in hits(films_short)],
+            lambda: decode_hits(FILMS_ADAPTER, hits(films_short)),
+        ),
+        (
+            'GET /films/{id}',
+            lambda: FilmDetailed(**json.loads(film_full)),
+            lambda: FilmDetailed(**json.loads(film_short)),
+            lambda: FilmDetailed(**json.loads(film_short)),
+        ),
+        (
+            'GET /persons/search',
+            lambda: [Person(**hit['_source']) for hit in hits(persons_full)],
+            lambda: [Person(**hit['_source']) for hit in hits(persons_short)],
+            lambda: decode_hits(PERSONS_ADAPTER, hits(persons_short)),
+        ),
+        (
+            'GET /genres',
+            lambda: [Genre(**hit['_source']) for hit in hits(genres_body)],
+            lambda: [Genre(**hit['_source']) for hit in hits(genres_body)],
+            lambda: decode_hits(GENRES_ADAPTER, hits(genres_body)),
+        ),
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=300)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+
+    print('{0:<28}{1:>14}{2:>16}{3:>14}{4:>10}'.format(
+        'endpoint', 'before, us', 'filtered, us', 'after, us', 'speedup',
+    ))
+    for endpoint, before, filtered, after in endpoints(args.page_size):
+        before_us = measure(before, args.rounds)
+        filtered_us = measure(filtered, args.rounds)
+        after_us = measure(after, args.rounds)
+        print('{0:<28}{1:>14.1f}{2:>16.1f}{3:>14.1f}{4:>9.2f}x'.format(
+            endpoint, before_us, filtered_us, after_us, before_us / after_us,
+        ))
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Контроль допуска запросов (admission control) и сброс нагрузки.
+
+При перегрузке лишние запросы не должны копиться в очередях к ES и Redis, пока клиенты
+не отвалятся по таймауту: такие запросы выполняются впустую, а пропускная способность падает.
+Поэтому одновременное количество запросов к базам ограничивается:
+- общим адаптивным лимитом (AIMD): лимит растёт на 1, пока ответы укладываются
+  в ADMISSION_LATENCY_TARGET, и уменьшается в ADMISSION_BACKOFF раз при медленных ответах
+  и ответах 503/504 (не чаще раза за ADMISSION_LATENCY_TARGET, чтобы одна волна
+  медленных ответов снижала лимит один раз). Длительность считается до начала ответа:
+  передача тела медленному клиенту не говорит о перегрузке баз;
+- статическим лимитом на класс маршрутов (ADMISSION_ROUTE_LIMITS).
+Запрос сверх общего лимита ждёт в ограниченной очереди не дольше ADMISSION_QUEUE_TIMEOUT
+и крайнего срока запроса. Дешёвые запросы по UUID (чаще всего из кэша) обслуживаются из
+очереди первыми и при заполненной очереди вытесняют дорогие (поиск и списки).
+Отказ - сразу 503 с заголовком Retry-After.
+
+Лимиты действуют в пределах рабочего процесса.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi.responses import ORJSONResponse
+
+from src.core import config
+from src.core.deadline import time_left
+
+logger = logging.getLogger(__name__)
+
+# приоритеты ожидания в очереди (меньше - раньше)
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+# класс маршрута по пути запроса; пути, не попавшие ни в один класс, не ограничиваются
+ROUTE_CLASSES = (
+    (re.compile(r'^/api/v1/(films|persons|genres)/export$'), 'export'),
+    (re.compile(r'^/api/v1/(films|persons)/(search|suggest)$'), 'search'),
+    (re.compile(r'^/api/v1/films/facets$'), 'list'),
+    (re.compile(r'^/api/v1/(films|persons|genres)/?$'), 'list'),
+    (re.compile(r'^/api/v1/(films|persons|genres)/[^/]+(/film)?/?$'), 'detail'),
+)
+# выгрузки идут долго, поэтому ограничиваются только своим лимитом и не влияют на общий
+ADAPTIVE_CLASSES = frozenset(('search', 'list', 'detail'))
+PRIORITIES = {'detail': PRIORITY_HIGH}
+
+
+def route_class(path: str) -> Optional[str]:
+    """Определяет класс маршрута по пути запроса.
+
+    Args:
+        path: Путь запроса
+
+    Returns:
+        Класс маршрута или None, если запрос не ограничивается
+    """
+    for pattern, name in ROUTE_CLASSES:
+        if pattern.match(path):
+            return name
+    return None
+
+
+class AdaptiveLimiter:
+    """Адаптивный (AIMD) лимит одновременных запросов с приоритетной очередью ожидания."""
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        queue_size: int,
+    ):
+        """Инициализация лимита.
+
+        Args:
+            initial_limit: Начальный лимит
+            min_limit: Нижняя граница лимита
+            max_limit: Верхняя граница лимита
+            queue_size: Максимальное количество ожидающих запросов
+        """
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.successes = 0
+        self.last_decrease = float('-inf')
+        self.waiters: dict[int, deque] = {PRIORITY_HIGH: deque(), PRIORITY_LOW: deque()}
+
+    @property
+    def waiting(self) -> int:
+        """Количество ожидающих в очереди запросов."""
+        return sum(len(waiters) for waiters in self.waiters.values())
+
+    async def acquire(self, priority: int, timeout: Optional[float]) -> bool:
+        """Занимает место под запрос, при необходимости ожидая в очереди.
+
+        Args:
+            priority: Приоритет запроса
+            timeout: Максимальное время ожидания (сек.)
+
+        Returns:
+            True, если место получено, иначе False (запрос нужно отклонить)
+        """
+        if self.in_flight < self.limit and not self.waiting:
+            self.in_flight += 1
+            return True
+        if timeout is not None and timeout <= 0:
+            return False
+        if self.waiting >= self.queue_size and not self._evict(priority):
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            # клиент отключился, пока запрос ждал в очереди
+            self._abandon(priority, waiter)
+            raise
+        if not waiter.done():
+            self._abandon(priority, waiter)
+            return False
+        # место передаётся ожидающему вместе с результатом True (in_flight не меняется)
+        return waiter.result()
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        """Освобождает место и подстраивает лимит по результату запроса.
+
+        Args:
+            latency: Длительность обработки запроса до начала ответа (сек.)
+            overloaded: Запрос завершился признаком перегрузки (503/504)
+        """
+        target = config.settings.ADMISSION_LATENCY_TARGET
+        if overloaded or latency > target:
+            # запросы, выполнявшиеся одновременно, сообщают об одной и той же перегрузке:
+            # лимит снижается один раз за окно, а не на каждый медленный ответ
+            now = time.monotonic()
+            if now - self.last_decrease >= target:
+                decreased = int(self.limit * config.settings.ADMISSION_BACKOFF)
+                self.limit = max(self.min_limit, decreased)
+                self.last_decrease = now
+            self.successes = 0
+        else:
+            self.successes += 1
+            if self.successes >= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.successes = 0
+
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.limit and self._wake_next():
+            self.in_flight += 1
+
+    def _abandon(self, priority: int, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.cancel()
+            self.waiters[priority].remove(waiter)
+        elif waiter.result():
+            # место уже было передано запросу, который больше не ждёт, - отдаём следующему
+            self.in_flight -= 1
+            self._dispatch()
+
+    def _wake_next(self) -> bool:
+        for priority in sorted(self.waiters):
+            waiters = self.waiters[priority]
+            if waiters:
+                waiters.popleft().set_result(True)
+                return True
+        return False
+
+    def _evict(self, priority: int) -> bool:
+        # место в заполненной очереди освобождается за счёт последнего менее приоритетного
+        for lower in sorted(self.waiters, reverse=True):
+            if lower <= priority:
+                return False
+            if self.waiters[lower]:
+                self.waiters[lower].pop().set_result(False)
+                return True
+        return False
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware контроля допуска запросов."""
+
+    def __init__(self, app):
+        """Инициализация middleware.
+
+        Args:
+            app: Следующее ASGI-приложение
+        """
+        self.app = app
+        self.limiter = AdaptiveLimiter(
+            initial_limit=config.settings.ADMISSION_INITIAL_LIMIT,
+            min_limit=config.settings.ADMISSION_MIN_LIMIT,
+            max_limit=config.settings.ADMISSION_MAX_LIMIT,
+            queue_size=config.settings.ADMISSION_QUEUE_SIZE,
+        )
+        self.route_in_flight: dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        """Обрабатывает запрос с учётом лимитов.
+
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive
+            send: ASGI send
+        """
+        name = None
+        if scope['type'] == 'http' and config.settings.ADMISSION_ENABLED:
+            name = route_class(scope['path'])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_limit = config.settings.ADMISSION_ROUTE_LIMITS.get(name)
+        in_flight = self.route_in_flight.get(name, 0)
+        if route_limit is not None and in_flight >= route_limit:
+            await self._reject(scope, receive, send, name)
+            return
+
+        # место в лимите класса занимается до ожидания в общей очереди, иначе лимит
+        # могли бы пройти сколько угодно запросов, которые затем дождутся очереди
+        self.route_in_flight[name] = in_flight + 1
+        try:
+            await self._admit(scope, receive, send, name)
+        finally:
+            self.route_in_flight[name] -= 1
+
+    async def _admit(self, scope, receive, send, name: str) -> None:
+        adaptive = name in ADAPTIVE_CLASSES
+        if adaptive:
+            timeout = config.settings.ADMISSION_QUEUE_TIMEOUT
+            remaining = time_left()
+            if remaining is not None:
+                timeout = min(timeout, remaining)
+            if not await self.limiter.acquire(PRIORITIES.get(name, PRIORITY_LOW), timeout):
+                await self._reject(scope, receive, send, name)
+                return
+
+        status = {}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+                status['responded'] = time.monotonic()
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if adaptive:
+                overloaded = status.get('code', HTTPStatus.INTERNAL_SERVER_ERROR) in {
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    HTTPStatus.GATEWAY_TIMEOUT,
+                }
+                # время передачи тела (поток, медленный клиент) в задержку не входит
+                responded = status.get('responded', time.monotonic())
+                self.limiter.release(responded - started, overloaded)
+
+    async def _reject(self, scope, receive, send, name: str) -> None:
+        logger.warning(
+            'Запрос отклонён (%s): лимит %s, выполняется %s, ожидает %s',
+            name, self.limiter.limit, self.limiter.in_flight, self.limiter.waiting,
+        )
+        response = ORJSONResponse(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            content={'detail': 'service overloaded, retry later'},
+            headers={'Retry-After': str(config.settings.ADMISSION_RETRY_AFTER)},
+        )
+        await response(scope, receive, send)
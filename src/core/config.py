@@ -1,9 +1,9 @@
 """Конфигурация backend-приложения movies."""
-from logging import config as logging_config
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
-from src.core.logger import LOGGING
+from src.core.logger import configure_logging
 
 
 class Settings(BaseSettings):
@@ -16,14 +16,100 @@ class Settings(BaseSettings):
 
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_MAX_CONNECTIONS: int = 50  # Размер пула соединений Redis (на рабочий процесс)
+    REDIS_POOL_TIMEOUT: float = 5.0  # Ожидание свободного соединения при исчерпании пула (сек.)
+    REDIS_POOL_PREFILL: int = 10  # Сколько соединений открыть при старте
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # Таймаут операции с сокетом (сек.)
+    REDIS_CONNECT_TIMEOUT: float = 2.0  # Таймаут подключения (сек.)
+    REDIS_KEEPALIVE: bool = True  # TCP keepalive для соединений
+    REDIS_HIREDIS: bool = True  # Разбор ответов парсером hiredis (на C)
       
     CACHE_TIME_LIFE: int  # Время жизни кэша Redis
 
+    API_HOST: str = '0.0.0.0'  # Адрес и порт, на которых API принимает запросы
+    API_PORT: int = 8000
+    WORKERS: int = 0  # Количество рабочих процессов (0 - по числу ядер)
+    WORKER_MAX_REQUESTS: int = 10000  # Рабочий процесс перезапускается после стольких запросов
+    WORKER_MAX_REQUESTS_JITTER: int = 1000  # Разброс порога, чтобы процессы не рестартовали разом
+    WORKER_GRACEFUL_TIMEOUT: int = 30  # Время (сек.) на завершение текущих запросов при рестарте
+    WORKER_KEEPALIVE: int = 5  # Время (сек.) удержания keep-alive соединения (от nginx)
+
     ES_HOST: str
     ES_PORT: int
+    ES_CONNECTIONS_PER_NODE: int = 10  # Размер пула соединений с узлом ES (на рабочий процесс)
+    ES_POOL_PREFILL: int = 10  # Сколько соединений открыть при старте
+    ES_REQUEST_TIMEOUT: float = 10.0  # Таймаут запроса по умолчанию (сек.)
+    ES_HTTP_COMPRESS: bool = True  # Сжатие gzip тел запросов и ответов
+    ES_EXPORT_PAGE_SIZE: int = 1000  # Размер страницы при выгрузке индекса целиком (NDJSON)
+
+    STREAM_THRESHOLD: int = 1000  # Списки длиннее (объектов) отдаются потоком
+    STREAM_CHUNK_SIZE: int = 500  # Объектов в одной части потокового ответа
+    # Максимальный page_size списков: страница целиком загружается из ES в память,
+    # потоком отдаётся только её сериализация (STREAM_THRESHOLD)
+    MAX_PAGE_SIZE: int = 2000
+
+    REQUEST_DEADLINE: float = 5.0  # Крайний срок обработки запроса (сек.), ограничивает вызовы ES
+    ES_HEDGING: bool = False  # Дублировать чтение из ES, если ответ дольше наблюдаемого p95
+
+    ADMISSION_ENABLED: bool = True  # Ограничивать одновременные запросы (503 при перегрузке)
+    ADMISSION_INITIAL_LIMIT: int = 20  # Начальный общий лимит одновременных запросов
+    ADMISSION_MIN_LIMIT: int = 4  # Нижняя граница адаптивного лимита
+    ADMISSION_MAX_LIMIT: int = 200  # Верхняя граница адаптивного лимита
+    ADMISSION_LATENCY_TARGET: float = 0.3  # Ответ дольше (сек.) считается признаком перегрузки
+    ADMISSION_BACKOFF: float = 0.9  # Во сколько раз уменьшается лимит при перегрузке
+    ADMISSION_QUEUE_SIZE: int = 100  # Сколько запросов может ждать освобождения лимита
+    ADMISSION_QUEUE_TIMEOUT: float = 1.0  # Максимальное ожидание в очереди (сек.)
+    ADMISSION_RETRY_AFTER: int = 1  # Значение заголовка Retry-After при отказе (сек.)
+    # Лимиты одновременных запросов по классам маршрутов (export, search, list, detail)
+    ADMISSION_ROUTE_LIMITS: dict[str, int] = {
+        'export': 2,
+        'search': 50,
+        'list': 50,
+        'detail': 100,
+    }
+
+    CATALOG_INDEX_ENABLED: bool = False  # Отдавать списки фильмов из копии каталога в памяти
+    CATALOG_REFRESH_INTERVAL: float = 30.0  # Период обновления копии каталога (сек.)
+
+    REPLICA_PATH: Optional[str] = None  # Файл LMDB-реплики от ETL для чтения документов по UUID
+
+    SLOW_QUERY_THRESHOLD: float = 0.5  # Запрос к ES дольше порога (сек.) попадает в журнал
+    SLOW_QUERY_BUFFER_SIZE: int = 100  # Сколько последних медленных запросов хранить
+    SLOW_QUERY_PROFILE_RATE: float = 0.1  # Доля медленных запросов, повторяемых с profile=true
+
+    RETRY_MAX_ATTEMPTS: int = 3  # Попыток вызова ES и чтения из Redis при временной ошибке
+    RETRY_BASE_DELAY: float = 0.02  # Минимальная пауза между попытками (сек.)
+    RETRY_MAX_DELAY: float = 0.5  # Максимальная пауза между попытками (сек.)
+    # Бюджет повторов рабочего процесса: запас повторов и скорость его пополнения (в секунду)
+    RETRY_BUDGET_CAPACITY: int = 20
+    RETRY_BUDGET_REFILL_RATE: float = 5.0
+
+    # Доля записываемых сообщений ниже WARNING по имени логгера (остальные отбрасываются),
+    # например {"src.services.film": 0.01}; по умолчанию записываются все сообщения
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+    LOG_QUEUE_SIZE: int = 10000  # Максимум записей лога, ожидающих записи в фоновом потоке
+
+    RESPONSE_COMPRESSION_ENABLED: bool = True  # Хранить готовые ответы списков и в сжатом виде
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1000  # Ответы меньше (байт) не сжимаются
+
+    HTTP_CACHE_MAX_AGE: int = 0  # max-age в Cache-Control (0 - перепроверять по ETag каждый раз)
+
+    METRICS_ENABLED: bool = True  # Сбор метрик Prometheus и эндпоинт /metrics
+    # Заголовок Server-Timing во всех ответах (иначе - только на запросы с X-Server-Timing)
+    SERVER_TIMING_ENABLED: bool = False
+
+    LOOP_MONITOR_ENABLED: bool = True  # Измерять задержку цикла событий (event_loop_lag_seconds)
+    LOOP_MONITOR_INTERVAL: float = 0.5  # Интервал измерения задержки цикла событий (сек.)
+    LOOP_BLOCK_DETECTION: bool = False  # Писать в лог стек кода, блокирующего цикл событий
+    LOOP_BLOCK_THRESHOLD: float = 0.1  # Блокировка дольше порога (сек.) попадает в лог
+
+    PROFILE_INTERVAL: float = 0.005  # Интервал между замерами стеков профилировщика (сек.)
+    PROFILE_BUFFER_SIZE: int = 20  # Сколько последних профилей запросов хранить
+
+    ADMIN_TOKEN: Optional[str] = None  # Токен служебного API (X-Admin-Token), иначе оно отключено
 
 
 settings = Settings()  # type: ignore
 
 # Применяем настройки логирования
-logging_config.dictConfig(LOGGING)
+configure_logging(settings.LOG_SAMPLE_RATES, settings.LOG_QUEUE_SIZE)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Крайний срок (deadline) обработки запроса.
+
+Срок устанавливается middleware при получении запроса и через contextvars доступен
+всем вызовам Elasticsearch, сделанным в рамках этого запроса.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from src.core import config
+
+# момент (по time.monotonic), после которого ответ клиенту уже не нужен
+request_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Истёк крайний срок обработки запроса."""
+
+
+def set_deadline(timeout: float) -> None:
+    """Устанавливает крайний срок обработки текущего запроса.
+
+    Args:
+        timeout: Время на обработку запроса в секундах
+    """
+    request_deadline.set(time.monotonic() + timeout)
+
+
+def time_left() -> Optional[float]:
+    """Оставшееся до крайнего срока время.
+
+    Returns:
+        Время в секундах или None, если срок не установлен
+
+    Raises:
+        DeadlineExceeded: Если срок уже истёк
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded('Request deadline exceeded')
+    return remaining
+
+
+class DeadlineMiddleware:
+    """ASGI-middleware: устанавливает крайний срок обработки запроса."""
+
+    def __init__(self, app):
+        """Инициализация middleware.
+
+        Args:
+            app: Следующее ASGI-приложение
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Обрабатывает запрос в пределах крайнего срока REQUEST_DEADLINE.
+
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive
+            send: ASGI send
+        """
+        if scope['type'] == 'http':
+            # все вызовы ES в рамках запроса ограничены этим сроком
+            set_deadline(config.settings.REQUEST_DEADLINE)
+        await self.app(scope, receive, send)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""ETag и условные GET-запросы (If-None-Match -> 304 Not Modified).
+
+ETag - хэш тела ответа без сжатия. У сжатого варианта к хэшу добавляется кодировка
+("<хэш>-br"): строгий ETag должен различаться у разных представлений, а при сравнении
+с If-None-Match кодировка отбрасывается, поэтому клиент, получивший ответ в gzip, получит
+304 и на запрос с другим Accept-Encoding. Заголовок Cache-Control разрешает nginx и CDN
+хранить ответ и перепроверять его дешёвым условным запросом.
+"""
+import hashlib
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import Response
+
+from src.core import config
+
+IDENTITY = 'identity'
+JSON_MEDIA_TYPE = 'application/json'
+
+
+def content_hash(body: bytes) -> str:
+    """Хэш тела ответа.
+
+    Args:
+        body: Тело ответа без сжатия
+
+    Returns:
+        Хэш в шестнадцатеричном виде
+    """
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def make_etag(digest: str, coding: str = IDENTITY) -> str:
+    """Строгий ETag представления ответа.
+
+    Args:
+        digest: Хэш тела ответа без сжатия
+        coding: Кодировка (сжатие) тела
+
+    Returns:
+        Значение заголовка ETag
+    """
+    if coding == IDENTITY:
+        return '"{0}"'.format(digest)
+    return '"{0}-{1}"'.format(digest, coding)
+
+
+def etag_matches(if_none_match: Optional[str], digest: str) -> bool:
+    """Проверяет, есть ли у клиента актуальная версия ответа.
+
+    Args:
+        if_none_match: Значение заголовка If-None-Match
+        digest: Хэш текущего тела ответа
+
+    Returns:
+        True, если можно ответить 304
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        # для If-None-Match используется слабое сравнение (префикс W/ не важен)
+        tag = tag.removeprefix('W/').strip('"')
+        if tag.partition('-')[0] == digest:
+            return True
+    return False
+
+
+def cache_headers(digest: str, coding: str = IDENTITY) -> dict[str, str]:
+    """Заголовки кэширования ответа.
+
+    Args:
+        digest: Хэш тела ответа без сжатия
+        coding: Кодировка (сжатие) тела
+
+    Returns:
+        Заголовки ETag, Cache-Control и Vary
+    """
+    return {
+        'ETag': make_etag(digest, coding),
+        'Cache-Control': 'public, max-age={0}, must-revalidate'.format(
+            config.settings.HTTP_CACHE_MAX_AGE,
+        ),
+        'Vary': 'Accept-Encoding',
+    }
+
+
+def not_modified(digest: str, coding: str = IDENTITY) -> Response:
+    """Ответ 304 Not Modified (без тела).
+
+    Args:
+        digest: Хэш тела ответа без сжатия
+        coding: Кодировка, в которой клиент получил бы тело
+
+    Returns:
+        Ответ 304
+    """
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=cache_headers(digest, coding))
+
+
+def conditional_json(body: bytes, if_none_match: Optional[str]) -> Response:
+    """Ответ с телом JSON или 304, если у клиента то же тело.
+
+    Args:
+        body: Тело ответа (JSON)
+        if_none_match: Значение заголовка If-None-Match
+
+    Returns:
+        Ответ с телом и ETag или 304
+    """
+    digest = content_hash(body)
+    if etag_matches(if_none_match, digest):
+        return not_modified(digest)
+    return Response(body, media_type=JSON_MEDIA_TYPE, headers=cache_headers(digest))
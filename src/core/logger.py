@@ -1,4 +1,20 @@
 # -*- coding: utf-8 -*-
+"""Настройки логирования.
+
+Обработчики (форматирование и запись в поток) работают в отдельном потоке QueueListener:
+в обработчике запроса запись лога только помещается в очередь. Сообщения ниже WARNING
+от многословных логгеров (например, попадания в кэш) выборочно отбрасываются ещё до
+постановки в очередь, а при переполнении очереди запись теряется, но запрос не ждёт.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+from logging import config as logging_config
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DEFAULT_HANDLERS = [
     'console',
@@ -61,3 +77,128 @@ LOGGING = {
         'handlers': LOG_DEFAULT_HANDLERS,
     },
 }
+# логгеры, обработчики которых переносятся в фоновый поток
+QUEUED_LOGGERS = ('', 'uvicorn.access')
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю сообщений ниже WARNING, заданную для логгера или его родителя."""
+
+    def __init__(self, sample_rates: dict[str, float]):
+        """Инициализация фильтра.
+
+        Args:
+            sample_rates: Доля пропускаемых сообщений по имени логгера (от 0 до 1)
+        """
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rates_cache: dict[str, Optional[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Решает, пропустить ли сообщение.
+
+        Args:
+            record: Запись лога
+
+        Returns:
+            True, если сообщение нужно записать
+        """
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate is None or random.random() < rate
+
+    def rate(self, name: str) -> Optional[float]:
+        """Доля пропускаемых сообщений логгера с учётом иерархии имён.
+
+        Args:
+            name: Имя логгера
+
+        Returns:
+            Доля пропускаемых сообщений или None, если выборка не задана
+        """
+        if name not in self.rates_cache:
+            rate = None
+            parts = name.split('.')
+            while parts:
+                rate = self.sample_rates.get('.'.join(parts))
+                if rate is not None:
+                    break
+                parts.pop()
+            self.rates_cache[name] = rate
+        return self.rates_cache[name]
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Помещает запись в очередь без форматирования и без ожидания."""
+
+    def __init__(self, log_queue: queue.Queue):
+        """Инициализация обработчика.
+
+        Args:
+            log_queue: Очередь записей, разбираемая QueueListener
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Оставляет форматирование обработчикам в фоновом потоке.
+
+        Очередь живёт внутри процесса, поэтому запись не нужно сериализовать.
+
+        Args:
+            record: Запись лога
+
+        Returns:
+            Та же запись
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Ставит запись в очередь, при переполнении отбрасывает её.
+
+        Args:
+            record: Запись лога
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(sample_rates: dict[str, float], queue_size: int) -> list[QueueListener]:
+    """Применяет LOGGING и переносит обработчики логгеров в фоновые потоки.
+
+    Args:
+        sample_rates: Доля пропускаемых сообщений ниже WARNING по имени логгера
+        queue_size: Максимальное количество записей в очереди логгера
+
+    Returns:
+        Запущенные QueueListener (по одному на логгер из QUEUED_LOGGERS)
+    """
+    logging_config.dictConfig(LOGGING)
+
+    sampling = SamplingFilter(sample_rates)
+    listeners = []
+    queue_handlers = []
+    for name in QUEUED_LOGGERS:
+        queued_logger = logging.getLogger(name)
+        log_queue: queue.Queue = queue.Queue(queue_size)
+        listener = QueueListener(log_queue, *queued_logger.handlers, respect_handler_level=True)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(sampling)
+        queued_logger.handlers = [queue_handler]
+        listener.start()
+        atexit.register(listener.stop)
+        listeners.append(listener)
+        queue_handlers.append(queue_handler)
+
+    def restart_listeners() -> None:
+        # потоки не переживают fork (рабочие процессы gunicorn): в дочернем процессе
+        # запускаются новые с новыми очередями
+        for listener, queue_handler in zip(listeners, queue_handlers):
+            listener.queue = queue_handler.queue = queue.Queue(queue_size)
+            listener.start()
+
+    os.register_at_fork(after_in_child=restart_listeners)
+    return listeners
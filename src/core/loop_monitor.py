@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Контроль задержки цикла событий.
+
+Синхронная работа в цикле событий (форматирование, валидация больших списков, блокирующий
+ввод-вывод) задерживает все одновременные запросы рабочего процесса. Фоновая задача
+засыпает на фиксированный интервал и измеряет, насколько позже запланированного она
+проснулась: эта задержка (lag) попадает в метрику event_loop_lag_seconds.
+
+При LOOP_BLOCK_DETECTION отдельный поток следит за отметками фоновой задачи: если цикл
+событий не отвечает дольше LOOP_BLOCK_THRESHOLD, поток снимает стек потока цикла событий
+(то есть код, который его сейчас блокирует) и пишет его в лог.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from src.core.metrics import observe_loop_blocked, observe_loop_lag
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Измеряет задержку цикла событий и находит блокирующий код."""
+
+    def __init__(self, interval: float, block_threshold: Optional[float] = None):
+        """Инициализация монитора.
+
+        Args:
+            interval: Интервал измерения задержки (сек.)
+            block_threshold: Порог блокировки цикла событий (сек.), None - не искать блокировки
+        """
+        self.block_threshold = block_threshold
+        self.interval = interval
+        if block_threshold is not None:
+            # отметка должна обновляться чаще порога, иначе короткие блокировки не видны
+            self.interval = min(interval, block_threshold / 2)
+        self.last_beat = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self.stopped = threading.Event()
+
+    async def run(self) -> None:
+        """Измеряет задержку цикла событий, пока задача не будет отменена."""
+        loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        watchdog = None
+        if self.block_threshold is not None:
+            watchdog = threading.Thread(target=self.watch, name='loop-watchdog', daemon=True)
+            watchdog.start()
+        try:
+            while True:
+                started = loop.time()
+                await asyncio.sleep(self.interval)
+                observe_loop_lag(max(0.0, loop.time() - started - self.interval))
+                self.last_beat = time.monotonic()
+        finally:
+            self.stopped.set()
+
+    def watch(self) -> None:
+        """Ищет блокировки цикла событий (выполняется в отдельном потоке)."""
+        reported_beat = None
+        while not self.stopped.wait(self.block_threshold / 4):
+            beat = self.last_beat
+            blocked = time.monotonic() - beat
+            if blocked <= self.block_threshold or beat == reported_beat:
+                continue
+            # о каждой блокировке сообщаем один раз
+            reported_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            observe_loop_blocked()
+            logger.warning(
+                'Цикл событий заблокирован дольше %.3f с, стек:\n%s',
+                blocked,
+                ''.join(traceback.format_stack(frame)),
+            )
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Метрики Prometheus: задержка запросов API, попадания в кэш, задержка вызовов ES и Redis.
+
+Метрики отдаются эндпоинтом /metrics. При нескольких рабочих процессах (python -m src.run)
+каждый процесс пишет значения в файлы каталога PROMETHEUS_MULTIPROC_DIR, а /metrics
+собирает их по всем процессам. При METRICS_ENABLED=False значения не записываются:
+остальные модули записывают метрики только через функции этого модуля, которые это проверяют.
+"""
+import functools
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from src.core import config
+from src.core.admission import route_class
+from src.core.timing import CACHE_READ, span
+
+# границы корзин гистограмм (сек.): от попадания в кэш до крайнего срока запроса
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# метка маршрута для запросов, не попавших ни в один маршрут (чтобы не плодить метки)
+UNMATCHED_ROUTE = 'unmatched'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Длительность обработки запроса API',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'Количество выполняющихся запросов API',
+    ['endpoint'],
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests',
+    'Чтения из кэша Redis по результату (hit, miss, error)',
+    ['index', 'method', 'result'],
+)
+ELASTIC_LATENCY = Histogram(
+    'elasticsearch_request_duration_seconds',
+    'Длительность запроса к Elasticsearch',
+    ['index', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_LATENCY = Histogram(
+    'redis_command_duration_seconds',
+    'Длительность команды Redis',
+    ['command'],
+    buckets=LATENCY_BUCKETS,
+)
+RETRIES = Counter(
+    'retries',
+    'Повторы вызовов ES и Redis по результату (retry, exhausted, budget)',
+    ['operation', 'outcome'],
+)
+LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'Задержка цикла событий относительно запланированного времени',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+LOOP_BLOCKED = Counter(
+    'event_loop_blocked',
+    'Блокировки цикла событий дольше LOOP_BLOCK_THRESHOLD',
+)
+
+
+def cache_lookup(index: str) -> Callable:
+    """Декоратор метода чтения из кэша: считает попадания, промахи и ошибки.
+
+    Промахом считается пустой результат (None или пустой список).
+    Длительность чтения учитывается в Server-Timing запроса.
+
+    Args:
+        index: Индекс, данные которого кэшируются
+
+    Returns:
+        Декоратор
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        hit = CACHE_REQUESTS.labels(index, func.__name__, 'hit')
+        miss = CACHE_REQUESTS.labels(index, func.__name__, 'miss')
+        error = CACHE_REQUESTS.labels(index, func.__name__, 'error')
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            enabled = config.settings.METRICS_ENABLED
+            try:
+                with span(CACHE_READ):
+                    cached = await func(*args, **kwargs)
+            except Exception:
+                if enabled:
+                    error.inc()
+                raise
+            if enabled:
+                (hit if cached else miss).inc()
+            return cached
+
+        return wrapper
+
+    return decorator
+
+
+def observe_cache(index: str, method: str, hit: bool) -> None:
+    """Учитывает чтение из кэша, выполненное не отдельным методом.
+
+    Args:
+        index: Индекс, данные которого кэшируются
+        method: Метод сервиса
+        hit: Данные найдены в кэше
+    """
+    if not config.settings.METRICS_ENABLED:
+        return
+    CACHE_REQUESTS.labels(index, method, 'hit' if hit else 'miss').inc()
+
+
+def observe_elastic(index: Optional[str], method: str, duration: float) -> None:
+    """Учитывает длительность запроса к Elasticsearch.
+
+    Args:
+        index: Индекс запроса
+        method: Метод клиента Elasticsearch
+        duration: Длительность (сек.)
+    """
+    if not config.settings.METRICS_ENABLED:
+        return
+    ELASTIC_LATENCY.labels(index or '', method).observe(duration)
+
+
+def observe_redis(command: str, duration: float) -> None:
+    """Учитывает длительность команды Redis.
+
+    Args:
+        command: Команда Redis
+        duration: Длительность (сек.)
+    """
+    if not config.settings.METRICS_ENABLED:
+        return
+    REDIS_LATENCY.labels(command).observe(duration)
+
+
+def observe_retry(operation: str, outcome: str) -> None:
+    """Учитывает решение о повторе вызова.
+
+    Args:
+        operation: Вызываемая система (elasticsearch, redis)
+        outcome: Результат (retry, exhausted, budget)
+    """
+    if not config.settings.METRICS_ENABLED:
+        return
+    RETRIES.labels(operation, outcome).inc()
+
+
+def observe_loop_lag(lag: float) -> None:
+    """Учитывает задержку цикла событий.
+
+    Args:
+        lag: Задержка (сек.)
+    """
+    if not config.settings.METRICS_ENABLED:
+        return
+    LOOP_LAG.observe(lag)
+
+
+def observe_loop_blocked() -> None:
+    """Учитывает блокировку цикла событий."""
+    if not config.settings.METRICS_ENABLED:
+        return
+    LOOP_BLOCKED.inc()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запросов по шаблону маршрута и выполняющиеся запросы."""
+
+    def __init__(self, app):
+        """Инициализация middleware.
+
+        Args:
+            app: Следующее ASGI-приложение
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Обрабатывает запрос, замеряя его длительность.
+
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive
+            send: ASGI send
+        """
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = {}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(route_class(scope['path']) or 'other')
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # шаблон маршрута (/api/v1/films/{film_uuid}) FastAPI кладёт в scope при маршрутизации
+            route = scope.get('route')
+            REQUEST_LATENCY.labels(
+                scope['method'],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                status.get('code', 500),
+            ).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Метрики в текстовом формате Prometheus.
+
+    Returns:
+        Тело ответа и его Content-Type
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Статистический профилировщик работающего API.
+
+Фоновый поток раз в PROFILE_INTERVAL снимает стеки потоков процесса (sys._current_frames)
+и считает одинаковые стеки. Результат отдаётся в формате collapsed stacks
+(«кадр;кадр;кадр количество» в строке), который принимают flamegraph.pl и speedscope.
+
+Два режима:
+- профиль процесса за N секунд по всем запросам (служебный эндпоинт /api/v1/admin/profile);
+- профиль одного запроса по заголовку X-Profile (вместе с X-Admin-Token): учитываются только
+  моменты, когда цикл событий выполняет задачу этого запроса, т.е. время CPU запроса,
+  а не ожидание ES и Redis. Профили последних запросов доступны в /api/v1/admin/profile/requests.
+
+Профилируется тот рабочий процесс, который получил запрос.
+"""
+import asyncio
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from src.core import config
+from src.models.admin import RequestProfile
+
+PROFILE_REQUEST_HEADER = b'x-profile'
+ADMIN_TOKEN_HEADER = b'x-admin-token'
+
+
+def frame_stack(frame) -> list[str]:
+    """Стек вызовов, начиная с внешнего кадра.
+
+    Args:
+        frame: Текущий (самый вложенный) кадр потока
+
+    Returns:
+        Кадры в виде «функция (файл:строка начала функции)»
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append('{0} ({1}:{2})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class StackSampler:
+    """Периодически снимает стеки потоков в фоновом потоке."""
+
+    def __init__(
+        self,
+        interval: float,
+        thread_id: Optional[int] = None,
+        include: Optional[Callable[[], bool]] = None,
+    ):
+        """Инициализация профилировщика.
+
+        Args:
+            interval: Интервал между замерами (сек.)
+            thread_id: Профилируемый поток (по умолчанию - все потоки процесса)
+            include: Условие, при котором замер учитывается
+        """
+        self.interval = interval
+        self.thread_id = thread_id
+        self.include = include
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает фоновый поток замеров."""
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Останавливает замеры."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self) -> None:
+        """Цикл замеров (выполняется в фоновом потоке)."""
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            self.sample(own_id)
+
+    def sample(self, own_id: int) -> None:
+        """Снимает стеки потоков.
+
+        Args:
+            own_id: Идентификатор потока профилировщика (его стек не учитывается)
+        """
+        if self.include is not None and not self.include():
+            return
+        frames = sys._current_frames()
+        if self.thread_id is not None:
+            frames = {self.thread_id: frames.get(self.thread_id)}
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in frames.items():
+            if thread_id == own_id or frame is None:
+                continue
+            stack = ';'.join([names.get(thread_id, str(thread_id)), *frame_stack(frame)])
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Результат в формате collapsed stacks.
+
+        Returns:
+            Строки «кадр;кадр;кадр количество», самые частые стеки - первыми
+        """
+        return '\n'.join(
+            '{0} {1}'.format(stack, count) for stack, count in self.stacks.most_common()
+        )
+
+
+class ProfileLog:
+    """Кольцевой буфер профилей отдельных запросов."""
+
+    def __init__(self, size: int):
+        """Инициализация журнала.
+
+        Args:
+            size: Максимальное количество хранимых профилей (старые вытесняются)
+        """
+        self.profiles: deque = deque(maxlen=size)
+
+    def add(self, profile: RequestProfile) -> None:
+        """Сохраняет профиль запроса.
+
+        Args:
+            profile: Профиль запроса
+        """
+        self.profiles.append(profile)
+
+    def get_profiles(self) -> list[RequestProfile]:
+        """Возвращает профили, начиная с самых новых.
+
+        Returns:
+            Список профилей запросов
+        """
+        return list(reversed(self.profiles))
+
+
+profile_log = ProfileLog(config.settings.PROFILE_BUFFER_SIZE)
+
+
+class ProfilerMiddleware:
+    """ASGI-middleware: профилирует запрос с заголовками X-Profile и X-Admin-Token."""
+
+    def __init__(self, app):
+        """Инициализация middleware.
+
+        Args:
+            app: Следующее ASGI-приложение
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Обрабатывает запрос, при необходимости профилируя его.
+
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive
+            send: ASGI send
+        """
+        if scope['type'] != 'http' or not self.requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        # потоковые ответы отправляются в дочерних задачах и в профиль запроса не попадают
+        sampler = StackSampler(
+            config.settings.PROFILE_INTERVAL,
+            thread_id=threading.get_ident(),
+            include=lambda: asyncio.current_task(loop) is task,
+        )
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - started
+            await asyncio.to_thread(sampler.stop)
+            profile_log.add(
+                RequestProfile(
+                    method=scope['method'],
+                    path=scope['path'],
+                    started_at=started_at,
+                    duration_ms=round(duration * 1000, 3),
+                    samples=sampler.samples,
+                    stacks=sampler.collapsed(),
+                ),
+            )
+
+    def requested(self, scope) -> bool:
+        """Проверяет, запрошено ли профилирование (и разрешено ли оно).
+
+        Args:
+            scope: ASGI scope
+
+        Returns:
+            True, если запрос нужно профилировать
+        """
+        if not config.settings.ADMIN_TOKEN:
+            return False
+        headers = dict(scope['headers'])
+        if PROFILE_REQUEST_HEADER not in headers:
+            return False
+        token = headers.get(ADMIN_TOKEN_HEADER, b'')
+        return secrets.compare_digest(token, config.settings.ADMIN_TOKEN.encode())
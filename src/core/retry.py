@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Повторы вызовов Elasticsearch и Redis при временных ошибках.
+
+Пауза между попытками выбирается случайно (decorrelated jitter), поэтому одновременные
+запросы после сбоя повторяются не синхронно, а вразброс. Повторы ограничены количеством
+попыток (RETRY_MAX_ATTEMPTS) и крайним сроком запроса клиента: пауза, которая не успевает
+до крайнего срока, не выполняется.
+
+Все повторы рабочего процесса расходуют общий бюджет (token bucket): при длительном сбое
+бюджет исчерпывается, и запросы получают ошибку сразу, а не умножают нагрузку на
+восстанавливающийся ES или Redis. Та же политика для ETL - в postgres_to_es/backoff_dec.py
+(у ETL отдельный образ, общего кода с API у него нет).
+"""
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from src.core import config
+from src.core.deadline import DeadlineExceeded, time_left
+from src.core.metrics import observe_retry
+
+
+class RetryBudget:
+    """Бюджет повторов (token bucket): каждый повтор расходует один токен."""
+
+    def __init__(self, capacity: int, refill_rate: float):
+        """Инициализация бюджета.
+
+        Args:
+            capacity: Ёмкость корзины (допустимый всплеск повторов)
+            refill_rate: Скорость пополнения (токенов в секунду)
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def try_spend(self) -> bool:
+        """Расходует токен на повтор, если он есть.
+
+        Returns:
+            True, если повтор разрешён
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# общий бюджет повторов рабочего процесса
+retry_budget = RetryBudget(
+    config.settings.RETRY_BUDGET_CAPACITY,
+    config.settings.RETRY_BUDGET_REFILL_RATE,
+)
+
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """Пауза перед следующей попыткой: случайная в [base, previous * 3], не больше cap.
+
+    Args:
+        previous: Предыдущая пауза
+        base: Минимальная пауза
+        cap: Максимальная пауза
+
+    Returns:
+        Пауза в секундах
+    """
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+
+class RetryPolicy:
+    """Политика повторов одной операции (вызова ES или команды Redis)."""
+
+    def __init__(
+        self,
+        operation: str,
+        retry_on: tuple[type[Exception], ...],
+        giveup: Optional[Callable[[Exception], bool]] = None,
+        budget: Optional[RetryBudget] = None,
+    ):
+        """Инициализация политики.
+
+        Args:
+            operation: Имя операции (метка метрики retries)
+            retry_on: Типы ошибок, при которых вызов повторяется
+            giveup: Функция, по ошибке решающая, что повторять вызов бессмысленно
+            budget: Бюджет повторов (по умолчанию - общий бюджет процесса)
+        """
+        self.operation = operation
+        self.retry_on = retry_on
+        self.giveup = giveup
+        self.budget = budget or retry_budget
+
+    def is_retryable(self, err: Exception) -> bool:
+        """Проверяет, временная ли ошибка.
+
+        Args:
+            err: Ошибка вызова
+
+        Returns:
+            True, если вызов можно повторить
+        """
+        if not isinstance(err, self.retry_on):
+            return False
+        return self.giveup is None or not self.giveup(err)
+
+    def next_pause(self, err: Exception, attempt: int, previous: float) -> Optional[float]:
+        """Пауза перед следующей попыткой или None, если повторять нельзя.
+
+        Args:
+            err: Ошибка последней попытки
+            attempt: Номер последней попытки (с 1)
+            previous: Предыдущая пауза
+
+        Returns:
+            Пауза в секундах или None
+        """
+        if not self.is_retryable(err):
+            return None
+        if attempt >= config.settings.RETRY_MAX_ATTEMPTS:
+            observe_retry(self.operation, 'exhausted')
+            return None
+        pause = decorrelated_jitter(
+            previous,
+            config.settings.RETRY_BASE_DELAY,
+            config.settings.RETRY_MAX_DELAY,
+        )
+        try:
+            remaining = time_left()
+        except DeadlineExceeded:
+            remaining = 0
+        if remaining is not None and pause >= remaining:
+            observe_retry(self.operation, 'exhausted')
+            return None
+        if not self.budget.try_spend():
+            observe_retry(self.operation, 'budget')
+            return None
+        observe_retry(self.operation, 'retry')
+        return pause
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Выполняет вызов, повторяя его при временных ошибках.
+
+        Args:
+            func: Асинхронная функция
+            args: Позиционные аргументы функции
+            kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат функции
+
+        Raises:
+            Exception: Ошибка последней попытки, если повторы не помогли или не разрешены
+        """
+        attempt, pause = 0, config.settings.RETRY_BASE_DELAY
+        while True:
+            attempt += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as err:
+                pause = self.next_pause(err, attempt, pause)
+                if pause is None:
+                    raise
+            await asyncio.sleep(pause)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Разбивка времени обработки запроса для заголовка Server-Timing.
+
+Сервисы замеряют чтение и запись кэша, запросы к Elasticsearch, сборку моделей
+и кодирование ответа. Замеры складываются по имени в пределах запроса и отдаются
+в заголовке Server-Timing (виден в инструментах разработчика браузера и в curl -i).
+Замеры собираются, если включён SERVER_TIMING_ENABLED или в запросе передан
+заголовок X-Server-Timing; иначе вызовы замера ничего не делают.
+"""
+import functools
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from src.core import config
+
+# заголовок запроса, включающий Server-Timing для одного запроса
+TIMING_REQUEST_HEADER = b'x-server-timing'
+
+# имена замеров
+CACHE_READ = 'cache-read'
+CACHE_WRITE = 'cache-write'
+ELASTIC = 'es'
+MODEL = 'model'
+SERIALIZE = 'serialize'
+
+NO_SPAN = nullcontext()
+
+
+class RequestTimings:
+    """Суммарная длительность и количество замеров запроса по имени."""
+
+    def __init__(self):
+        """Инициализация замеров."""
+        self.spans: dict[str, list] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        """Добавляет замер.
+
+        Args:
+            name: Имя замера
+            duration: Длительность (сек.)
+        """
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [duration, 1]
+        else:
+            span[0] += duration
+            span[1] += 1
+
+    def header(self, total: float) -> str:
+        """Значение заголовка Server-Timing.
+
+        Args:
+            total: Полная длительность обработки запроса (сек.)
+
+        Returns:
+            Замеры в формате Server-Timing (длительность в миллисекундах)
+        """
+        metrics = [
+            '{0};desc="x{1}";dur={2:.2f}'.format(name, count, duration * 1000)
+            for name, (duration, count) in self.spans.items()
+        ]
+        metrics.append('total;dur={0:.2f}'.format(total * 1000))
+        return ', '.join(metrics)
+
+
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    'request_timings',
+    default=None,
+)
+
+
+class Span:
+    """Замер длительности блока кода (with span(...))."""
+
+    def __init__(self, timings: RequestTimings, name: str):
+        """Инициализация замера.
+
+        Args:
+            timings: Замеры текущего запроса
+            name: Имя замера
+        """
+        self.timings = timings
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        """Начало замера.
+
+        Returns:
+            Замер
+        """
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Окончание замера.
+
+        Args:
+            exc_info: Исключение блока кода, если было
+        """
+        self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+def span(name: str):
+    """Контекстный менеджер замера блока кода в рамках текущего запроса.
+
+    Args:
+        name: Имя замера
+
+    Returns:
+        Замер или пустой контекстный менеджер, если замеры в запросе не собираются
+    """
+    timings = request_timings.get()
+    if timings is None:
+        return NO_SPAN
+    return Span(timings, name)
+
+
+def record(name: str, duration: float) -> None:
+    """Добавляет уже измеренную длительность к замерам текущего запроса.
+
+    Args:
+        name: Имя замера
+        duration: Длительность (сек.)
+    """
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(name, duration)
+
+
+def timed(name: str) -> Callable:
+    """Декоратор асинхронной функции: замеряет её длительность в рамках запроса.
+
+    Args:
+        name: Имя замера
+
+    Returns:
+        Декоратор
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ServerTimingMiddleware:
+    """ASGI-middleware: собирает замеры запроса и добавляет заголовок Server-Timing."""
+
+    def __init__(self, app):
+        """Инициализация middleware.
+
+        Args:
+            app: Следующее ASGI-приложение
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Обрабатывает запрос, собирая замеры.
+
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive
+            send: ASGI send
+        """
+        enabled = scope['type'] == 'http' and (
+            config.settings.SERVER_TIMING_ENABLED
+            or any(name == TIMING_REQUEST_HEADER for name, _ in scope['headers'])
+        )
+        if not enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                value = timings.header(time.perf_counter() - started)
+                message['headers'] = [
+                    *message.get('headers', []),
+                    (b'server-timing', value.encode('latin-1')),
+                ]
+            await send(message)
+
+        token = request_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
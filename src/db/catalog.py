@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Колоночная копия каталога фильмов в памяти процесса API.
+
+Главная страница и страница жанра фильтруют фильмы только по жанру и сортируют только
+по imdb_rating. Весь каталог небольшой, поэтому такие страницы можно отдавать из
+компактных массивов NumPy без обращения к Redis и Elasticsearch:
+- рейтинги - массив float64 (NaN у фильмов без рейтинга);
+- принадлежность жанру - битовая маска (массив bool) на каждый жанр;
+- порядок по убыванию и по возрастанию рейтинга - заранее вычисленные массивы индексов
+  (для всего каталога и для каждого жанра); фильмы без рейтинга, как и в ES, идут последними;
+- UUID и названия - таблицы, адресуемые тем же индексом.
+
+Копия загружается из Elasticsearch при старте и в фоне перестраивается полным обходом
+индекса, поэтому удалённые из индекса фильмы пропадают и из копии.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+from uuid import UUID
+
+import numpy as np
+from elasticsearch import AsyncElasticsearch
+
+from src.core import config
+from src.db.elastic import iterate_index
+from src.models.film import Film
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FIELDS = ['uuid', 'title', 'imdb_rating', 'genre_uuids']
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога: массивы строятся целиком и подменяются атомарно."""
+
+    uuids: np.ndarray
+    titles: np.ndarray
+    ratings: np.ndarray
+    order_desc: np.ndarray
+    order_asc: np.ndarray
+    genre_orders_desc: dict[str, np.ndarray] = field(default_factory=dict)
+    genre_orders_asc: dict[str, np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, records: list[dict]) -> 'CatalogSnapshot':
+        """Строит снимок по документам фильмов.
+
+        Args:
+            records: Документы фильмов
+
+        Returns:
+            Снимок каталога
+        """
+        uuids = np.array([UUID(record['uuid']) for record in records], dtype=object)
+        titles = np.array([record['title'] for record in records], dtype=object)
+        # None (фильм без рейтинга) превращается в NaN
+        # float64, как у рейтинга из ES: с float32 тело ответа (и ETag) отличалось бы от ответа ES
+        ratings = np.array([record.get('imdb_rating') for record in records], dtype=np.float64)
+        # argsort ставит NaN в конец в обоих направлениях, как missing: _last в сортировке ES
+        order_desc = np.argsort(-ratings, kind='stable')
+        order_asc = np.argsort(ratings, kind='stable')
+
+        genre_masks: dict[str, np.ndarray] = {}
+        for position, record in enumerate(records):
+            for genre in record.get('genre_uuids') or []:
+                mask = genre_masks.setdefault(genre, np.zeros(len(records), dtype=bool))
+                mask[position] = True
+
+        return cls(
+            uuids,
+            titles,
+            ratings,
+            order_desc,
+            order_asc,
+            {genre: order_desc[mask[order_desc]] for genre, mask in genre_masks.items()},
+            {genre: order_asc[mask[order_asc]] for genre, mask in genre_masks.items()},
+        )
+
+    def page(
+        self,
+        desc_order: bool,
+        page_size: int,
+        page_number: int,
+        genre: Optional[UUID] = None,
+    ) -> list[Film]:
+        """Страница фильмов, отсортированных по рейтингу.
+
+        Args:
+            desc_order: порядок сортировки (True: убывающий, False: возрастающий)
+            page_size: количество объектов на странице выдачи
+            page_number: номер страницы выдачи
+            genre: uuid жанра, по которому нужно фильтровать фильмы
+
+        Returns:
+            список фильмов
+        """
+        order = self.order_desc if desc_order else self.order_asc
+        if genre is not None:
+            genre_orders = self.genre_orders_desc if desc_order else self.genre_orders_asc
+            order = genre_orders.get(str(genre), order[:0])
+
+        offset = (page_number - 1) * page_size
+        positions = order[offset:offset + page_size]
+        # данные уже проверены при загрузке - модели собираются без повторной валидации
+        return [
+            Film.model_construct(
+                uuid=self.uuids[position],
+                title=self.titles[position],
+                imdb_rating=self._rating(position),
+            )
+            for position in positions
+        ]
+
+    def _rating(self, position: int) -> Optional[float]:
+        rating = self.ratings[position]
+        return None if np.isnan(rating) else float(rating)
+
+
+class CatalogIndex:
+    """Копия каталога фильмов в памяти с фоновым обновлением."""
+
+    def __init__(self, elastic: AsyncElasticsearch):
+        """Инициализация копии каталога.
+
+        Args:
+            elastic: Соединение с БД Elasticsearch
+        """
+        self.elastic = elastic
+        self.snapshot: Optional[CatalogSnapshot] = None
+
+    @property
+    def ready(self) -> bool:
+        """Копия загружена и может отвечать на запросы."""
+        return self.snapshot is not None
+
+    async def refresh(self) -> int:
+        """Загружает все документы индекса movies и подменяет снимок.
+
+        Снимок строится заново по полному обходу (а не дополняется изменениями),
+        чтобы удалённые из индекса фильмы не оставались в копии.
+
+        Returns:
+            Количество фильмов в снимке
+        """
+        records = [
+            source
+            async for source in iterate_index(
+                self.elastic,
+                'movies',
+                config.settings.ES_EXPORT_PAGE_SIZE,
+                source=CATALOG_FIELDS,
+            )
+        ]
+        self.snapshot = CatalogSnapshot.build(records)
+        logger.info('Копия каталога обновлена: %s фильмов', len(records))
+        return len(records)
+
+    async def run(self, interval: float) -> None:
+        """Периодически обновляет копию каталога (выполняется фоновой задачей).
+
+        Args:
+            interval: Пауза между обновлениями в секундах
+        """
+        while True:
+            try:
+                await self.refresh()
+            except Exception as err:
+                # устаревшая копия лучше, чем отсутствующая: продолжаем отвечать из неё
+                logger.warning('Не удалось обновить копию каталога: %s', err)
+            await asyncio.sleep(interval)
+
+
+catalog: Optional[CatalogIndex] = None
+
+
+# Функция понадобится при внедрении зависимостей
+async def get_catalog() -> Optional[CatalogIndex]:
+    """Геттер, который возвращает копию каталога фильмов (если она включена).
+
+    Returns:
+        Копия каталога фильмов или None
+    """
+    return catalog
@@ -1,10 +1,156 @@
 # -*- coding: utf-8 -*-
-from typing import Optional
+"""Модуль для взаимодействия с БД Elasticsearch."""
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Optional
 
+from elastic_transport import ApiError, ConnectionTimeout
+from elastic_transport import ConnectionError as ESConnectionError
 from elasticsearch import AsyncElasticsearch
 
+from src.core import config
+from src.core.metrics import observe_elastic
+from src.core.retry import RetryPolicy
+from src.core.timing import ELASTIC, record
+from src.core.deadline import DeadlineExceeded, time_left
+from src.db.slow_queries import slow_query_log
+
 es: Optional[AsyncElasticsearch] = None
 
+# минимальное количество замеров, после которого оценка p95 считается надёжной
+LATENCY_MIN_SAMPLES = 20
+# p95 пересчитывается не на каждый вызов, а раз в столько замеров
+LATENCY_RECALC_EVERY = 50
+# ответы ES, после которых запрос имеет смысл повторить (перегрузка, недоступность узла)
+RETRYABLE_STATUSES = frozenset((429, 502, 503, 504))
+
+
+class LatencyTracker:
+    """Скользящая оценка p95 задержки вызовов Elasticsearch (по каждому методу отдельно)."""
+
+    def __init__(self, window: int = 1000):
+        """Инициализация трекера.
+
+        Args:
+            window: Количество последних замеров, по которым считается p95
+        """
+        self.window = window
+        self.samples: dict[str, deque] = {}
+        self.calls: dict[str, int] = {}
+        self.p95: dict[str, float] = {}
+
+    def observe(self, method: str, duration: float) -> None:
+        """Сохраняет замер длительности успешного вызова.
+
+        Args:
+            method: Имя метода клиента Elasticsearch
+            duration: Длительность вызова в секундах
+        """
+        samples = self.samples.setdefault(method, deque(maxlen=self.window))
+        samples.append(duration)
+        calls = self.calls.get(method, 0) + 1
+        self.calls[method] = calls
+        recalc = calls > LATENCY_MIN_SAMPLES and calls % LATENCY_RECALC_EVERY == 0
+        if calls == LATENCY_MIN_SAMPLES or recalc:
+            ordered = sorted(samples)
+            self.p95[method] = ordered[int(len(ordered) * 0.95) - 1]
+
+    def get_p95(self, method: str) -> Optional[float]:
+        """Текущая оценка p95 для метода.
+
+        Args:
+            method: Имя метода клиента Elasticsearch
+
+        Returns:
+            p95 в секундах или None, если замеров пока недостаточно
+        """
+        return self.p95.get(method)
+
+
+latency_tracker = LatencyTracker()
+
+
+class RequestGauge:
+    """Количество выполняющихся запросов к Elasticsearch (для оценки загрузки пула)."""
+
+    def __init__(self):
+        """Инициализация счётчика."""
+        self.in_flight = 0
+
+
+request_gauge = RequestGauge()
+
+
+def is_permanent_error(err: Exception) -> bool:
+    """Проверяет, что ответ ES не изменится при повторе запроса (например, 400 или 404).
+
+    Args:
+        err: Ошибка вызова ES
+
+    Returns:
+        True, если повторять запрос бессмысленно
+    """
+    return isinstance(err, ApiError) and err.status_code not in RETRYABLE_STATUSES
+
+
+elastic_retry = RetryPolicy(
+    'elasticsearch',
+    retry_on=(ESConnectionError, ApiError),
+    giveup=is_permanent_error,
+)
+
+
+def create_elastic() -> AsyncElasticsearch:
+    """Создаёт клиент Elasticsearch с пулом соединений по настройкам приложения.
+
+    Returns:
+        Клиент Elasticsearch
+    """
+    return AsyncElasticsearch(
+        hosts=[
+            {
+                'scheme': 'http',
+                'host': config.settings.ES_HOST,
+                'port': config.settings.ES_PORT,
+            },
+        ],
+        connections_per_node=config.settings.ES_CONNECTIONS_PER_NODE,
+        request_timeout=config.settings.ES_REQUEST_TIMEOUT,
+        http_compress=config.settings.ES_HTTP_COMPRESS,
+        # повторами занимается elastic_request (с паузами и бюджетом), а не транспорт клиента
+        max_retries=0,
+    )
+
+
+async def warm_up_elastic(elastic: AsyncElasticsearch, size: int) -> int:
+    """Заранее открывает соединения пула параллельными запросами ping.
+
+    Args:
+        elastic: Клиент Elasticsearch
+        size: Количество открываемых соединений
+
+    Returns:
+        Количество успешных запросов (открытых соединений)
+    """
+    size = min(size, config.settings.ES_CONNECTIONS_PER_NODE)
+    results = await asyncio.gather(*(elastic.ping() for _ in range(size)))
+    return sum(results)
+
+
+def elastic_pool_stats() -> dict:
+    """Загрузка пула соединений Elasticsearch.
+
+    Returns:
+        Размер пула, количество выполняющихся запросов и доля занятых соединений
+    """
+    max_connections = config.settings.ES_CONNECTIONS_PER_NODE
+    return {
+        'max_connections': max_connections,
+        'in_use': request_gauge.in_flight,
+        'saturation': round(request_gauge.in_flight / max_connections, 3),
+    }
+
 
 # Функция понадобится при внедрении зависимостей
 async def get_elastic() -> AsyncElasticsearch:
@@ -14,3 +160,166 @@ async def get_elastic() -> AsyncElasticsearch:
         Активное существующее соединение с БД Elasticsearch
     """
     return es
+
+
+async def elastic_request(elastic: AsyncElasticsearch, method: str, **kwargs) -> Any:
+    """Выполняет читающий запрос к Elasticsearch с учётом крайнего срока запроса клиента.
+
+    Оставшееся до крайнего срока время передаётся в ES (параметр timeout у search),
+    в транспорт клиента (request_timeout) и ограничивает ожидание ответа (отмена вызова).
+    Если включено хеджирование (ES_HEDGING), то при превышении наблюдаемого p95
+    отправляется дублирующий запрос и используется первый полученный ответ.
+    При ошибке соединения или ответе ES о перегрузке запрос повторяется (src.core.retry).
+
+    Args:
+        elastic: Соединение с БД Elasticsearch
+        method: Имя метода клиента (get, mget, search)
+        kwargs: Параметры метода
+
+    Returns:
+        Ответ Elasticsearch
+
+    Raises:
+        DeadlineExceeded: Если ответ не получен до крайнего срока
+    """
+    started = time.monotonic()
+    request_gauge.in_flight += 1
+    try:
+        response = await elastic_retry.call(_send, elastic, method, kwargs)
+    except Exception as err:
+        # неудачные (в том числе прерванные по крайнему сроку) запросы тоже попадают в журнал
+        slow_query_log.observe(elastic, method, kwargs, time.monotonic() - started, err)
+        raise
+    finally:
+        request_gauge.in_flight -= 1
+        record(ELASTIC, time.monotonic() - started)
+
+    duration = time.monotonic() - started
+    latency_tracker.observe(method, duration)
+    observe_elastic(kwargs.get('index'), method, duration)
+    slow_query_log.observe(elastic, method, kwargs, duration)
+    return response
+
+
+async def _send(elastic: AsyncElasticsearch, method: str, kwargs: dict) -> Any:
+    """Одна попытка запроса к Elasticsearch (см. elastic_request).
+
+    Args:
+        elastic: Соединение с БД Elasticsearch
+        method: Имя метода клиента (get, mget, search)
+        kwargs: Параметры метода
+
+    Returns:
+        Ответ Elasticsearch
+
+    Raises:
+        DeadlineExceeded: Если ответ не получен до крайнего срока или ES прервал поиск по timeout
+    """
+    remaining = time_left()
+    client = elastic
+    # у каждой попытки свой остаток времени до крайнего срока
+    params = dict(kwargs)
+    if remaining is not None:
+        client = elastic.options(request_timeout=remaining)
+        if method == 'search':
+            params.setdefault('timeout', '{0}ms'.format(int(remaining * 1000)))
+
+    def send():
+        return getattr(client, method)(**params)
+
+    hedge_delay = latency_tracker.get_p95(method) if config.settings.ES_HEDGING else None
+    error_msg = 'Elasticsearch {0} exceeded request deadline'.format(method)
+    try:
+        if hedge_delay is None:
+            response = await asyncio.wait_for(send(), remaining)
+        else:
+            response = await asyncio.wait_for(_hedged(send, hedge_delay), remaining)
+    except (asyncio.TimeoutError, ConnectionTimeout) as err:
+        raise DeadlineExceeded(error_msg) from err
+
+    # по истечении timeout ES отвечает 200 с частью результатов: такую страницу нельзя
+    # ни отдавать клиенту как полную, ни кэшировать
+    if method == 'search' and response.get('timed_out'):
+        raise DeadlineExceeded(error_msg)
+    return response
+
+
+async def _hedged(send, delay: float) -> Any:
+    """Выполняет вызов с хеджированием: дубль отправляется, если первый ответ задерживается.
+
+    Args:
+        send: Функция, создающая корутину вызова
+        delay: Задержка перед отправкой дублирующего вызова (в секундах)
+
+    Returns:
+        Первый успешный ответ (или ошибка, если оба вызова завершились ошибкой)
+    """
+    tasks = [asyncio.ensure_future(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(send()))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # ошибка одного из вызовов не важна, пока другой может ответить: сюда попадаем,
+        # только если с ошибкой завершились все вызовы
+        return tasks[-1].result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def iterate_index(
+    elastic: AsyncElasticsearch,
+    index: str,
+    page_size: int,
+    keep_alive: str = '1m',
+    query: Optional[dict] = None,
+    source: Optional[list[str]] = None,
+) -> AsyncIterator[dict]:
+    """Постранично обходит все документы индекса через point in time и search_after.
+
+    В памяти одновременно находится не более одной страницы документов,
+    поэтому обход не ограничен 10000 записей, в отличие от from/size.
+
+    Args:
+        elastic: Соединение с БД Elasticsearch
+        index: Имя индекса
+        page_size: Количество документов, запрашиваемых за один раз
+        keep_alive: Время жизни point in time между запросами
+        query: Запрос для отбора документов (по умолчанию - все документы)
+        source: Список возвращаемых полей документа (по умолчанию - все поля)
+
+    Yields:
+        Исходные данные (_source) документов индекса
+    """
+    pit = await elastic_retry.call(elastic.open_point_in_time, index=index, keep_alive=keep_alive)
+    pit_id = pit['id']
+    search_after = None
+    try:
+        while True:
+            response = await elastic_retry.call(
+                elastic.search,
+                pit={'id': pit_id, 'keep_alive': keep_alive},
+                size=page_size,
+                sort=[{'_shard_doc': 'asc'}],
+                search_after=search_after,
+                track_total_hits=False,
+                query=query,
+                source=source,
+            )
+            # ES может вернуть обновлённый идентификатор point in time
+            pit_id = response.get('pit_id', pit_id)
+            hits = response['hits']['hits']
+            for hit in hits:
+                yield hit['_source']
+            if len(hits) < page_size:
+                break
+            search_after = hits[-1]['sort']
+    finally:
+        await elastic.close_point_in_time(id=pit_id)
@@ -2,12 +2,138 @@
 """Модуль для взаимодействия с БД Redis."""
 
 import logging
+import time
 from typing import Optional
 
-from redis.asyncio import Redis
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.connection import HiredisParser, PythonParser
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from redis.utils import HIREDIS_AVAILABLE
+
+from src.core import config
+from src.core.metrics import observe_redis
+from src.core.retry import RetryPolicy
 
 redis: Optional[Redis] = None
 
+# команды только читают данные, поэтому их безопасно повторять
+RETRYABLE_COMMANDS = frozenset(('GET', 'MGET', 'EXISTS'))
+# сообщение пула, все соединения которого заняты: это перегрузка, повтор её только усилит
+POOL_EXHAUSTED_MESSAGE = 'No connection available.'
+
+
+def is_pool_exhausted(err: Exception) -> bool:
+    """Проверяет, что ошибка вызвана исчерпанием пула соединений, а не сбоем Redis.
+
+    Args:
+        err: Ошибка команды Redis
+
+    Returns:
+        True, если повторять команду не нужно
+    """
+    return str(err) == POOL_EXHAUSTED_MESSAGE
+
+
+redis_retry = RetryPolicy(
+    'redis',
+    retry_on=(RedisConnectionError, RedisTimeoutError),
+    giveup=is_pool_exhausted,
+)
+
+
+class InstrumentedRedis(Redis):
+    """Клиент Redis, замеряющий длительность команд для метрик и повторяющий чтение."""
+
+    async def execute_command(self, *args, **options):
+        """Выполняет команду Redis, замеряя её длительность.
+
+        Читающие команды (RETRYABLE_COMMANDS) при сбое соединения повторяются.
+
+        Args:
+            args: Команда и её аргументы
+            options: Параметры выполнения
+
+        Returns:
+            Ответ Redis
+        """
+        started = time.perf_counter()
+        try:
+            if args[0] in RETRYABLE_COMMANDS:
+                return await redis_retry.call(super().execute_command, *args, **options)
+            return await super().execute_command(*args, **options)
+        finally:
+            observe_redis(args[0], time.perf_counter() - started)
+
+
+def create_redis() -> Redis:
+    """Создаёт клиент Redis с пулом соединений по настройкам приложения.
+
+    Пул ограничен REDIS_MAX_CONNECTIONS соединениями: при исчерпании запрос ждёт свободное
+    соединение не дольше REDIS_POOL_TIMEOUT и завершается ошибкой, а не открывает новое.
+
+    Returns:
+        Клиент Redis
+    """
+    parser_class = PythonParser
+    if config.settings.REDIS_HIREDIS:
+        if HIREDIS_AVAILABLE:
+            parser_class = HiredisParser
+        else:
+            logging.warning('hiredis не установлен, используется парсер ответов на Python')
+
+    pool = BlockingConnectionPool(
+        host=config.settings.REDIS_HOST,
+        port=config.settings.REDIS_PORT,
+        max_connections=config.settings.REDIS_MAX_CONNECTIONS,
+        timeout=config.settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=config.settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=config.settings.REDIS_CONNECT_TIMEOUT,
+        socket_keepalive=config.settings.REDIS_KEEPALIVE,
+        parser_class=parser_class,
+    )
+    return InstrumentedRedis(connection_pool=pool)
+
+
+async def warm_up_redis(client: Redis, size: int) -> int:
+    """Заранее открывает соединения пула, чтобы первые запросы не ждали подключения.
+
+    Args:
+        client: Клиент Redis
+        size: Количество открываемых соединений
+
+    Returns:
+        Количество открытых соединений
+    """
+    pool = client.connection_pool
+    connections = []
+    try:
+        for _ in range(min(size, pool.max_connections)):
+            connections.append(await pool.get_connection('PING'))
+    finally:
+        for connection in connections:
+            await pool.release(connection)
+    return len(connections)
+
+
+def redis_pool_stats(client: Redis) -> dict:
+    """Загрузка пула соединений Redis.
+
+    Args:
+        client: Клиент Redis
+
+    Returns:
+        Размер пула, количество занятых соединений и доля занятых
+    """
+    pool = client.connection_pool
+    # в очереди пула лежат свободные соединения и заглушки ещё не открытых
+    in_use = pool.max_connections - pool.pool.qsize()
+    return {
+        'max_connections': pool.max_connections,
+        'in_use': in_use,
+        'saturation': round(in_use / pool.max_connections, 3),
+    }
+
 
 # Функция понадобится при внедрении зависимостей
 async def get_redis() -> Redis:
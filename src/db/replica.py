@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Локальная реплика для чтения: снимок индексов ES в файле LMDB, который строит ETL.
+
+Файл открывается только на чтение и отображается в память (mmap): рабочие процессы API
+на одном узле делят одну копию данных через страничный кэш ОС, а документ разбирается
+прямо из отображённой памяти, без сетевого запроса и промежуточного копирования.
+ETL подменяет файл целиком, поэтому реплика периодически проверяет, не появился ли новый
+снимок, и переоткрывает его.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+import lmdb
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# как часто (сек.) проверять, не подменил ли ETL файл реплики
+REPLICA_CHECK_INTERVAL = 5.0
+
+
+class ReadReplica:
+    """Реплика индексов movies, persons и genres для получения документов по UUID."""
+
+    def __init__(self, path: str):
+        """Инициализация реплики.
+
+        Args:
+            path: Путь к файлу реплики
+        """
+        self.path = path
+        self.env: Optional[lmdb.Environment] = None
+        self.inode: Optional[int] = None
+        self.checked_at = 0.0
+
+    def get(self, index: str, uuid: str) -> Optional[dict]:
+        """Возвращает документ индекса по UUID.
+
+        Args:
+            index: Имя индекса Elasticsearch
+            uuid: UUID документа
+
+        Returns:
+            Исходные данные (_source) документа или None, если его нет в реплике
+        """
+        env = self._get_env()
+        if env is None:
+            return None
+        key = '{0}::{1}'.format(index, uuid).encode()
+        # buffers=True: значение - memoryview на отображённую память, действительный до конца
+        # транзакции, поэтому документ разбирается внутри неё
+        with env.begin(buffers=True) as txn:
+            doc = txn.get(key)
+            if doc is None:
+                return None
+            return orjson.loads(doc)
+
+    def close(self) -> None:
+        """Закрывает файл реплики."""
+        if self.env is not None:
+            self.env.close()
+            self.env = None
+
+    def _get_env(self) -> Optional[lmdb.Environment]:
+        now = time.monotonic()
+        if self.env is not None and now - self.checked_at < REPLICA_CHECK_INTERVAL:
+            return self.env
+        self.checked_at = now
+
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            # снимок ещё не построен - запросы обслуживают Redis и ES
+            return self.env
+        if inode == self.inode:
+            return self.env
+
+        try:
+            # lock=False: файл никто не изменяет на месте, ETL подменяет его целиком
+            env = lmdb.open(self.path, subdir=False, readonly=True, lock=False)
+        except lmdb.Error as err:
+            logger.warning('Не удалось открыть реплику %s: %s', self.path, err)
+            return self.env
+
+        self.close()
+        self.env = env
+        self.inode = inode
+        logger.info('Открыт снимок реплики %s', self.path)
+        return self.env
+
+
+replica: Optional[ReadReplica] = None
+
+
+# Функция понадобится при внедрении зависимостей
+async def get_replica() -> Optional[ReadReplica]:
+    """Геттер, который возвращает локальную реплику для чтения (если она включена).
+
+    Returns:
+        Реплика для чтения или None
+    """
+    return replica
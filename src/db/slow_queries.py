@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Журнал медленных запросов к Elasticsearch.
+
+Запросы дольше порога SLOW_QUERY_THRESHOLD сохраняются в кольцевой буфер вместе с параметрами.
+Часть медленных поисковых запросов (SLOW_QUERY_PROFILE_RATE) повторяется в фоне с profile=true,
+чтобы было видно, на каком шарде и в какой части запроса тратится время.
+"""
+import asyncio
+import logging
+import random
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from elasticsearch import AsyncElasticsearch
+
+from src.core import config
+from src.models.admin import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    """Кольцевой буфер медленных запросов к Elasticsearch."""
+
+    def __init__(self, size: int):
+        """Инициализация журнала.
+
+        Args:
+            size: Максимальное количество хранимых запросов (старые вытесняются)
+        """
+        self.queries: deque = deque(maxlen=size)
+        # ссылки на фоновые задачи профилирования, чтобы их не удалил сборщик мусора
+        self.profiling_tasks: set = set()
+
+    def observe(
+        self,
+        elastic: AsyncElasticsearch,
+        method: str,
+        params: dict[str, Any],
+        duration: float,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Учитывает выполненный запрос: медленный запрос попадает в журнал.
+
+        Запросы, завершившиеся ошибкой (в том числе по крайнему сроку), тоже учитываются:
+        чаще всего это и есть самые медленные запросы.
+
+        Args:
+            elastic: Соединение с БД Elasticsearch (для повторного запуска с профилированием)
+            method: Имя метода клиента Elasticsearch
+            params: Параметры вызова
+            duration: Длительность вызова в секундах
+            error: Ошибка, которой завершился вызов (None - успешный вызов)
+        """
+        if duration < config.settings.SLOW_QUERY_THRESHOLD:
+            return
+
+        query = SlowQuery(
+            method=method,
+            index=str(params.get('index')),
+            duration_ms=round(duration * 1000, 3),
+            started_at=datetime.now(timezone.utc),
+            params=params,
+            error=repr(error) if error is not None else None,
+        )
+        self.queries.append(query)
+        logger.warning(
+            'Медленный запрос к ES: %s %s (%s мс)', method, query.index, query.duration_ms,
+        )
+
+        if method == 'search' and random.random() < config.settings.SLOW_QUERY_PROFILE_RATE:
+            task = asyncio.create_task(self._profile(elastic, query))
+            self.profiling_tasks.add(task)
+            task.add_done_callback(self.profiling_tasks.discard)
+
+    def get_queries(self) -> list[SlowQuery]:
+        """Возвращает медленные запросы, начиная с самых новых.
+
+        Returns:
+            Список медленных запросов
+        """
+        return list(reversed(self.queries))
+
+    def clear(self) -> None:
+        """Очищает журнал."""
+        self.queries.clear()
+
+    @staticmethod
+    async def _profile(elastic: AsyncElasticsearch, query: SlowQuery) -> None:
+        params = {key: param for key, param in query.params.items() if key != 'timeout'}
+        try:
+            response = await elastic.search(**params, profile=True)
+        except Exception as err:
+            logger.warning('Не удалось профилировать медленный запрос: %s', err)
+            return
+        query.profile = response.get('profile')
+
+
+slow_query_log = SlowQueryLog(config.settings.SLOW_QUERY_BUFFER_SIZE)
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Нагрузочный тест API на заменителях Elasticsearch и Redis в памяти (python -m src.loadtest)."""
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Нагрузочный тест API на заменителях Elasticsearch и Redis в памяти.
+
+API (src.main:app) запускается в отдельном процессе; вместо ES и Redis у него заменители
+в памяти с заданной задержкой ответа, документы индексов собираются из dump.sql.
+Генератор нагрузки отправляет смесь запросов (карточки, списки, поиск, фильмографии)
+от фиксированного числа одновременных клиентов и выводит по каждому эндпойнту
+пропускную способность и p50/p95/p99 времени ответа.
+
+Сервер получает настройки из переменных окружения, как обычно (например, CACHE_TIME_LIFE
+или RESPONSE_COMPRESSION_ENABLED), поэтому варианты настроек можно сравнить на одном наборе
+данных. Результаты в JSON (--json) удобно сохранять для сравнения до и после изменения.
+
+Запуск:
+    python -m src.loadtest [--mix browse] [--concurrency 32] [--duration 30]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+
+from src.loadtest.dataset import build_dataset
+from src.loadtest.driver import (
+    BROWSER_ACCEPT_ENCODING,
+    MIXES,
+    Targets,
+    parse_mix,
+    percentile,
+    run_load,
+    wait_ready,
+)
+from src.loadtest.fakes import Latency
+from src.loadtest.server import serve
+
+SERVER_START_TIMEOUT = 30
+
+
+def summarize(stats: dict, duration: float) -> list[dict]:
+    """Итоги по эндпойнтам и по всем запросам.
+
+    Args:
+        stats: Результаты по эндпойнтам (EndpointStats)
+        duration: Длительность замера (сек.)
+
+    Returns:
+        Строки отчёта
+    """
+    rows = []
+    everything = []
+    total_errors = 0
+    for endpoint, endpoint_stats in stats.items():
+        latencies = sorted(endpoint_stats.latencies)
+        everything.extend(latencies)
+        total_errors += endpoint_stats.errors
+        rows.append(summary_row(endpoint, latencies, endpoint_stats.errors, duration))
+        rows[-1]['statuses'] = endpoint_stats.statuses
+    rows.append(summary_row('total', sorted(everything), total_errors, duration))
+    return rows
+
+
+def summary_row(endpoint: str, latencies: list[float], errors: int, duration: float) -> dict:
+    """Строка отчёта.
+
+    Args:
+        endpoint: Эндпойнт
+        latencies: Отсортированные времена ответа (сек.)
+        errors: Количество ошибок (5xx и ошибки соединения)
+        duration: Длительность замера (сек.)
+
+    Returns:
+        Количество запросов, запросов в секунду, перцентили (мс) и ошибки
+    """
+    return {
+        'endpoint': endpoint,
+        'requests': len(latencies),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'errors': errors,
+    }
+
+
+def print_report(rows: list[dict]) -> None:
+    """Выводит отчёт таблицей.
+
+    Args:
+        rows: Строки отчёта
+    """
+    header = '{0:<16}{1:>10}{2:>10}{3:>10}{4:>10}{5:>10}{6:>8}'
+    print(header.format('endpoint', 'requests', 'rps', 'p50, ms', 'p95, ms', 'p99, ms', 'errors'))
+    line = '{0:<16}{1:>10}{2:>10.1f}{3:>10.2f}{4:>10.2f}{5:>10.2f}{6:>8}'
+    for row in rows:
+        print(line.format(
+            row['endpoint'],
+            row['requests'],
+            row['rps'],
+            row['p50_ms'],
+            row['p95_ms'],
+            row['p99_ms'],
+            row['errors'],
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        '--mix',
+        default='browse',
+        help='смесь запросов: {0} или «эндпойнт=вес,...»'.format(', '.join(MIXES)),
+    )
+    parser.add_argument('--concurrency', type=int, default=32, help='одновременных клиентов')
+    parser.add_argument('--duration', type=float, default=30, help='длительность замера, с')
+    parser.add_argument('--warmup', type=float, default=5, help='разогрев перед замером, с')
+    parser.add_argument('--es-latency', type=float, default=0.002, help='задержка ES, с')
+    parser.add_argument('--es-jitter', type=float, default=0.001, help='средний разброс ES, с')
+    parser.add_argument('--redis-latency', type=float, default=0.0002, help='задержка Redis, с')
+    parser.add_argument('--redis-jitter', type=float, default=0.0001, help='разброс Redis, с')
+    parser.add_argument('--zipf', type=float, default=1.0, help='неравномерность популярности')
+    parser.add_argument(
+        '--accept-encoding',
+        default=BROWSER_ACCEPT_ENCODING,
+        help='заголовок Accept-Encoding запросов',
+    )
+    parser.add_argument('--dump', default='dump.sql', help='дамп PostgreSQL с данными')
+    parser.add_argument('--port', type=int, default=8765, help='порт сервера')
+    parser.add_argument('--seed', type=int, default=1, help='начальное значение генератора')
+    parser.add_argument('--json', help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as err:
+        parser.error(str(err))
+
+    # процесс сервера запускается «с чистого листа», без состояния генератора нагрузки
+    server = multiprocessing.get_context('spawn').Process(
+        target=serve,
+        args=(
+            args.port,
+            args.dump,
+            Latency(args.es_latency, args.es_jitter),
+            Latency(args.redis_latency, args.redis_jitter),
+        ),
+        daemon=True,
+    )
+    server.start()
+    base_url = 'http://127.0.0.1:{0}'.format(args.port)
+    try:
+        targets = Targets(build_dataset(args.dump), args.zipf, random.Random(args.seed))
+        asyncio.run(wait_ready(base_url, SERVER_START_TIMEOUT))
+        stats = asyncio.run(run_load(
+            base_url,
+            targets,
+            mix,
+            args.concurrency,
+            args.duration,
+            args.warmup,
+            args.accept_encoding,
+        ))
+    finally:
+        server.terminate()
+        server.join()
+
+    rows = summarize(stats, args.duration)
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'options': vars(args), 'mix': mix, 'results': rows}, output, indent=2)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Документы индексов movies, persons и genres, собранные из дампа PostgreSQL (dump.sql).
+
+Документы имеют ту же форму, что записывает ETL (postgres_to_es): денормализованные
+участники и жанры фильма, фильмография персоны с названием и рейтингом, поля подсказок
+и рассчитанные похожие фильмы. Дамп читается напрямую (блоки COPY), без PostgreSQL.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+# количество похожих фильмов в документе (как top_n в настройках ETL)
+SIMILAR_TOP_N = 20
+# количество слов, с которых может начинаться подсказка (как в ETL)
+SUGGEST_MAX_WORDS = 5
+# экранирование в текстовом формате COPY
+COPY_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '\\': '\\'}
+COPY_NULL = '\\N'
+
+
+@dataclass
+class Dataset:
+    """Документы индексов по UUID."""
+
+    movies: dict[str, dict] = field(default_factory=dict)
+    persons: dict[str, dict] = field(default_factory=dict)
+    genres: dict[str, dict] = field(default_factory=dict)
+
+    def indexes(self) -> dict[str, dict[str, dict]]:
+        """Документы по имени индекса.
+
+        Returns:
+            Словарь индекс -> документы по UUID
+        """
+        return {'movies': self.movies, 'persons': self.persons, 'genres': self.genres}
+
+
+def unescape(value: str) -> Optional[str]:
+    """Значение поля в текстовом формате COPY.
+
+    Args:
+        value: Поле строки дампа
+
+    Returns:
+        Строка или None (NULL)
+    """
+    if value == COPY_NULL:
+        return None
+    if '\\' not in value:
+        return value
+    chars = []
+    escaped = False
+    for char in value:
+        if escaped:
+            chars.append(COPY_ESCAPES.get(char, char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        else:
+            chars.append(char)
+    return ''.join(chars)
+
+
+def read_copy_tables(path: str) -> dict[str, list[dict]]:
+    """Читает данные таблиц из блоков COPY дампа.
+
+    Args:
+        path: Путь к файлу дампа
+
+    Returns:
+        Строки таблиц (словарь колонка -> значение) по имени таблицы
+    """
+    tables: dict[str, list[dict]] = {}
+    columns: Optional[list[str]] = None
+    rows: list[dict] = []
+    with open(path, encoding='utf-8') as dump:
+        for line in dump:
+            line = line.rstrip('\n')
+            if columns is None:
+                if line.startswith('COPY '):
+                    # COPY content.film_work (id, title, ...) FROM stdin;
+                    table, _, rest = line[len('COPY '):].partition(' (')
+                    columns = [column.strip() for column in rest.partition(')')[0].split(',')]
+                    rows = tables.setdefault(table, [])
+                continue
+            if line == '\\.':
+                columns = None
+                continue
+            values = [unescape(value) for value in line.split('\t')]
+            rows.append(dict(zip(columns, values)))
+    return tables
+
+
+def suggest_inputs(text: str) -> list[str]:
+    """Варианты ввода для поля автодополнения (все окончания строки с границы слова).
+
+    Args:
+        text: Название фильма или имя персоны
+
+    Returns:
+        Список вариантов ввода
+    """
+    words = text.split()
+    return [' '.join(words[start:]) for start in range(min(len(words), SUGGEST_MAX_WORDS))]
+
+
+def similar_films(movies: dict[str, dict]) -> dict[str, list[str]]:
+    """Похожие фильмы: по доле общих жанров, при равенстве - более популярные.
+
+    Args:
+        movies: Документы фильмов
+
+    Returns:
+        UUID похожих фильмов по UUID фильма
+    """
+    genre_sets = {uuid: set(movie['genre_uuids']) for uuid, movie in movies.items()}
+    similar = {}
+    for uuid, genres in genre_sets.items():
+        scores = []
+        for other, other_genres in genre_sets.items():
+            common = len(genres & other_genres)
+            if other == uuid or not common:
+                continue
+            score = common / len(genres | other_genres)
+            scores.append((score, movies[other]['imdb_rating'] or 0, other))
+        scores.sort(reverse=True)
+        similar[uuid] = [other for _, _, other in scores[:SIMILAR_TOP_N]]
+    return similar
+
+
+def iter_roles(tables: dict[str, list[dict]]) -> Iterator[tuple[str, str, str]]:
+    """Участие персон в фильмах.
+
+    Args:
+        tables: Строки таблиц дампа
+
+    Yields:
+        UUID фильма, UUID персоны и роль
+    """
+    for row in tables['content.person_film_work']:
+        yield row['film_work_id'], row['person_id'], row['role']
+
+
+def build_dataset(path: str) -> Dataset:
+    """Собирает документы индексов из дампа PostgreSQL.
+
+    Args:
+        path: Путь к файлу дампа (dump.sql)
+
+    Returns:
+        Документы индексов
+    """
+    tables = read_copy_tables(path)
+    dataset = Dataset()
+
+    for row in tables['content.genre']:
+        dataset.genres[row['id']] = {
+            'uuid': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+        }
+
+    for row in tables['content.film_work']:
+        rating = row['rating']
+        dataset.movies[row['id']] = {
+            'uuid': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'imdb_rating': float(rating) if rating is not None else None,
+            'type': row['type'],
+            'genre': [],
+            'genre_uuids': [],
+            'director': [],
+            'actors': [],
+            'writers': [],
+        }
+    for row in tables['content.genre_film_work']:
+        movie = dataset.movies.get(row['film_work_id'])
+        genre = dataset.genres.get(row['genre_id'])
+        if movie is not None and genre is not None:
+            movie['genre'].append(genre['name'])
+            movie['genre_uuids'].append(genre['uuid'])
+
+    names = {row['id']: row['full_name'] for row in tables['content.person']}
+    portfolios: dict[str, dict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+    for film_id, person_id, role in iter_roles(tables):
+        movie = dataset.movies.get(film_id)
+        if movie is None or person_id not in names:
+            continue
+        portfolios[person_id][film_id].append(role)
+        if role == 'director':
+            movie['director'].append(names[person_id])
+        elif role in ('actor', 'writer'):
+            movie['{0}s'.format(role)].append({'uuid': person_id, 'full_name': names[person_id]})
+
+    for movie in dataset.movies.values():
+        movie['actors_names'] = [actor['full_name'] for actor in movie['actors']]
+        movie['writers_names'] = [writer['full_name'] for writer in movie['writers']]
+        movie['title_suggest'] = {
+            'input': suggest_inputs(movie['title']),
+            'weight': int((movie['imdb_rating'] or 0) * 10),
+        }
+    for uuid, similar in similar_films(dataset.movies).items():
+        dataset.movies[uuid]['similar'] = similar
+
+    for person_id, full_name in names.items():
+        films = [
+            {
+                'uuid': film_id,
+                'title': dataset.movies[film_id]['title'],
+                'imdb_rating': dataset.movies[film_id]['imdb_rating'],
+                'roles': roles,
+            }
+            for film_id, roles in portfolios[person_id].items()
+        ]
+        dataset.persons[person_id] = {
+            'uuid': person_id,
+            'full_name': full_name,
+            'films': films,
+            'full_name_suggest': {'input': suggest_inputs(full_name), 'weight': len(films)},
+        }
+    return dataset
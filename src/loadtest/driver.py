@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""Генератор нагрузки: смесь запросов к API с фиксированным числом одновременных клиентов.
+
+Каждый клиент отправляет следующий запрос сразу после ответа на предыдущий (замкнутая
+модель нагрузки). Тип запроса выбирается по весам смеси, фильм или персона - с
+неравномерной популярностью (распределение Ципфа): популярные фильмы запрашиваются чаще,
+поэтому кэш работает так же, как при реальной нагрузке.
+"""
+import asyncio
+import itertools
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import aiohttp
+
+from src.loadtest.dataset import Dataset
+
+# номера страниц списка фильмов, которые запрашивают клиенты
+LIST_PAGES = 20
+LIST_PAGE_SIZE = 50
+# доля запросов списка фильмов с фильтром по жанру
+GENRE_FILTER_SHARE = 0.3
+# минимальная длина слова, по которому выполняется поиск
+SEARCH_WORD_MIN_LENGTH = 3
+# сжатия, которые принимает браузер (тела ответов генератор не распаковывает)
+BROWSER_ACCEPT_ENCODING = 'gzip, deflate, br, zstd'
+
+
+class Popularity:
+    """Выбор элемента с вероятностью, убывающей с его рангом (распределение Ципфа)."""
+
+    def __init__(self, items: list, exponent: float, rng: random.Random):
+        """Инициализация выбора.
+
+        Args:
+            items: Элементы, начиная с самого популярного
+            exponent: Показатель распределения (0 - все элементы равновероятны)
+            rng: Генератор случайных чисел
+        """
+        self.items = items
+        self.rng = rng
+        weights = [1 / (rank ** exponent) for rank in range(1, len(items) + 1)]
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def choice(self):
+        """Очередной элемент.
+
+        Returns:
+            Элемент
+        """
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+class Targets:
+    """Фильмы, персоны, жанры и поисковые слова для запросов."""
+
+    def __init__(self, dataset: Dataset, exponent: float, rng: random.Random):
+        """Инициализация целей запросов.
+
+        Args:
+            dataset: Документы индексов
+            exponent: Показатель распределения популярности
+            rng: Генератор случайных чисел
+        """
+        self.rng = rng
+        movies = sorted(
+            dataset.movies.values(),
+            key=lambda movie: movie['imdb_rating'] or 0,
+            reverse=True,
+        )
+        persons = sorted(
+            dataset.persons.values(),
+            key=lambda person: len(person['films']),
+            reverse=True,
+        )
+        self.movies = Popularity(movies, exponent, rng)
+        self.persons = Popularity(persons, exponent, rng)
+        self.genres = Popularity(list(dataset.genres.values()), exponent, rng)
+        self.pages = Popularity(list(range(1, LIST_PAGES + 1)), exponent, rng)
+
+    def film(self) -> str:
+        """UUID фильма.
+
+        Returns:
+            UUID
+        """
+        return self.movies.choice()['uuid']
+
+    def person(self) -> str:
+        """UUID персоны.
+
+        Returns:
+            UUID
+        """
+        return self.persons.choice()['uuid']
+
+    def genre(self) -> str:
+        """UUID жанра.
+
+        Returns:
+            UUID
+        """
+        return self.genres.choice()['uuid']
+
+    def page(self) -> int:
+        """Номер страницы списка.
+
+        Returns:
+            Номер страницы
+        """
+        return self.pages.choice()
+
+    def word(self, text: str) -> str:
+        """Случайное слово текста для поискового запроса.
+
+        Args:
+            text: Название фильма или имя персоны
+
+        Returns:
+            Слово
+        """
+        words = [word for word in text.split() if len(word) >= SEARCH_WORD_MIN_LENGTH]
+        return self.rng.choice(words or [text])
+
+    def title_word(self) -> str:
+        """Слово из названия популярного фильма.
+
+        Returns:
+            Слово
+        """
+        return self.word(self.movies.choice()['title'])
+
+    def name_word(self) -> str:
+        """Слово из имени популярной персоны.
+
+        Returns:
+            Слово
+        """
+        return self.word(self.persons.choice()['full_name'])
+
+
+def film_list(targets: Targets) -> tuple[str, dict]:
+    """Страница списка фильмов (иногда - с фильтром по жанру).
+
+    Args:
+        targets: Цели запросов
+
+    Returns:
+        Путь и параметры запроса
+    """
+    params = {'page_number': targets.page(), 'page_size': LIST_PAGE_SIZE}
+    if targets.rng.random() < GENRE_FILTER_SHARE:
+        params['genre'] = targets.genre()
+    return '/api/v1/films/', params
+
+
+# запросы по эндпойнтам: функция возвращает путь и параметры запроса
+REQUESTS: dict[str, Callable[[Targets], tuple[str, dict]]] = {
+    'film_detail': lambda targets: ('/api/v1/films/{0}'.format(targets.film()), {}),
+    'person_detail': lambda targets: ('/api/v1/persons/{0}'.format(targets.person()), {}),
+    'genre_detail': lambda targets: ('/api/v1/genres/{0}'.format(targets.genre()), {}),
+    'film_list': film_list,
+    'film_similar': lambda targets: ('/api/v1/films/', {'similar': targets.film()}),
+    'genre_list': lambda targets: ('/api/v1/genres/', {}),
+    'film_search': lambda targets: (
+        '/api/v1/films/search', {'query': targets.title_word(), 'page_size': LIST_PAGE_SIZE},
+    ),
+    'person_search': lambda targets: (
+        '/api/v1/persons/search', {'query': targets.name_word(), 'page_size': LIST_PAGE_SIZE},
+    ),
+    'filmography': lambda targets: ('/api/v1/persons/{0}/film/'.format(targets.person()), {}),
+}
+
+# смеси запросов: вес каждого эндпойнта
+MIXES: dict[str, dict[str, int]] = {
+    # просмотр каталога: карточки, списки, поиск и фильмографии
+    'browse': {
+        'film_detail': 30,
+        'person_detail': 8,
+        'genre_detail': 4,
+        'film_list': 18,
+        'film_similar': 6,
+        'genre_list': 4,
+        'film_search': 14,
+        'person_search': 6,
+        'filmography': 10,
+    },
+    # в основном поиск
+    'search': {'film_search': 55, 'person_search': 25, 'film_detail': 20},
+    # в основном карточки по UUID
+    'detail': {'film_detail': 60, 'person_detail': 20, 'filmography': 15, 'genre_detail': 5},
+    # в основном списки
+    'list': {'film_list': 60, 'film_similar': 25, 'genre_list': 15},
+}
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """Смесь запросов по имени или в виде «эндпойнт=вес,эндпойнт=вес».
+
+    Args:
+        value: Имя смеси из MIXES или веса эндпойнтов
+
+    Returns:
+        Вес каждого эндпойнта
+
+    Raises:
+        ValueError: Если смесь или эндпойнт неизвестны
+    """
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for item in value.split(','):
+        endpoint, _, weight = item.partition('=')
+        endpoint = endpoint.strip()
+        if endpoint not in REQUESTS:
+            raise ValueError('Неизвестная смесь или эндпойнт: {0}'.format(endpoint))
+        mix[endpoint] = int(weight or 1)
+    return mix
+
+
+@dataclass
+class EndpointStats:
+    """Результаты запросов к одному эндпойнту."""
+
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def observe(self, latency: float, status: Optional[int]) -> None:
+        """Учитывает ответ (или ошибку соединения).
+
+        Args:
+            latency: Время ответа (сек.)
+            status: Код ответа или None, если ответ не получен
+        """
+        self.latencies.append(latency)
+        if status is None or status >= 500:
+            self.errors += 1
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+def percentile(values: list[float], rank: float) -> float:
+    """Перцентиль (метод ближайшего ранга).
+
+    Args:
+        values: Отсортированные значения
+        rank: Перцентиль (от 0 до 100)
+
+    Returns:
+        Значение перцентиля
+    """
+    if not values:
+        return math.nan
+    index = max(0, math.ceil(rank / 100 * len(values)) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+async def wait_ready(base_url: str, timeout: float) -> None:
+    """Ждёт, пока сервер начнёт отвечать.
+
+    Args:
+        base_url: Адрес сервера
+        timeout: Максимальное время ожидания (сек.)
+
+    Raises:
+        TimeoutError: Если сервер не ответил за отведённое время
+    """
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get('{0}/api/v1/version'.format(base_url)) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError('Сервер не запустился за {0} с'.format(timeout))
+
+
+async def run_load(
+    base_url: str,
+    targets: Targets,
+    mix: dict[str, int],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    accept_encoding: str = BROWSER_ACCEPT_ENCODING,
+) -> dict[str, EndpointStats]:
+    """Нагружает сервер смесью запросов.
+
+    Args:
+        base_url: Адрес сервера
+        targets: Цели запросов
+        mix: Вес каждого эндпойнта
+        concurrency: Количество одновременных клиентов
+        duration: Длительность замера (сек.)
+        warmup: Длительность разогрева перед замером (сек.), его ответы не учитываются
+        accept_encoding: Значение заголовка Accept-Encoding запросов
+
+    Returns:
+        Результаты по эндпойнтам
+    """
+    endpoints = list(mix)
+    cum_weights = list(itertools.accumulate(mix[endpoint] for endpoint in endpoints))
+    stats = {endpoint: EndpointStats() for endpoint in endpoints}
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+
+    async def client(session: aiohttp.ClientSession) -> None:
+        while time.monotonic() < stop_at:
+            endpoint = targets.rng.choices(endpoints, cum_weights=cum_weights)[0]
+            path, params = REQUESTS[endpoint](targets)
+            started = time.monotonic()
+            status = None
+            try:
+                async with session.get(base_url + path, params=params) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                pass
+            finished = time.monotonic()
+            if started >= measure_from and finished <= stop_at:
+                stats[endpoint].observe(finished - started, status)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers={'Accept-Encoding': accept_encoding},
+        auto_decompress=False,
+    ) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    return stats
@@ -0,0 +1,805 @@
+# -*- coding: utf-8 -*-
+"""Заменители AsyncElasticsearch и Redis в памяти для нагрузочного теста.
+
+Заменители поддерживают ровно те вызовы и ту часть языка запросов ES, которые использует API,
+и отвечают с задержкой, имитирующей сеть и работу сервера (Latency). Неизвестный тип запроса
+ES вызывает NotImplementedError: тест не должен молча отвечать не то, что ответил бы ES.
+
+Заменители работают в процессе API, поэтому их работа входит в замеры. Чтобы она была
+небольшой, поиск выполняется по инвертированным индексам полей, которые строятся при первом
+запросе, а отсортированные списки документов кэшируются. Ответ ES проходит через JSON,
+как у настоящего клиента: разбор ответа - часть работы API.
+"""
+import asyncio
+import itertools
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+from elastic_transport import ApiResponseMeta, HttpHeaders, JsonSerializer, NodeConfig
+from elasticsearch import NotFoundError
+
+from src.loadtest.dataset import Dataset
+
+# размер страницы поиска ES по умолчанию
+DEFAULT_SEARCH_SIZE = 10
+TOKEN_PATTERN = re.compile(r'\w+')
+NODE = NodeConfig('http', 'fake-elasticsearch', 9200)
+
+
+class Latency:
+    """Задержка ответа: постоянная часть и случайный «хвост» (экспоненциальный)."""
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0):
+        """Инициализация задержки.
+
+        Args:
+            base: Постоянная часть задержки (сек.)
+            jitter: Среднее значение случайной части задержки (сек.)
+        """
+        self.base = base
+        self.jitter = jitter
+
+    async def wait(self) -> None:
+        """Ожидает в течение очередной задержки."""
+        delay = self.base
+        if self.jitter > 0:
+            delay += random.expovariate(1 / self.jitter)
+        # даже без задержки вызов уступает цикл событий, как настоящий сетевой вызов
+        await asyncio.sleep(delay)
+
+
+def tokens(value: Any) -> set[str]:
+    """Слова значения поля (в нижнем регистре).
+
+    Args:
+        value: Значение поля (строка или список строк)
+
+    Returns:
+        Множество слов
+    """
+    if value is None:
+        return set()
+    if isinstance(value, list):
+        return set().union(*(tokens(item) for item in value))
+    return set(TOKEN_PATTERN.findall(str(value).lower()))
+
+
+def field_values(doc: dict, field: str) -> list:
+    """Значения поля документа (поле-список раскрывается).
+
+    Args:
+        doc: Документ
+        field: Имя поля
+
+    Returns:
+        Список значений
+    """
+    value = doc.get(field)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def select_source(doc: dict, fields: Any) -> dict:
+    """Фильтрация _source по списку полей.
+
+    Args:
+        doc: Документ
+        fields: Список полей (None или True - все поля)
+
+    Returns:
+        Исходные данные для ответа
+    """
+    if fields is None or fields is True:
+        return doc
+    if isinstance(fields, str):
+        fields = [fields]
+    return {field: doc[field] for field in fields if field in doc}
+
+
+def not_found(index: str, doc_id: str) -> NotFoundError:
+    """Ошибка «документ не найден», как её возвращает клиент ES.
+
+    Args:
+        index: Имя индекса
+        doc_id: Идентификатор документа
+
+    Returns:
+        Ошибка NotFoundError
+    """
+    meta = ApiResponseMeta(404, '1.1', HttpHeaders(), 0.0, NODE)
+    body = {'_index': index, '_id': doc_id, 'found': False}
+    return NotFoundError('NotFoundError', meta, body)
+
+
+class FakeElasticsearch:
+    """AsyncElasticsearch в памяти: get, mget, search (с point in time), suggest и агрегации."""
+
+    def __init__(self, dataset: Dataset, latency: Latency):
+        """Инициализация заменителя.
+
+        Args:
+            dataset: Документы индексов
+            latency: Задержка ответа на каждый вызов
+        """
+        self.indexes = dataset.indexes()
+        self.documents = {name: list(docs.values()) for name, docs in self.indexes.items()}
+        self.latency = latency
+        self.serializer = JsonSerializer()
+        self.postings: dict[tuple[str, str], dict[Any, set[int]]] = {}
+        self.orders: dict[tuple[str, str, str], list[int]] = {}
+        self.pits: dict[str, str] = {}
+        self.pit_ids = itertools.count(1)
+
+    def options(self, **kwargs) -> 'FakeElasticsearch':
+        """Параметры запроса (request_timeout и т.п.) заменителю не нужны.
+
+        Args:
+            kwargs: Параметры клиента
+
+        Returns:
+            Тот же клиент
+        """
+        return self
+
+    async def ping(self, **kwargs) -> bool:
+        """Проверка доступности.
+
+        Args:
+            kwargs: Параметры запроса
+
+        Returns:
+            True
+        """
+        await self.latency.wait()
+        return True
+
+    async def close(self) -> None:
+        """Закрытие клиента (ничего не делает)."""
+
+    async def get(self, index: str, id: str, source_includes=None, **kwargs) -> dict:
+        """Документ по идентификатору.
+
+        Args:
+            index: Имя индекса
+            id: Идентификатор документа
+            source_includes: Возвращаемые поля
+            kwargs: Прочие параметры запроса
+
+        Returns:
+            Ответ ES
+
+        Raises:
+            NotFoundError: Если документа нет
+        """
+        await self.latency.wait()
+        doc = self.indexes[index].get(id)
+        if doc is None:
+            raise not_found(index, id)
+        return self._response({
+            '_index': index,
+            '_id': id,
+            'found': True,
+            '_source': select_source(doc, source_includes),
+        })
+
+    async def mget(self, index: str, ids: list[str], source_includes=None, **kwargs) -> dict:
+        """Несколько документов по идентификаторам.
+
+        Args:
+            index: Имя индекса
+            ids: Идентификаторы документов
+            source_includes: Возвращаемые поля
+            kwargs: Прочие параметры запроса
+
+        Returns:
+            Ответ ES
+        """
+        await self.latency.wait()
+        docs = []
+        for doc_id in ids:
+            doc = self.indexes[index].get(str(doc_id))
+            if doc is None:
+                docs.append({'_index': index, '_id': doc_id, 'found': False})
+            else:
+                docs.append({
+                    '_index': index,
+                    '_id': doc_id,
+                    'found': True,
+                    '_source': select_source(doc, source_includes),
+                })
+        return self._response({'docs': docs})
+
+    async def open_point_in_time(self, index: str, keep_alive: str, **kwargs) -> dict:
+        """Открывает point in time (снимок индекса для постраничного обхода).
+
+        Args:
+            index: Имя индекса
+            keep_alive: Время жизни point in time
+            kwargs: Прочие параметры запроса
+
+        Returns:
+            Ответ ES с идентификатором point in time
+        """
+        await self.latency.wait()
+        pit_id = 'pit-{0}'.format(next(self.pit_ids))
+        self.pits[pit_id] = index
+        return {'id': pit_id}
+
+    async def close_point_in_time(self, id: str, **kwargs) -> dict:
+        """Закрывает point in time.
+
+        Args:
+            id: Идентификатор point in time
+            kwargs: Прочие параметры запроса
+
+        Returns:
+            Ответ ES
+        """
+        await self.latency.wait()
+        self.pits.pop(id, None)
+        return {'succeeded': True, 'num_freed': 1}
+
+    async def search(self, index: Optional[str] = None, body: Optional[dict] = None, **kwargs):
+        """Поиск: запрос, сортировка, страницы (from/size, search_after), suggest и агрегации.
+
+        Args:
+            index: Имя индекса (не нужно при поиске по point in time)
+            body: Тело запроса
+            kwargs: Параметры запроса (как отдельные аргументы клиента)
+
+        Returns:
+            Ответ ES
+        """
+        await self.latency.wait()
+        params = {**(body or {}), **kwargs}
+        pit = params.get('pit')
+        if pit is not None:
+            index = self.pits[pit['id']]
+        documents = self.documents[index]
+        fields = params.get('_source', params.get('source'))
+
+        response: dict[str, Any] = {'took': 0, 'timed_out': False}
+        if pit is not None:
+            response['pit_id'] = pit['id']
+        if 'suggest' in params:
+            response['suggest'] = {
+                name: [self._suggest(index, suggestion, fields)]
+                for name, suggestion in params['suggest'].items()
+            }
+
+        scores = self._query(index, params.get('query'))
+        positions = self._sorted(index, scores, params.get('sort'))
+        if 'aggs' in params:
+            response['aggregations'] = {
+                name: self._aggregate(documents, positions, aggregation)
+                for name, aggregation in params['aggs'].items()
+            }
+
+        sort_fields = self._sort_fields(params.get('sort'))
+        search_after = params.get('search_after')
+        if search_after is not None:
+            positions = [
+                position for position in positions
+                if self._sort_values(documents[position], position, sort_fields) > search_after
+            ]
+        offset = params.get('from', 0)
+        size = params.get('size', DEFAULT_SEARCH_SIZE)
+        hits = []
+        for position in positions[offset:offset + size]:
+            doc = documents[position]
+            hit = {
+                '_index': index,
+                '_id': doc['uuid'],
+                '_score': scores.get(position) if scores is not None else 1.0,
+                '_source': select_source(doc, fields),
+            }
+            if sort_fields:
+                hit['sort'] = self._sort_values(doc, position, sort_fields)
+            hits.append(hit)
+        response['hits'] = {'hits': hits}
+        if params.get('profile'):
+            response['profile'] = {'shards': []}
+        return self._response(response)
+
+    def _response(self, body: dict) -> Any:
+        # ответ разбирается из JSON тем же сериализатором, что у клиента ES
+        return self.serializer.loads(self.serializer.dumps(body))
+
+    def _query(self, index: str, query: Optional[dict]) -> Optional[dict[int, float]]:
+        """Документы, подходящие под запрос, и их релевантность.
+
+        Args:
+            index: Имя индекса
+            query: Запрос ES (None - все документы)
+
+        Returns:
+            Релевантность по позиции документа или None, если подходят все документы
+        """
+        if query is None:
+            return None
+        (kind, clause), = query.items()
+        documents = self.documents[index]
+        if kind == 'match_all':
+            return None
+        if kind == 'match':
+            (field, text), = clause.items()
+            if isinstance(text, dict):
+                text = text['query']
+            query_tokens = tokens(text)
+            postings = self._postings(index, field)
+            matched: Counter = Counter()
+            for token in query_tokens:
+                matched.update(postings.get(token, ()))
+            return {position: count / len(query_tokens) for position, count in matched.items()}
+        if kind == 'term':
+            (field, value), = clause.items()
+            if isinstance(value, dict):
+                value = value['value']
+            return dict.fromkeys(self._terms(index, field).get(value, ()), 1.0)
+        if kind == 'range':
+            (field, bounds), = clause.items()
+            return {
+                position: 1.0 for position, doc in enumerate(documents)
+                if doc.get(field) is not None and in_range(doc[field], bounds)
+            }
+        if kind == 'bool':
+            return self._bool(index, clause)
+        raise NotImplementedError('Запрос {0} не поддерживается заменителем ES'.format(kind))
+
+    def _bool(self, index: str, clause: dict) -> Optional[dict[int, float]]:
+        result: Optional[dict[int, float]] = None
+        for occur in ('filter', 'must'):
+            for subquery in as_list(clause.get(occur)):
+                scores = self._query(index, subquery)
+                if scores is None:
+                    continue
+                if result is None:
+                    result = scores
+                else:
+                    result = {
+                        position: result[position] + (scores[position] if occur == 'must' else 0)
+                        for position in result.keys() & scores.keys()
+                    }
+        should = as_list(clause.get('should'))
+        if should:
+            union: dict[int, float] = defaultdict(float)
+            for subquery in should:
+                scores = self._query(index, subquery)
+                if scores is None:
+                    scores = dict.fromkeys(range(len(self.documents[index])), 1.0)
+                for position, score in scores.items():
+                    union[position] += score
+            if result is None:
+                result = dict(union)
+            else:
+                result = {
+                    position: score + union.get(position, 0)
+                    for position, score in result.items()
+                }
+        for subquery in as_list(clause.get('must_not')):
+            excluded = self._query(index, subquery)
+            if result is None:
+                result = dict.fromkeys(range(len(self.documents[index])), 1.0)
+            if excluded is None:
+                return {}
+            result = {
+                position: score
+                for position, score in result.items() if position not in excluded
+            }
+        return result
+
+    def _postings(self, index: str, field: str) -> dict[str, set[int]]:
+        """Инвертированный индекс поля: слово -> позиции документов (строится один раз).
+
+        Args:
+            index: Имя индекса
+            field: Имя поля
+
+        Returns:
+            Позиции документов по слову
+        """
+        key = (index, field)
+        if key not in self.postings:
+            postings = defaultdict(set)
+            for position, doc in enumerate(self.documents[index]):
+                for token in tokens(doc.get(field)):
+                    postings[token].add(position)
+            self.postings[key] = dict(postings)
+        return self.postings[key]
+
+    def _terms(self, index: str, field: str) -> dict[Any, set[int]]:
+        """Индекс точных значений поля: значение -> позиции документов (строится один раз).
+
+        Args:
+            index: Имя индекса
+            field: Имя поля
+
+        Returns:
+            Позиции документов по значению
+        """
+        key = (index, 'term:{0}'.format(field))
+        if key not in self.postings:
+            terms = defaultdict(set)
+            for position, doc in enumerate(self.documents[index]):
+                for value in field_values(doc, field):
+                    terms[value].add(position)
+            self.postings[key] = dict(terms)
+        return self.postings[key]
+
+    def _sorted(
+        self,
+        index: str,
+        scores: Optional[dict[int, float]],
+        sort: Optional[list],
+    ) -> list[int]:
+        """Позиции подходящих документов в порядке выдачи.
+
+        Args:
+            index: Имя индекса
+            scores: Релевантность подходящих документов (None - все документы)
+            sort: Сортировка ES (None - по релевантности)
+
+        Returns:
+            Позиции документов
+        """
+        sort_fields = self._sort_fields(sort)
+        if not sort_fields:
+            if scores is None:
+                return list(range(len(self.documents[index])))
+            return sorted(scores, key=lambda position: (-scores[position], position))
+        order = self._order(index, sort_fields)
+        if scores is None:
+            return order
+        return [position for position in order if position in scores]
+
+    def _order(self, index: str, sort_fields: tuple) -> list[int]:
+        key = (index, *sort_fields)
+        if key not in self.orders:
+            documents = self.documents[index]
+            order = list(range(len(documents)))
+            # сортировки применяются с последней: сортировка Python устойчивая
+            for field, direction in reversed(sort_fields):
+                if field == '_shard_doc':
+                    order.sort(reverse=direction == 'desc')
+                    continue
+                # документы без значения поля - в конце при любом направлении (missing: _last)
+                present = [pos for pos in order if documents[pos].get(field) is not None]
+                missing = [pos for pos in order if documents[pos].get(field) is None]
+                present.sort(
+                    key=lambda position: documents[position][field],
+                    reverse=direction == 'desc',
+                )
+                order = present + missing
+            self.orders[key] = order
+        return self.orders[key]
+
+    @staticmethod
+    def _sort_fields(sort: Optional[list]) -> tuple:
+        """Поля и направления сортировки.
+
+        Args:
+            sort: Сортировка ES
+
+        Returns:
+            Кортеж пар (поле, направление)
+        """
+        fields = []
+        for item in as_list(sort):
+            if isinstance(item, str):
+                fields.append((item, 'asc'))
+                continue
+            (field, options), = item.items()
+            direction = options if isinstance(options, str) else options.get('order', 'asc')
+            fields.append((field, direction))
+        return tuple(fields)
+
+    @staticmethod
+    def _sort_values(doc: dict, position: int, sort_fields: tuple) -> list:
+        return [
+            position if field == '_shard_doc' else doc.get(field)
+            for field, _ in sort_fields
+        ]
+
+    def _suggest(self, index: str, suggestion: dict, fields: Any) -> dict:
+        """Подсказки completion-поля по префиксу.
+
+        Args:
+            index: Имя индекса
+            suggestion: Описание подсказки ES (prefix и completion)
+            fields: Возвращаемые поля документа
+
+        Returns:
+            Результат подсказки ES
+        """
+        prefix = suggestion['prefix']
+        completion = suggestion['completion']
+        lowered = prefix.lower()
+        options = []
+        for doc in self.documents[index]:
+            suggest = doc.get(completion['field']) or {}
+            matched = [
+                text for text in suggest.get('input', []) if text.lower().startswith(lowered)
+            ]
+            if matched:
+                options.append((suggest.get('weight', 0), matched[0], doc))
+        options.sort(key=lambda option: -option[0])
+        return {
+            'text': prefix,
+            'offset': 0,
+            'length': len(prefix),
+            'options': [
+                {
+                    'text': text,
+                    '_index': index,
+                    '_id': doc['uuid'],
+                    '_score': float(weight),
+                    '_source': select_source(doc, fields),
+                }
+                for weight, text, doc in options[:completion.get('size', 5)]
+            ],
+        }
+
+    @staticmethod
+    def _aggregate(documents: list[dict], positions: list[int], aggregation: dict) -> dict:
+        """Агрегация terms или histogram.
+
+        Args:
+            documents: Документы индекса
+            positions: Позиции документов, подходящих под запрос
+            aggregation: Описание агрегации ES
+
+        Returns:
+            Результат агрегации ES
+        """
+        (kind, options), = aggregation.items()
+        field = options['field']
+        if kind == 'terms':
+            counts = Counter(
+                value
+                for position in positions
+                for value in field_values(documents[position], field)
+            )
+            return {
+                'buckets': [
+                    {'key': key, 'doc_count': count}
+                    for key, count in counts.most_common(options.get('size', 10))
+                ],
+            }
+        if kind == 'histogram':
+            interval = options['interval']
+            counts = Counter(
+                (value // interval) * interval
+                for position in positions for value in field_values(documents[position], field)
+            )
+            bounds = options.get('extended_bounds')
+            if bounds is not None:
+                key = (bounds['min'] // interval) * interval
+                while key <= bounds['max']:
+                    counts.setdefault(key, 0)
+                    key += interval
+            min_count = options.get('min_doc_count', 1)
+            return {
+                'buckets': [
+                    {'key': float(key), 'doc_count': count}
+                    for key, count in sorted(counts.items()) if count >= min_count
+                ],
+            }
+        raise NotImplementedError('Агрегация {0} не поддерживается заменителем ES'.format(kind))
+
+
+def as_list(value: Any) -> list:
+    """Одиночное значение или список значений - как список.
+
+    Args:
+        value: Значение, список или None
+
+    Returns:
+        Список значений
+    """
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def in_range(value: Any, bounds: dict) -> bool:
+    """Проверка значения на попадание в границы запроса range.
+
+    Args:
+        value: Значение поля
+        bounds: Границы (gt, gte, lt, lte)
+
+    Returns:
+        True, если значение в границах
+    """
+    checks = {
+        'gt': lambda bound: value > bound,
+        'gte': lambda bound: value >= bound,
+        'lt': lambda bound: value < bound,
+        'lte': lambda bound: value <= bound,
+    }
+    return all(checks[name](bound) for name, bound in bounds.items() if name in checks)
+
+
+class FakeConnectionPool:
+    """Пул соединений заменителя Redis (нужен только для заполнения пула при старте API)."""
+
+    def __init__(self, max_connections: int):
+        """Инициализация пула.
+
+        Args:
+            max_connections: Размер пула
+        """
+        self.max_connections = max_connections
+
+    async def get_connection(self, command_name: str, *keys, **options) -> object:
+        """Соединение из пула.
+
+        Args:
+            command_name: Команда, для которой нужно соединение
+            keys: Ключи команды
+            options: Параметры команды
+
+        Returns:
+            Соединение (заглушка)
+        """
+        return object()
+
+    async def release(self, connection: object) -> None:
+        """Возврат соединения в пул.
+
+        Args:
+            connection: Соединение
+        """
+
+
+class FakeRedis:
+    """Redis в памяти: get, mget, set (со сроком жизни), delete и pipeline."""
+
+    def __init__(self, latency: Latency, max_connections: int = 10):
+        """Инициализация заменителя.
+
+        Args:
+            latency: Задержка ответа на каждую команду (и на pipeline целиком)
+            max_connections: Размер пула соединений
+        """
+        self.latency = latency
+        self.connection_pool = FakeConnectionPool(max_connections)
+        self.values: dict[str, tuple[bytes, Optional[float]]] = {}
+
+    async def ping(self) -> bool:
+        """Проверка доступности.
+
+        Returns:
+            True
+        """
+        await self.latency.wait()
+        return True
+
+    async def close(self) -> None:
+        """Закрытие клиента (ничего не делает)."""
+
+    async def get(self, name: str) -> Optional[bytes]:
+        """Значение ключа.
+
+        Args:
+            name: Ключ
+
+        Returns:
+            Значение или None
+        """
+        await self.latency.wait()
+        return self._get(name)
+
+    async def mget(self, *names: str) -> list[Optional[bytes]]:
+        """Значения нескольких ключей.
+
+        Args:
+            names: Ключи
+
+        Returns:
+            Значения (None для отсутствующих ключей)
+        """
+        await self.latency.wait()
+        return [self._get(name) for name in names]
+
+    async def set(self, name: str, value: Any, ex: Optional[float] = None, **kwargs) -> bool:
+        """Записывает значение ключа.
+
+        Args:
+            name: Ключ
+            value: Значение
+            ex: Время жизни ключа (сек.)
+            kwargs: Прочие параметры команды
+
+        Returns:
+            True
+        """
+        await self.latency.wait()
+        self._set(name, value, ex)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        """Удаляет ключи.
+
+        Args:
+            names: Ключи
+
+        Returns:
+            Количество удалённых ключей
+        """
+        await self.latency.wait()
+        return sum(self.values.pop(name, None) is not None for name in names)
+
+    def pipeline(self, transaction: bool = True) -> 'FakePipeline':
+        """Пакет команд, отправляемых за один вызов.
+
+        Args:
+            transaction: Выполнять пакет в транзакции (для заменителя не важно)
+
+        Returns:
+            Пакет команд
+        """
+        return FakePipeline(self)
+
+    def _get(self, name: str) -> Optional[bytes]:
+        entry = self.values.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.values[name]
+            return None
+        return value
+
+    def _set(self, name: str, value: Any, ex: Optional[float]) -> None:
+        if isinstance(value, str):
+            value = value.encode()
+        elif not isinstance(value, bytes):
+            value = str(value).encode()
+        expires_at = time.monotonic() + ex if ex else None
+        self.values[name] = (value, expires_at)
+
+
+class FakePipeline:
+    """Пакет команд заменителя Redis."""
+
+    def __init__(self, redis: FakeRedis):
+        """Инициализация пакета.
+
+        Args:
+            redis: Заменитель Redis
+        """
+        self.redis = redis
+        self.commands: list[tuple] = []
+
+    def set(self, name: str, value: Any, ex: Optional[float] = None, **kwargs) -> 'FakePipeline':
+        """Добавляет в пакет запись значения ключа.
+
+        Args:
+            name: Ключ
+            value: Значение
+            ex: Время жизни ключа (сек.)
+            kwargs: Прочие параметры команды
+
+        Returns:
+            Тот же пакет
+        """
+        self.commands.append((name, value, ex))
+        return self
+
+    async def execute(self) -> list[bool]:
+        """Выполняет пакет.
+
+        Returns:
+            Результаты команд
+        """
+        await self.redis.latency.wait()
+        for name, value, ex in self.commands:
+            self.redis._set(name, value, ex)
+        results = [True] * len(self.commands)
+        self.commands = []
+        return results
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Запуск API (src.main:app) на заменителях Elasticsearch и Redis в памяти.
+
+Сервер запускается в отдельном процессе, чтобы генератор нагрузки не отнимал у него время
+цикла событий. Настройки uvicorn те же, что у рабочего процесса в production (src.run):
+uvloop, httptools, без журнала запросов.
+"""
+import uvicorn
+
+from src.db import elastic, redis
+from src.loadtest.dataset import build_dataset
+from src.loadtest.fakes import FakeElasticsearch, FakeRedis, Latency
+from src.main import app
+
+
+def serve(
+    port: int,
+    dump_path: str,
+    es_latency: Latency,
+    redis_latency: Latency,
+) -> None:
+    """Запускает API на заменителях (выполняется в процессе сервера до его завершения).
+
+    Args:
+        port: Порт сервера (на 127.0.0.1)
+        dump_path: Путь к дампу PostgreSQL, из которого собираются документы ES
+        es_latency: Задержка ответов Elasticsearch
+        redis_latency: Задержка ответов Redis
+    """
+    dataset = build_dataset(dump_path)
+    # lifespan приложения создаёт клиентов через эти функции
+    elastic.create_elastic = lambda: FakeElasticsearch(dataset, es_latency)
+    redis.create_redis = lambda: FakeRedis(redis_latency)
+
+    uvicorn.run(
+        app,
+        host='127.0.0.1',
+        port=port,
+        loop='uvloop',
+        http='httptools',
+        log_level='warning',
+        access_log=False,
+    )
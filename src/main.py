@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from http import HTTPStatus
 
 import uvicorn
-from elasticsearch import AsyncElasticsearch
-from fastapi import FastAPI
-from fastapi.responses import ORJSONResponse
-from redis.asyncio import Redis
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
+from redis.exceptions import RedisError
 
-from src.api.v1 import films, genres, persons
+from src.api.v1 import admin, films, genres, persons
 from src.core import config
-from src.db import elastic, redis
+from src.core.admission import AdmissionMiddleware
+from src.core.deadline import DeadlineExceeded, DeadlineMiddleware
+from src.core.loop_monitor import LoopMonitor
+from src.core.metrics import MetricsMiddleware, render_metrics
+from src.core.profiler import ProfilerMiddleware
+from src.core.timing import ServerTimingMiddleware
+from src.db import catalog, elastic, redis, replica
 
 VERSION_DETAILS_TEMPLATE = """
 movies backend %s;
@@ -32,19 +39,52 @@ async def lifespan(app: FastAPI):
     # Подключаемся к базам при старте сервера
     # Подключиться можем при работающем event-loop
     # Поэтому логика подключения происходит в асинхронной функции
-    redis.redis = Redis(host=config.settings.REDIS_HOST, port=config.settings.REDIS_PORT)
-    elastic.es = AsyncElasticsearch(
-        hosts=[
-            {
-                'scheme': 'http',
-                'host': config.settings.ES_HOST,
-                'port': config.settings.ES_PORT,
-            },
-        ],
-    )
+    redis.redis = redis.create_redis()
+    elastic.es = elastic.create_elastic()
+
+    # Заполняем пулы соединений заранее, чтобы первые запросы не ждали подключения
+    try:
+        redis_opened, es_opened = await asyncio.gather(
+            redis.warm_up_redis(redis.redis, config.settings.REDIS_POOL_PREFILL),
+            elastic.warm_up_elastic(elastic.es, config.settings.ES_POOL_PREFILL),
+        )
+    except Exception as err:
+        # недоступность баз при старте покажет /api/v1/ready
+        logger.warning('Пулы соединений не заполнены: %s', err)
+    else:
+        logger.info('Открыто соединений: Redis - %s, Elasticsearch - %s', redis_opened, es_opened)
+
+    # Копия каталога фильмов в памяти: загружаем при старте и обновляем в фоне
+    catalog_refresh = None
+    if config.settings.CATALOG_INDEX_ENABLED:
+        catalog.catalog = catalog.CatalogIndex(elastic.es)
+        catalog_refresh = asyncio.create_task(
+            catalog.catalog.run(config.settings.CATALOG_REFRESH_INTERVAL),
+        )
+
+    # Задержка цикла событий (и поиск блокирующего его кода в отладочном режиме)
+    loop_monitor = None
+    if config.settings.LOOP_MONITOR_ENABLED:
+        block_threshold = None
+        if config.settings.LOOP_BLOCK_DETECTION:
+            block_threshold = config.settings.LOOP_BLOCK_THRESHOLD
+        loop_monitor = asyncio.create_task(
+            LoopMonitor(config.settings.LOOP_MONITOR_INTERVAL, block_threshold).run(),
+        )
+
+    # Локальная реплика для чтения (снимок индексов от ETL), общая для процессов через mmap
+    if config.settings.REPLICA_PATH:
+        replica.replica = replica.ReadReplica(config.settings.REPLICA_PATH)
 
     yield
 
+    if catalog_refresh is not None:
+        catalog_refresh.cancel()
+    if loop_monitor is not None:
+        loop_monitor.cancel()
+    if replica.replica is not None:
+        replica.replica.close()
+
     # Отключаемся от баз при выключении сервера
     await redis.redis.close()
     await elastic.es.close()
@@ -64,6 +104,64 @@ app = FastAPI(
 )
 
 
+# Контроль допуска выполняется внутри крайнего срока запроса: ожидание в очереди входит в него
+app.add_middleware(AdmissionMiddleware)
+
+
+# Крайний срок обработки запроса. Middleware - чистое ASGI (не BaseHTTPMiddleware),
+# чтобы запрос целиком выполнялся в одной задаче (это нужно профилировщику запроса)
+app.add_middleware(DeadlineMiddleware)
+
+
+# Метрики - внешний слой: в длительность запроса входят ожидание допуска и отказы 503
+if config.settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Замеры Server-Timing собираются для всего запроса, включая вложенные middleware
+app.add_middleware(ServerTimingMiddleware)
+# Профилирование запроса по заголовку X-Profile (только с токеном служебного API)
+app.add_middleware(ProfilerMiddleware)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded) -> ORJSONResponse:
+    # Ответ не успели подготовить к крайнему сроку - клиент его уже не ждёт
+    logger.warning('%s: %s', request.url.path, exc)
+    return ORJSONResponse(
+        status_code=HTTPStatus.GATEWAY_TIMEOUT,
+        content={'detail': 'request deadline exceeded'},
+    )
+
+
+@app.get('/api/v1/ready')
+async def ready():
+    # Готовность к приёму запросов: базы доступны; загрузка пулов соединений - для балансировщика
+    redis_ok, es_ok = await asyncio.gather(_redis_ping(), elastic.es.ping())
+    return ORJSONResponse(
+        status_code=HTTPStatus.OK if redis_ok and es_ok else HTTPStatus.SERVICE_UNAVAILABLE,
+        content={
+            'ready': redis_ok and es_ok,
+            'redis': {'available': redis_ok, **redis.redis_pool_stats(redis.redis)},
+            'elastic': {'available': es_ok, **elastic.elastic_pool_stats()},
+        },
+    )
+
+
+async def _redis_ping() -> bool:
+    try:
+        return await redis.redis.ping()
+    except RedisError:
+        return False
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    # Метрики в формате Prometheus (по всем рабочим процессам при PROMETHEUS_MULTIPROC_DIR)
+    if not config.settings.METRICS_ENABLED:
+        return ORJSONResponse(status_code=HTTPStatus.NOT_FOUND, content={'detail': 'Not Found'})
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
+
+
 @app.get('/api/v1/version')
 async def version():
     return {
@@ -78,14 +176,16 @@ async def version():
 app.include_router(films.router, prefix='/api/v1/films', tags=['films'])
 app.include_router(persons.router, prefix='/api/v1/persons', tags=['persons'])
 app.include_router(genres.router, prefix='/api/v1/genres', tags=['genres'])
+app.include_router(admin.router, prefix='/api/v1/admin', tags=['admin'])
 
 if __name__ == '__main__':
     # Приложение может запускаться командой
     # `uvicorn main:app --host 0.0.0.0 --port 8000`
     # но чтобы не терять возможность использовать дебагер,
     # запустим uvicorn сервер через python
+    # В production используется несколько рабочих процессов: python -m src.run
     uvicorn.run(
         'src.main:app',
-        host='0.0.0.0',
-        port=8000,
+        host=config.settings.API_HOST,
+        port=config.settings.API_PORT,
     )
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Модуль, где определены модели данных служебного (admin) API."""
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class SlowQuery(BaseModel):
+    """Модель медленного запроса к Elasticsearch."""
+
+    method: str
+    index: str
+    duration_ms: float
+    started_at: datetime
+    params: dict[str, Any]
+    error: Optional[str] = None
+    profile: Optional[dict[str, Any]] = None
+
+
+class RequestProfile(BaseModel):
+    """Модель профиля отдельного запроса API."""
+
+    method: str
+    path: str
+    started_at: datetime
+    duration_ms: float
+    samples: int
+    stacks: str
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Декодирование документов из Elasticsearch в модели.
+
+Из ES запрашиваются только поля модели, чтобы клиент не разбирал лишний JSON, а pydantic
+не проверял лишние поля (поля для поиска, подсказок, похожих фильмов и т.п.) - это и даёт
+основной выигрыш. Каждый документ по-прежнему полностью проверяется моделью: вместо
+Model(**source) в цикле список документов разбирается одним вызовом TypeAdapter, что
+экономит только обход списка в Python.
+
+Замер выигрыша по эндпойнтам: python -m src.benchmark
+"""
+from typing import Any, Iterable
+
+from pydantic import BaseModel, TypeAdapter
+
+from src.core.timing import MODEL, span
+
+
+def source_fields(model: type[BaseModel]) -> list[str]:
+    """Список полей модели для фильтрации _source в запросах к ES.
+
+    Args:
+        model: Класс модели
+
+    Returns:
+        Имена полей модели
+    """
+    return list(model.model_fields)
+
+
+def decode_hits(adapter: TypeAdapter, hits: Iterable[dict], key: str = '_source') -> list[Any]:
+    """Разбирает документы из ответа ES в список моделей одним вызовом.
+
+    Args:
+        adapter: TypeAdapter списка моделей
+        hits: Документы из ответа ES (hits, docs или options подсказок)
+        key: Ключ с исходными данными документа
+
+    Returns:
+        Список моделей
+    """
+    with span(MODEL):
+        return adapter.validate_python([hit[key] for hit in hits])
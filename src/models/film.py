@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """Модуль, где определена модель кинопроизведения."""
-from typing import Optional
+from typing import Optional, Union
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -25,7 +25,8 @@ class Film(BaseModel):
 
     uuid: UUID
     title: str
-    imdb_rating: float
+    # у фильма может не быть рейтинга: такие фильмы ES и копия каталога отдают последними
+    imdb_rating: Optional[float] = None
 
 
 class FilmDetailed(Film):
@@ -38,3 +39,18 @@ class FilmDetailed(Film):
     writers_names: Optional[list[str]]
     actors: Optional[list[Participant]]
     writers: Optional[list[Participant]]
+
+
+class FacetBucket(BaseModel):
+    """Модель корзины агрегации: значение признака и количество фильмов с ним."""
+
+    key: Union[str, float]
+    count: int
+
+
+class FilmFacets(BaseModel):
+    """Модель фасетов каталога фильмов (для виджетов каталога)."""
+
+    genres: list[FacetBucket]
+    types: list[FacetBucket]
+    imdb_rating: list[FacetBucket]
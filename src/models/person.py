@@ -11,13 +11,19 @@ class Filmography(BaseModel):
 
     uuid: UUID
     title: str
-    imdb_rating: float
+    # рейтинга может не быть, как и у фильма (Film.imdb_rating)
+    imdb_rating: Optional[float] = None
 
 
 class PortfolioFilm(BaseModel):
-    """Модель данных фильма в портфолио персоны."""
+    """Модель данных фильма в портфолио персоны.
+
+    Название и рейтинг фильма денормализованы в индекс persons ETL-процессом.
+    """
 
     uuid: UUID
+    title: Optional[str] = None
+    imdb_rating: Optional[float] = None
     roles: list[str]
 
 
@@ -29,6 +35,13 @@ class Person(BaseModel):
     films: Optional[list[PortfolioFilm]]
 
 
+class PersonSuggestion(BaseModel):
+    """Модель подсказки (автодополнения) по имени персоны."""
+
+    uuid: UUID
+    full_name: str
+
+
 class PersonSearchQuery(BaseModel):
     """Модель параметров запроса при поиске персон."""
 
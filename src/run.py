@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Запуск API в production: несколько рабочих процессов под управлением gunicorn.
+
+- рабочие процессы - uvicorn с циклом событий uvloop и HTTP-парсером httptools;
+- приложение импортируется в главном процессе до запуска рабочих (preload), после чего
+  объекты переводятся в постоянное поколение сборщика мусора (gc.freeze): сборщик
+  не трогает их заголовки, и страницы памяти остаются общими с главным процессом (copy-on-write);
+- соединения с Redis и Elasticsearch создаются в lifespan, то есть в каждом рабочем
+  процессе свои (после fork), а не общие унаследованные;
+- рабочий процесс перезапускается после WORKER_MAX_REQUESTS запросов (с разбросом,
+  чтобы процессы не перезапускались одновременно) и завершается, дообслужив текущие запросы;
+- метрики рабочих процессов пишутся в каталог PROMETHEUS_MULTIPROC_DIR (задан в образе),
+  который главный процесс очищает при старте, до импорта приложения.
+
+Запуск:
+    python -m src.run
+"""
+import gc
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.util import import_app
+from prometheus_client import multiprocess
+from uvicorn.workers import UvicornWorker
+
+from src.core import config
+
+
+class Worker(UvicornWorker):
+    """Рабочий процесс uvicorn с uvloop и httptools."""
+
+    CONFIG_KWARGS = {'loop': 'uvloop', 'http': 'httptools'}
+
+
+def pre_fork(server, worker) -> None:
+    """Хук gunicorn: вызывается в главном процессе перед запуском рабочего.
+
+    Args:
+        server: Главный процесс gunicorn
+        worker: Запускаемый рабочий процесс
+    """
+    # объекты, созданные до fork, больше не просматриваются сборщиком мусора
+    gc.freeze()
+
+
+def child_exit(server, worker) -> None:
+    """Хук gunicorn: вызывается в главном процессе после завершения рабочего.
+
+    Args:
+        server: Главный процесс gunicorn
+        worker: Завершившийся рабочий процесс
+    """
+    # значения gauge завершившегося процесса больше не учитываются в /metrics
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def reset_metrics_dir() -> None:
+    """Очищает каталог метрик от файлов процессов предыдущего запуска.
+
+    Вызывается в главном процессе до импорта приложения и запуска рабочих процессов:
+    иначе /metrics суммировал бы значения давно завершившихся процессов.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+
+class Application(BaseApplication):
+    """Приложение gunicorn с настройками из конфигурации API."""
+
+    def __init__(self, app_uri: str, options: dict):
+        """Инициализация приложения.
+
+        Args:
+            app_uri: Путь к ASGI-приложению
+            options: Настройки gunicorn
+        """
+        self.app_uri = app_uri
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        """Передаёт настройки в gunicorn."""
+        for key, setting in self.options.items():
+            self.cfg.set(key, setting)
+
+    def load(self):
+        """Импортирует приложение (в главном процессе, т.к. включён preload).
+
+        Returns:
+            ASGI-приложение
+        """
+        app = import_app(self.app_uri)
+        # мусор, оставшийся после импорта, собираем до fork, а не в каждом рабочем процессе
+        gc.collect()
+        return app
+
+
+def get_options() -> dict:
+    """Настройки gunicorn из конфигурации API.
+
+    Returns:
+        Настройки gunicorn
+    """
+    workers = config.settings.WORKERS or multiprocessing.cpu_count()
+    return {
+        'bind': '{0}:{1}'.format(config.settings.API_HOST, config.settings.API_PORT),
+        'workers': workers,
+        'worker_class': 'src.run.Worker',
+        'preload_app': True,
+        'max_requests': config.settings.WORKER_MAX_REQUESTS,
+        'max_requests_jitter': config.settings.WORKER_MAX_REQUESTS_JITTER,
+        'graceful_timeout': config.settings.WORKER_GRACEFUL_TIMEOUT,
+        'keepalive': config.settings.WORKER_KEEPALIVE,
+        'pre_fork': pre_fork,
+        'child_exit': child_exit,
+    }
+
+
+if __name__ == '__main__':
+    reset_metrics_dir()
+    Application('src.main:app', get_options()).run()
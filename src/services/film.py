@@ -4,7 +4,7 @@ import asyncio
 import logging
 from functools import lru_cache
 from pprint import pformat
-from typing import Optional
+from typing import AsyncIterator, Optional
 from uuid import UUID
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
@@ -13,14 +13,25 @@ from pydantic import TypeAdapter
 from redis.asyncio import Redis
 
 from src.core import config
-from src.db.elastic import get_elastic
+from src.core.metrics import cache_lookup, observe_cache
+from src.core.timing import CACHE_READ, CACHE_WRITE, MODEL, span, timed
+from src.db.catalog import CatalogIndex, get_catalog
+from src.db.elastic import elastic_request, get_elastic, iterate_index
 from src.db.redis import generate_cache_key, get_redis
-from src.models.film import Film, FilmDetailed, FilmGenre
+from src.db.replica import ReadReplica, get_replica
+from src.models.decoding import decode_hits, source_fields
+from src.models.film import FacetBucket, Film, FilmDetailed, FilmFacets
 
 FILM_ADAPTER = TypeAdapter(list[Film])
+# поля документа movies, которые запрашиваются у ES для моделей
+FILM_FIELDS = source_fields(Film)
+FILM_DETAILED_FIELDS = source_fields(FilmDetailed)
+# ключ кэша фасетов; ETL удаляет его после переиндексации фильмов
+FACETS_CACHE_KEY = 'movies::facets'
+# шаг гистограммы рейтинга
+RATING_HISTOGRAM_INTERVAL = 1
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 
 # FilmService содержит бизнес-логику по работе с фильмами.
@@ -31,15 +42,22 @@ class FilmService:  # создатели линтера wemake python styleguide
     # А как мы знаем, "явное лучше неявного". WPS306 Found class without a base class
     """Сервис для получения детальной информации по фильму из es."""
 
-    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
+    def __init__(
+        self,
+        redis: Redis,
+        elastic: AsyncElasticsearch,
+        replica: Optional[ReadReplica] = None,
+    ):
         """Инициализация сервиса.
 
         Parameters:
             redis: экземпляр redis'а
             elastic: экземпляр elastic'а
+            replica: локальная реплика для чтения (если включена)
         """
         self.redis = redis
         self.elastic = elastic
+        self.replica = replica
 
     # 1.1. получение фильма по uuid
     # get_by_uuid возвращает объект фильма. Он опционален, так как фильм может отсутствовать в базе
@@ -52,6 +70,12 @@ class FilmService:  # создатели линтера wemake python styleguide
         Returns:
             детальная информация о фильме
         """
+        # Локальная реплика отвечает без сетевых запросов, Redis и ES - запасные источники
+        if self.replica is not None:
+            doc = self.replica.get('movies', film_uuid)
+            if doc is not None:
+                return FilmDetailed(**doc)
+
         # Пытаемся получить данные из кеша, потому что оно работает быстрее
         film = await self._get_film_from_cache(film_uuid)
         if not film:
@@ -68,13 +92,21 @@ class FilmService:  # создатели линтера wemake python styleguide
     # 2.1. получение фильма из эластика по id
     async def _get_film_from_elastic(self, film_id: str) -> Optional[FilmDetailed]:
         try:
-            doc = await self.elastic.get(index='movies', id=film_id)
+            doc = await elastic_request(
+                self.elastic,
+                'get',
+                index='movies',
+                id=film_id,
+                source_includes=FILM_DETAILED_FIELDS,
+            )
         except NotFoundError:
             return None
-        logger.debug(pformat(doc['_source']))
-        return FilmDetailed(**doc['_source'])
+        logger.debug('Фильм из Elasticsearch: %s', doc['_source'])
+        with span(MODEL):
+            return FilmDetailed(**doc['_source'])
 
     # 3.1. получение фильма из кэша по uuid
+    @cache_lookup('movies')
     async def _get_film_from_cache(self, film_uuid: str) -> Optional[FilmDetailed]:
         # Пытаемся получить данные о фильме из кеша, используя команду get
         # https://redis.io/commands/get/
@@ -89,12 +121,13 @@ class FilmService:  # создатели линтера wemake python styleguide
         if not film_data:
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(cache_key))
+        logger.info('Взято из кэша по ключу: %s', cache_key)
         # pydantic предоставляет удобное API для создания объекта моделей из json
         return FilmDetailed.model_validate_json(film_data)  # возвращаем
     # десериализованный объект Film
 
     # 4.1. сохранение фильма в кэш по id:
+    @timed(CACHE_WRITE)
     async def _put_film_to_cache(self, film: Film):
         # Сохраняем данные о фильме, используя команду set
         # Выставляем время жизни кеша — CACHE_TIME_LIFE
@@ -117,16 +150,34 @@ class FilmService:  # создатели линтера wemake python styleguide
 class MultipleFilmsService:
     """Сервис для получения информации о нескольких фильмов из elastic."""
 
-    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
+    def __init__(
+        self,
+        redis: Redis,
+        elastic: AsyncElasticsearch,
+        catalog: Optional[CatalogIndex] = None,
+    ):
         """
         Инициализация сервиса.
 
         Parameters:
             redis: экземпляр redis'а
             elastic: экземпляр elastic'а
+            catalog: копия каталога фильмов в памяти (если включена)
         """
         self.redis = redis
         self.elastic = elastic
+        self.catalog = catalog
+
+    def serves_from_catalog(self, similar: Optional[UUID] = None) -> bool:
+        """Проверяет, отдаётся ли страница списка из копии каталога в памяти.
+
+        Parameters:
+            similar: uuid фильма, похожие на который запрошены
+
+        Returns:
+            True, если страница собирается без сетевых запросов
+        """
+        return similar is None and self.catalog is not None and self.catalog.ready
 
     # 1.2. получение страницы списка фильмов отсортированных по популярности
     async def get_multiple_films(
@@ -149,38 +200,21 @@ class MultipleFilmsService:
         Returns:
             список фильмов (краткий вариант объекта)
         """
-        # ключ для кэша задается в формате ключ::значение::ключ::значение и т.д.
-        params_to_key = {
-            'desc': str(int(desc_order)),
-            'page_size': str(page_size),
-            'page_number': str(page_number),
-            'genre': genre,
-            'similar': similar,
-        }
-        # создаём ключ для кэша
-        cache_key = generate_cache_key('movies', params_to_key)
-
-        # запрашиваем инфо в кэше по ключу
-        films_page = await self._get_multiple_films_from_cache(cache_key)
-        if not films_page:
-            # если в кэше нет значения по этому ключу, делаем запрос в es
-            films_page = await self._get_multiple_films_from_elastic(
-                desc_order=desc_order,
-                page_size=page_size,
-                page_number=page_number,
-                genre=genre,
-                similar=similar,
-            )
-            # Кэшируем результат (пустой результат тоже)
-            await self._put_multiple_films_to_cache(
-                cache_key=cache_key,
-                films=films_page,
-            )
-
-            if not films_page:
-                return None
-
-        return films_page
+        # страницы по жанру и рейтингу отдаются из копии каталога в памяти без сетевых запросов
+        if self.serves_from_catalog(similar):
+            films_page = self.catalog.snapshot.page(desc_order, page_size, page_number, genre)
+            return films_page or None
+
+        # страницы не кэшируются здесь: готовый ответ целиком хранит кэш ответов API
+        # (src.services.response_cache), а большие страницы отдаются потоком без кэша
+        films_page = await self._get_multiple_films_from_elastic(
+            desc_order=desc_order,
+            page_size=page_size,
+            page_number=page_number,
+            genre=genre,
+            similar=similar,
+        )
+        return films_page or None
 
     async def search_films(
         self,
@@ -222,6 +256,67 @@ class MultipleFilmsService:
 
         return films_page
 
+    async def suggest_films(self, prefix: str, size: int) -> list[Film]:
+        """Подсказки (автодополнение) фильмов по началу названия.
+
+        Parameters:
+            prefix: начало названия фильма (или начало любого слова названия)
+            size: количество подсказок
+
+        Returns:
+            список фильмов в порядке убывания популярности
+        """
+        params_to_key = {
+            'suggest': prefix,
+            'size': str(size),
+        }
+        cache_key = generate_cache_key('movies', params_to_key)
+
+        films = await self._get_multiple_films_from_cache(cache_key)
+        if films is None:
+            films = await self._suggest_films_in_elastic(prefix, size)
+            await self._put_multiple_films_to_cache(cache_key, films)
+
+        return films
+
+    async def get_facets(self) -> FilmFacets:
+        """Фасеты каталога: количество фильмов по жанрам, типам и рейтингу.
+
+        Returns:
+            фасеты каталога фильмов
+        """
+        with span(CACHE_READ):
+            facets_data = await self.redis.get(FACETS_CACHE_KEY)
+            observe_cache('movies', 'get_facets', bool(facets_data))
+            if facets_data:
+                logger.info('Взято из кэша по ключу: %s', FACETS_CACHE_KEY)
+                return FilmFacets.model_validate_json(facets_data)
+
+        facets = await self._get_facets_from_elastic()
+        with span(CACHE_WRITE):
+            await self.redis.set(
+                FACETS_CACHE_KEY,
+                facets.model_dump_json(),
+                config.settings.CACHE_TIME_LIFE,
+            )
+        return facets
+
+    async def export_films(self) -> AsyncIterator[str]:
+        """Выгрузка всех фильмов из elastic в формате NDJSON.
+
+        Фильмы читаются постранично, поэтому память не зависит от размера каталога.
+
+        Yields:
+            строка NDJSON с детальной информацией об одном фильме
+        """
+        async for source in iterate_index(
+            self.elastic,
+            'movies',
+            config.settings.ES_EXPORT_PAGE_SIZE,
+            source=FILM_DETAILED_FIELDS,
+        ):
+            yield '{0}\n'.format(FilmDetailed(**source).model_dump_json())
+
     # 2.2. получение из es страницы списка фильмов отсортированных по популярности
     async def _get_multiple_films_from_elastic(
         self,
@@ -231,6 +326,14 @@ class MultipleFilmsService:
         genre: Optional[UUID] = None,
         similar: Optional[UUID] = None,
     ):
+        # похожие фильмы заранее рассчитаны ETL и хранятся в документе фильма
+        if similar is not None:
+            return await self._get_similar_films_from_elastic(
+                film_uuid=similar,
+                page_size=page_size,
+                page_number=page_number,
+            )
+
         if desc_order:
             order_name = 'desc'
             order_mode = 'max'
@@ -239,74 +342,30 @@ class MultipleFilmsService:
             order_mode = 'min'
 
         search_body = {
+            '_source': FILM_FIELDS,
             'size': page_size,
             'from': (page_number - 1) * page_size,
             'sort': [
                 {'imdb_rating': {'order': order_name, 'mode': order_mode}},
             ],
+            # общее количество не нужно: без него ES досрочно завершает запрос
+            # по индексу, отсортированному по рейтингу
+            'track_total_hits': False,
         }
 
-        # TODO: D.R.Y. код вспомогательных запросов (по жанру и по жанрам похожего фильма):
-        # находим название указанного жанра:
+        # фильтруем по UUID жанра напрямую: ETL индексирует UUID жанров в документе фильма
         if genre is not None:
-            genre_search_body = {
-                'query': {
-                    'bool': {
-                        'filter': [
-                            {'term': {'uuid': genre}},
-                        ],
-                    },
-                },
-            }
-            # TODO: body - устаревший параметр, заменить отдельными параметрами
-            genre_response = await self.elastic.search(index='genres', body=genre_search_body)
-            genres = []
-            for hit in genre_response['hits']['hits']:
-                genres.append(FilmGenre(**hit['_source']))
-            genre_names = [genre.name for genre in genres]
-            logger.debug('genres: %s' % (', '.join(genre_names)))
             search_body['query'] = {
                 'bool': {
                     'filter': [
-                        {'terms': {'genre': genre_names}},
+                        {'term': {'genre_uuids': str(genre)}},
                     ],
                 },
             }
 
-        # находим названия жанров, фильма указанного как похожий
-        if similar is not None:
-            similar_search_body = {
-                'query': {
-                    'bool': {
-                        'filter': [
-                            {'term': {'uuid': genre}},
-                        ],
-                    },
-                },
-            }
-            similar_response = await self.elastic.search(index='movies', body=similar_search_body)
-            similar_films = []
-            for similar_hit in similar_response['hits']['hits']:
-                similar_films.append(FilmDetailed(**similar_hit['_source']))
-            genre_names = [similar_film.genre for similar_film in similar_films]
-            if genre_names:
-                genre_names = genre_names[0]
-            logger.debug('genres: %s' % (', '.join(genre_names)))
-            search_body['query'] = {
-                'bool': {
-                    'filter': [
-                        {'terms': {'genre': genre_names}},
-                    ],
-                },
-            }
-
-        response = await self.elastic.search(index='movies', body=search_body)
-
-        multiple_films = []
-        for film_hit in response['hits']['hits']:
-            multiple_films.append(Film(**film_hit['_source']))
+        response = await elastic_request(self.elastic, 'search', index='movies', body=search_body)
 
-        return multiple_films
+        return decode_hits(FILM_ADAPTER, response['hits']['hits'])
 
     # 2.3 Полнотекстовый поиск по фильмам:
     async def _fulltext_search_films_in_elastic(
@@ -315,28 +374,115 @@ class MultipleFilmsService:
         page_number: int,
         page_size: int,
     ):
-        search_results = await self.elastic.search(
+        search_results = await elastic_request(
+            self.elastic,
+            'search',
             index='movies',
             body={
+                '_source': FILM_FIELDS,
                 'query': {'match': {'title': query}},
                 'from': (page_number - 1) * page_size,
                 'size': page_size,
             },
         )
         logger.debug(search_results)
-        return [Film(**hit['_source']) for hit in search_results['hits']['hits']]
+        return decode_hits(FILM_ADAPTER, search_results['hits']['hits'])
+
+    # 2.4. получение из es страницы похожих фильмов (в порядке убывания похожести)
+    async def _get_similar_films_from_elastic(
+        self,
+        film_uuid: UUID,
+        page_size: int,
+        page_number: int,
+    ) -> list[Film]:
+        try:
+            doc = await elastic_request(
+                self.elastic,
+                'get',
+                index='movies',
+                id=str(film_uuid),
+                source_includes=['similar'],
+            )
+        except NotFoundError:
+            return []
+
+        offset = (page_number - 1) * page_size
+        page_ids = doc['_source'].get('similar', [])[offset:offset + page_size]
+        if not page_ids:
+            return []
+
+        response = await elastic_request(
+            self.elastic,
+            'mget',
+            index='movies',
+            ids=page_ids,
+            source_includes=FILM_FIELDS,
+        )
+        return decode_hits(FILM_ADAPTER, [doc for doc in response['docs'] if doc['found']])
+
+    # 2.5. подсказки по названию фильма из completion-поля title_suggest
+    async def _suggest_films_in_elastic(self, prefix: str, size: int) -> list[Film]:
+        response = await elastic_request(
+            self.elastic,
+            'search',
+            index='movies',
+            source=FILM_FIELDS,
+            suggest={
+                'films': {
+                    'prefix': prefix,
+                    'completion': {
+                        'field': 'title_suggest',
+                        'size': size,
+                    },
+                },
+            },
+        )
+        options = response['suggest']['films'][0]['options']
+        return decode_hits(FILM_ADAPTER, options)
+
+    # 2.6. агрегации по фильмам (с кэшем запросов на шардах ES)
+    async def _get_facets_from_elastic(self) -> FilmFacets:
+        response = await elastic_request(
+            self.elastic,
+            'search',
+            index='movies',
+            size=0,
+            request_cache=True,
+            aggs={
+                'genres': {'terms': {'field': 'genre', 'size': 100}},
+                'types': {'terms': {'field': 'type', 'size': 10}},
+                'imdb_rating': {
+                    'histogram': {
+                        'field': 'imdb_rating',
+                        'interval': RATING_HISTOGRAM_INTERVAL,
+                        'min_doc_count': 0,
+                        'extended_bounds': {'min': 0, 'max': 10},
+                    },
+                },
+            },
+        )
+        aggregations = response['aggregations']
+        return FilmFacets(**{
+            name: [
+                FacetBucket(key=bucket['key'], count=bucket['doc_count'])
+                for bucket in aggregations[name]['buckets']
+            ]
+            for name in ('genres', 'types', 'imdb_rating')
+        })
 
     # 3.2. получение страницы списка фильмов отсортированных по популярности из кэша
+    @cache_lookup('movies')
     async def _get_multiple_films_from_cache(self, cache_key: str):
         films_data = await self.redis.get(cache_key)
         if not films_data:
-            logging.info('Не найдено в кэш')
+            logger.info('Не найдено в кэш')
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(cache_key))
+        logger.info('Взято из кэша по ключу: %s', cache_key)
         return FILM_ADAPTER.validate_json(films_data)
 
     # 4.2. сохранение страницы фильмов (отсортированных по популярности) в кэш:
+    @timed(CACHE_WRITE)
     async def _put_multiple_films_to_cache(self, cache_key: str, films):
         await self.redis.set(
             cache_key,
@@ -353,34 +499,38 @@ class MultipleFilmsService:
 def get_film_service(
     redis: Redis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    replica: Optional[ReadReplica] = Depends(get_replica),
 ) -> FilmService:
     """Провайдер сервиса для получения детальной информации о фильме.
 
     Parameters:
         redis: экземпляр redis
         elastic: экземпляр elastic
+        replica: локальная реплика для чтения (если включена)
 
     Returns:
         сервис для получения информации о фильме
     """
-    return FilmService(redis, elastic)
+    return FilmService(redis, elastic, replica)
 
 
 @lru_cache()
 def get_multiple_films_service(
     redis: Redis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    catalog: Optional[CatalogIndex] = Depends(get_catalog),
 ) -> MultipleFilmsService:
     """Провайдер сервиса для получения детальной информации о нескольких фильмах.
 
     Parameters:
         redis: экземпляр redis
         elastic: экземпляр elastic
+        catalog: копия каталога фильмов в памяти (если включена)
 
     Returns:
         сервис для получения информации о нескольких фильмах
     """
-    return MultipleFilmsService(redis, elastic)
+    return MultipleFilmsService(redis, elastic, catalog)
 
 
 # Блок кода ниже нужен только для отладки сервисов:
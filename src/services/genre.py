@@ -3,7 +3,7 @@
 
 import logging
 from functools import lru_cache
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from fastapi import Depends
@@ -11,8 +11,12 @@ from pydantic import TypeAdapter
 from redis.asyncio import Redis
 
 from src.core import config
-from src.db.elastic import get_elastic
+from src.core.metrics import cache_lookup
+from src.core.timing import CACHE_WRITE, MODEL, span, timed
+from src.db.elastic import elastic_request, get_elastic, iterate_index
 from src.db.redis import generate_cache_key, get_redis
+from src.db.replica import ReadReplica, get_replica
+from src.models.decoding import decode_hits
 from src.models.genre import Genre
 
 GENRES_SEARCH_ADAPTER = TypeAdapter(list[Genre])
@@ -32,15 +36,18 @@ class GenreService(object):
         self,
         redis: Redis,
         elastic: AsyncElasticsearch,
+        replica: Optional[ReadReplica] = None,
     ):
         """Конструктор GenreService.
 
         Args:
             redis: Ссылка на объект Redis.
             elastic: Ссылка на объект Elasticsearch.
+            replica: Локальная реплика для чтения (если включена).
         """
         self.redis = redis
         self.elastic = elastic
+        self.replica = replica
 
     async def get_by_id(self, genre_id: str) -> Optional[Genre]:
         """Возвращает Жанр по его UUID из ES.
@@ -51,6 +58,12 @@ class GenreService(object):
         Returns:
             Информация о жанре или None, если не найден
         """
+        # Локальная реплика отвечает без сетевых запросов, Redis и ES - запасные источники
+        if self.replica is not None:
+            doc = self.replica.get('genres', genre_id)
+            if doc is not None:
+                return Genre(**doc)
+
         # Пытаемся получить данные из кеша, потому что оно работает быстрее
         genre = await self._get_genre_from_cache(genre_id)
         if not genre:
@@ -81,6 +94,19 @@ class GenreService(object):
 
         return genres
 
+    async def export_genres(self) -> AsyncIterator[str]:
+        """Выгрузка всех жанров в формате NDJSON.
+
+        Yields:
+            Строка NDJSON с информацией об одном жанре
+        """
+        async for source in iterate_index(
+            self.elastic,
+            'genres',
+            config.settings.ES_EXPORT_PAGE_SIZE,
+        ):
+            yield '{0}\n'.format(Genre(**source).model_dump_json())
+
     async def _get_genre_from_elastic(self, genre_id: str) -> Optional[Genre]:
         """Получает данные о жанре из Elasticsearch, используя команду get.
 
@@ -91,11 +117,13 @@ class GenreService(object):
             Жанр или None, если жанр не найден
         """
         try:
-            doc = await self.elastic.get(index='genres', id=genre_id)
+            doc = await elastic_request(self.elastic, 'get', index='genres', id=genre_id)
         except NotFoundError:
             return None
-        return Genre(**doc['_source'])
+        with span(MODEL):
+            return Genre(**doc['_source'])
 
+    @cache_lookup('genres')
     async def _get_genre_from_cache(self, genre_id: str) -> Optional[Genre]:
         """Получает данные о жанре из кеша Redis, используя команду get.
 
@@ -114,9 +142,10 @@ class GenreService(object):
         if not serialized_genre_data:
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(cache_key))
+        logger.info('Взято из кэша по ключу: %s', cache_key)
         return Genre.model_validate_json(serialized_genre_data)
 
+    @timed(CACHE_WRITE)
     async def _put_genre_to_cache(self, genre: Genre):
         """Сохраняет данные о жанре в Redis, используя команду set.
 
@@ -135,6 +164,7 @@ class GenreService(object):
             config.settings.CACHE_TIME_LIFE,
         )
 
+    @cache_lookup('genres')
     async def _all_genres_from_cache(self) -> Optional[list[Genre]]:
         """Получает данные о всех жанрах из кеша Redis.
 
@@ -145,7 +175,7 @@ class GenreService(object):
         if not serialized_genres_data:
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(GENRES_CACHE_KEY))
+        logger.info('Взято из кэша по ключу: %s', GENRES_CACHE_KEY)
         return GENRES_SEARCH_ADAPTER.validate_json(serialized_genres_data)
 
     async def _all_genres_from_elastic(self) -> Optional[list[Genre]]:
@@ -163,17 +193,18 @@ class GenreService(object):
         }
 
         try:
-            response = await self.elastic.search(index='genres', body=query)
+            response = await elastic_request(self.elastic, 'search', index='genres', body=query)
         except NotFoundError:
             return None
 
         hits = response.get('hits', {}).get('hits', [])
-        genres = [Genre(**hit['_source']) for hit in hits]
+        genres = decode_hits(GENRES_SEARCH_ADAPTER, hits)
 
-        logging.debug(genres)
+        logger.debug('Жанры из Elasticsearch: %s', genres)
 
         return genres
 
+    @timed(CACHE_WRITE)
     async def _put_all_genres_to_cache(self, genres: list[Genre]):
         """Сохраняет данные о всех жанрах в Redis, используя команду set.
 
@@ -194,14 +225,16 @@ class GenreService(object):
 def get_genre_service(
     redis: Redis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    replica: Optional[ReadReplica] = Depends(get_replica),
 ) -> GenreService:
     """Провайдер для GenreService.
 
     Args:
         redis: DI - соединение с БД Redis.
         elastic: DI - соединение с БД ElasticSearch.
+        replica: DI - локальная реплика для чтения (если включена).
 
     Returns:
         GenreService: Сервис для работы с жанрами (singlton)
     """
-    return GenreService(redis, elastic)
+    return GenreService(redis, elastic, replica)
@@ -5,7 +5,7 @@
 """
 import logging
 from functools import lru_cache
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from fastapi import Depends
@@ -13,12 +13,20 @@ from pydantic import TypeAdapter
 from redis.asyncio import Redis
 
 from src.core import config
-from src.db.elastic import get_elastic
+from src.core.metrics import cache_lookup, observe_cache
+from src.core.timing import CACHE_READ, CACHE_WRITE, MODEL, span, timed
+from src.db.elastic import elastic_request, get_elastic, iterate_index
 from src.db.redis import generate_cache_key, get_redis
-from src.models.person import Person
+from src.db.replica import ReadReplica, get_replica
+from src.models.decoding import decode_hits, source_fields
+from src.models.person import Person, PersonSuggestion
 
 PERSONS_SEARCH_ADAPTER = TypeAdapter(list[Person])
+PERSONS_SUGGEST_ADAPTER = TypeAdapter(list[PersonSuggestion])
 PERSONS_CACHE_KEY = 'persons::all'
+# поля документа persons, которые запрашиваются у ES для моделей
+PERSON_FIELDS = source_fields(Person)
+PERSON_SUGGESTION_FIELDS = source_fields(PersonSuggestion)
 
 logger = logging.getLogger(__name__)
 
@@ -35,15 +43,18 @@ class PersonService:
         self,
         redis: Redis,
         elastic: AsyncElasticsearch,
+        replica: Optional[ReadReplica] = None,
     ):
         """Конструктор PersonService.
 
         Args:
             redis: Ссылка на объект Redis.
             elastic: Ссылка на объект Elasticsearch.
+            replica: Локальная реплика для чтения (если включена).
         """
         self.redis = redis
         self.elastic = elastic
+        self.replica = replica
 
     async def search_person(
         self,
@@ -74,15 +85,18 @@ class PersonService:
         persons = await self._person_search_from_cache(cache_key)
         if not persons:
             # Если данных нет в кеше, то ищем его в Elasticsearch
-            search_results = await self.elastic.search(
+            search_results = await elastic_request(
+                self.elastic,
+                'search',
                 index='persons',
                 body={
+                    '_source': PERSON_FIELDS,
                     'query': {'match': {'full_name': query}},
                     'from': (page_number - 1) * page_size,
                     'size': page_size,
                 },
             )
-            persons = [Person(**hit['_source']) for hit in search_results['hits']['hits']]
+            persons = decode_hits(PERSONS_SEARCH_ADAPTER, search_results['hits']['hits'])
             # Сохраняем поиск по персонажу в кеш (даже если поиск не дал результата)
             await self._put_person_search_to_cache(cache_key, persons)
 
@@ -92,6 +106,54 @@ class PersonService:
 
         return persons
 
+    async def suggest_persons(self, prefix: str, size: int) -> list[PersonSuggestion]:
+        """Подсказки (автодополнение) персон по началу имени или фамилии.
+
+        Args:
+            prefix: Начало имени (или любого слова имени) персоны.
+            size: Количество подсказок.
+
+        Returns:
+            Список подсказок, персоны с большим количеством фильмов - первыми
+        """
+        params_to_key = {
+            'suggest': prefix,
+            'size': str(size),
+        }
+        cache_key = generate_cache_key('persons', params_to_key)
+
+        with span(CACHE_READ):
+            serialized_suggestions = await self.redis.get(cache_key)
+            observe_cache('persons', 'suggest_persons', bool(serialized_suggestions))
+            if serialized_suggestions:
+                return PERSONS_SUGGEST_ADAPTER.validate_json(serialized_suggestions)
+
+        response = await elastic_request(
+            self.elastic,
+            'search',
+            index='persons',
+            source=PERSON_SUGGESTION_FIELDS,
+            suggest={
+                'persons': {
+                    'prefix': prefix,
+                    'completion': {
+                        'field': 'full_name_suggest',
+                        'size': size,
+                    },
+                },
+            },
+        )
+        options = response['suggest']['persons'][0]['options']
+        suggestions = decode_hits(PERSONS_SUGGEST_ADAPTER, options)
+
+        with span(CACHE_WRITE):
+            await self.redis.set(
+                cache_key,
+                PERSONS_SUGGEST_ADAPTER.dump_json(suggestions),
+                config.settings.CACHE_TIME_LIFE,
+            )
+        return suggestions
+
     async def get_by_id(self, person_id: str) -> Optional[Person]:
         """Получить детальную информацию о персоне по его UUID.
 
@@ -101,6 +163,12 @@ class PersonService:
         Returns:
             Десериализованный объект Person или None
         """
+        # Локальная реплика отвечает без сетевых запросов, Redis и ES - запасные источники
+        if self.replica is not None:
+            doc = self.replica.get('persons', person_id)
+            if doc is not None:
+                return Person(**doc)
+
         # Пытаемся получить данные из кеша, потому что оно работает быстрее
         person = await self._person_from_cache(person_id)
         if not person:
@@ -131,13 +199,38 @@ class PersonService:
 
         return persons
 
+    async def export_persons(self) -> AsyncIterator[str]:
+        """Выгрузка всех персон в формате NDJSON.
+
+        Персоны читаются из Elasticsearch постранично и не кэшируются,
+        поэтому память не зависит от количества персон.
+
+        Yields:
+            Строка NDJSON с информацией об одной персоне
+        """
+        async for source in iterate_index(
+            self.elastic,
+            'persons',
+            config.settings.ES_EXPORT_PAGE_SIZE,
+            source=PERSON_FIELDS,
+        ):
+            yield '{0}\n'.format(Person(**source).model_dump_json())
+
     async def _get_person_from_elastic(self, person_id: str) -> Optional[Person]:
         try:
-            doc = await self.elastic.get(index='persons', id=person_id)
+            doc = await elastic_request(
+                self.elastic,
+                'get',
+                index='persons',
+                id=person_id,
+                source_includes=PERSON_FIELDS,
+            )
         except NotFoundError:
             return None
-        return Person(**doc['_source'])
+        with span(MODEL):
+            return Person(**doc['_source'])
 
+    @cache_lookup('persons')
     async def _person_from_cache(self, person_id: str) -> Optional[Person]:
         """Получить информацию о персоне из кэша Redis.
 
@@ -159,10 +252,11 @@ class PersonService:
         if not person_data:
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(cache_key))
+        logger.info('Взято из кэша по ключу: %s', cache_key)
         # pydantic предоставляет удобное API для создания объекта моделей из json
         return Person.model_validate_json(person_data)
 
+    @timed(CACHE_WRITE)
     async def _put_person_to_cache(self, person: Person):
         """
         Сохраняет данные о персоне, используя команду set.
@@ -179,6 +273,7 @@ class PersonService:
 
         await self.redis.set(cache_key, person.model_dump_json(), config.settings.CACHE_TIME_LIFE)
 
+    @cache_lookup('persons')
     async def _person_search_from_cache(self, cache_key: str) -> list[Person] | None:
         """
         Ищет информацию в кеше Redis.
@@ -194,10 +289,11 @@ class PersonService:
         if not serialized_search_person_data:
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(cache_key))
+        logger.info('Взято из кэша по ключу: %s', cache_key)
         # pydantic предоставляет удобное API для создания объекта моделей из json
         return PERSONS_SEARCH_ADAPTER.validate_json(serialized_search_person_data)
 
+    @timed(CACHE_WRITE)
     async def _put_person_search_to_cache(self, cache_key: str, persons: list[Person]):
         """Сохраняет результат поиска, используя команду set.
 
@@ -211,6 +307,7 @@ class PersonService:
             config.settings.CACHE_TIME_LIFE,
         )
 
+    @cache_lookup('persons')
     async def _all_persons_from_cache(self) -> Optional[list[Person]]:
         """Получает данные о всех жанрах из кеша Redis.
 
@@ -221,7 +318,7 @@ class PersonService:
         if not serialized_genres_data:
             return None
 
-        logging.info('Взято из кэша по ключу: {0}'.format(PERSONS_CACHE_KEY))
+        logger.info('Взято из кэша по ключу: %s', PERSONS_CACHE_KEY)
         return PERSONS_SEARCH_ADAPTER.validate_json(serialized_genres_data)
 
     async def _all_persons_from_elastic(self) -> Optional[list[Person]]:
@@ -231,6 +328,7 @@ class PersonService:
             Список персон или None.
         """
         query = {
+            '_source': PERSON_FIELDS,
             'query': {
                 'match_all': {},
             },
@@ -239,17 +337,18 @@ class PersonService:
         }
 
         try:
-            response = await self.elastic.search(index='persons', body=query)
+            response = await elastic_request(self.elastic, 'search', index='persons', body=query)
         except NotFoundError:
             return None
 
         hits = response.get('hits', {}).get('hits', [])
-        persons = [Person(**hit['_source']) for hit in hits]
+        persons = decode_hits(PERSONS_SEARCH_ADAPTER, hits)
 
-        logging.debug(persons)
+        logger.debug('Персоны из Elasticsearch: %s', persons)
 
         return persons
 
+    @timed(CACHE_WRITE)
     async def _put_all_persons_to_cache(self, persons: list[Person]):
         """Сохраняет данные о всех персоналиях в Redis, используя команду set.
 
@@ -270,14 +369,16 @@ class PersonService:
 def get_person_service(
     redis: Redis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    replica: Optional[ReadReplica] = Depends(get_replica),
 ) -> PersonService:
     """Провайдер для PersonService.
 
     Args:
         redis: DI - соединение с БД Redis.
         elastic: DI - соединение с БД ElasticSearch.
+        replica: DI - локальная реплика для чтения (если включена).
 
     Returns:
         PersonService: Если объект был ранее создан, то вернется он же (singleton).
     """
-    return PersonService(redis, elastic)
+    return PersonService(redis, elastic, replica)
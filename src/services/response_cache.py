@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""Кэш готовых ответов API, сжатых заранее.
+
+Тело ответа сжимается один раз - при записи в кэш - сразу в brotli, zstd и gzip; каждый
+вариант хранится в Redis под своим ключом. На запрос отдаётся вариант, подходящий под
+заголовок Accept-Encoding, с Content-Encoding, поэтому nginx передаёт его без повторного
+сжатия. Небольшие тела (меньше RESPONSE_COMPRESSION_MIN_SIZE), как и все тела при
+RESPONSE_COMPRESSION_ENABLED=False, хранятся только без сжатия. Ключи ответов по индексу
+удаляет ETL после его переиндексации (postgres_to_es/cache.py).
+
+Рядом с вариантами хранится хэш тела (ETag): на запрос с актуальным If-None-Match
+отдаётся 304, и тело ответа не читается из Redis и не формируется. Для карточек (фильм,
+персона, жанр) в кэше хранится только хэш: тело каждый раз собирается из документа,
+но на условный запрос 304 отдаётся без чтения документа и формирования тела.
+"""
+import asyncio
+import gzip
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+import brotli
+import zstandard
+from fastapi import Depends, Response
+from redis.asyncio import Redis
+
+from src.core import config
+from src.core.etag import (
+    IDENTITY,
+    JSON_MEDIA_TYPE,
+    cache_headers,
+    content_hash,
+    etag_matches,
+    not_modified,
+)
+from src.core.metrics import observe_cache
+from src.core.timing import CACHE_READ, CACHE_WRITE, span
+from src.db.redis import get_redis
+
+RESPONSE_CACHE_PREFIX = 'response'
+# ключ хэша тела (ETag) рядом с вариантами ответа
+ETAG_KEY = 'etag'
+# сжатие выполняется один раз на время жизни кэша, поэтому уровни сжатия максимальные
+COMPRESSORS = {
+    'br': lambda body: brotli.compress(body, quality=11),
+    'zstd': lambda body: zstandard.ZstdCompressor(level=19).compress(body),
+    'gzip': lambda body: gzip.compress(body, compresslevel=9),
+}
+# при одинаковом q клиенту отдаётся вариант, который раньше в этом списке
+ENCODING_PREFERENCE = ('br', 'zstd', 'gzip')
+
+
+def parse_accept_encoding(header: Optional[str]) -> dict[str, float]:
+    """Разбирает заголовок Accept-Encoding.
+
+    Args:
+        header: Значение заголовка (например, «gzip, br;q=0.9»)
+
+    Returns:
+        Допустимые кодировки и их вес q
+    """
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header: Optional[str]) -> str:
+    """Выбирает сжатие ответа по заголовку Accept-Encoding.
+
+    Args:
+        header: Значение заголовка Accept-Encoding
+
+    Returns:
+        Кодировка из COMPRESSORS или identity (без сжатия)
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_quality = IDENTITY, 0.0
+    for coding in ENCODING_PREFERENCE:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress_variants(body: bytes) -> dict[str, bytes]:
+    """Тело ответа без сжатия и во всех поддерживаемых сжатиях.
+
+    Args:
+        body: Тело ответа
+
+    Returns:
+        Варианты тела по кодировке
+    """
+    variants = {IDENTITY: body}
+    enabled = config.settings.RESPONSE_COMPRESSION_ENABLED
+    if enabled and len(body) >= config.settings.RESPONSE_COMPRESSION_MIN_SIZE:
+        for coding, compress in COMPRESSORS.items():
+            variants[coding] = compress(body)
+    return variants
+
+
+def make_response(body: bytes, coding: str, digest: str) -> Response:
+    """Ответ с телом в заданной кодировке.
+
+    Args:
+        body: Тело ответа (уже сжатое, если coding не identity)
+        coding: Кодировка тела
+        digest: Хэш тела без сжатия (для ETag)
+
+    Returns:
+        Ответ API
+    """
+    headers = cache_headers(digest, coding)
+    if coding != IDENTITY:
+        headers['Content-Encoding'] = coding
+    return Response(body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def parse_etag_entry(entry: bytes) -> tuple[str, list[str]]:
+    """Разбирает запись о хэше тела из кэша.
+
+    Args:
+        entry: Запись «хэш кодировка,кодировка»
+
+    Returns:
+        Хэш тела и кодировки, в которых хранится тело
+    """
+    digest, _, codings = entry.decode().partition(' ')
+    return digest, codings.split(',')
+
+
+class ResponseCache:
+    """Кэш сжатых ответов API в Redis."""
+
+    def __init__(self, redis: Redis):
+        """Инициализация кэша.
+
+        Args:
+            redis: Соединение с БД Redis
+        """
+        self.redis = redis
+
+    async def get_or_build(
+        self,
+        cache_key: str,
+        accept_encoding: Optional[str],
+        build: Callable[[], Awaitable[Optional[bytes]]],
+        if_none_match: Optional[str] = None,
+    ) -> Optional[Response]:
+        """Отдаёт ответ из кэша или формирует, сжимает и кэширует его.
+
+        Args:
+            cache_key: Ключ ответа (без кодировки)
+            accept_encoding: Значение заголовка Accept-Encoding запроса
+            build: Формирует тело ответа (JSON) или возвращает None, если данных нет
+            if_none_match: Значение заголовка If-None-Match запроса
+
+        Returns:
+            Ответ в подходящей клиенту кодировке (или 304) либо None, если данных нет
+        """
+        coding = choose_encoding(accept_encoding)
+        if not config.settings.RESPONSE_COMPRESSION_ENABLED:
+            # без сжатия в кэше есть только вариант identity
+            coding = IDENTITY
+
+        if if_none_match:
+            # условный запрос: сначала сверяем только хэш, тело читаем, если оно изменилось
+            with span(CACHE_READ):
+                entry = await self.redis.get(self._key(ETAG_KEY, cache_key))
+            if entry:
+                digest, codings = parse_etag_entry(entry)
+                if etag_matches(if_none_match, digest):
+                    return not_modified(digest, coding if coding in codings else IDENTITY)
+
+        # вариант без сжатия нужен, если тело было слишком маленьким для сжатия
+        with span(CACHE_READ):
+            cached, identity, entry = await self.redis.mget(
+                self._key(coding, cache_key),
+                self._key(IDENTITY, cache_key),
+                self._key(ETAG_KEY, cache_key),
+            )
+        observe_cache(RESPONSE_CACHE_PREFIX, 'get_or_build', bool(entry and (cached or identity)))
+        if entry:
+            digest, _ = parse_etag_entry(entry)
+            if cached:
+                return make_response(cached, coding, digest)
+            if identity:
+                return make_response(identity, IDENTITY, digest)
+
+        body = await build()
+        if body is None:
+            return None
+        # сжатие с максимальными уровнями - в рабочем потоке, чтобы не задерживать цикл событий
+        with span(CACHE_WRITE):
+            variants = await asyncio.to_thread(compress_variants, body)
+            digest = content_hash(body)
+            pipeline = self.redis.pipeline(transaction=False)
+            for variant_coding, variant in variants.items():
+                pipeline.set(
+                    self._key(variant_coding, cache_key),
+                    variant,
+                    config.settings.CACHE_TIME_LIFE,
+                )
+            pipeline.set(
+                self._key(ETAG_KEY, cache_key),
+                '{0} {1}'.format(digest, ','.join(variants)),
+                config.settings.CACHE_TIME_LIFE,
+            )
+            await pipeline.execute()
+
+        if etag_matches(if_none_match, digest):
+            return not_modified(digest, coding if coding in variants else IDENTITY)
+        if coding in variants:
+            return make_response(variants[coding], coding, digest)
+        return make_response(body, IDENTITY, digest)
+
+    async def conditional_detail(
+        self,
+        cache_key: str,
+        build: Callable[[], Awaitable[Optional[bytes]]],
+        if_none_match: Optional[str] = None,
+    ) -> Optional[Response]:
+        """Ответ карточки с ETag: хэш тела хранится в кэше, само тело - нет.
+
+        Args:
+            cache_key: Ключ карточки (индекс и UUID документа)
+            build: Формирует тело ответа (JSON) или возвращает None, если документа нет
+            if_none_match: Значение заголовка If-None-Match запроса
+
+        Returns:
+            Ответ с телом (или 304) либо None, если документа нет
+        """
+        etag_key = self._key(ETAG_KEY, cache_key)
+        if if_none_match:
+            with span(CACHE_READ):
+                entry = await self.redis.get(etag_key)
+            if entry:
+                digest, _ = parse_etag_entry(entry)
+                if etag_matches(if_none_match, digest):
+                    return not_modified(digest)
+
+        body = await build()
+        if body is None:
+            return None
+        digest = content_hash(body)
+        with span(CACHE_WRITE):
+            await self.redis.set(
+                etag_key,
+                '{0} {1}'.format(digest, IDENTITY),
+                config.settings.CACHE_TIME_LIFE,
+            )
+        if etag_matches(if_none_match, digest):
+            return not_modified(digest)
+        return make_response(body, IDENTITY, digest)
+
+    def _key(self, coding: str, cache_key: str) -> str:
+        return '{0}::{1}::{2}'.format(RESPONSE_CACHE_PREFIX, coding, cache_key)
+
+
+@lru_cache()
+def get_response_cache(redis: Redis = Depends(get_redis)) -> ResponseCache:
+    """Провайдер для ResponseCache.
+
+    Args:
+        redis: DI - соединение с БД Redis.
+
+    Returns:
+        ResponseCache: Кэш сжатых ответов (singlton)
+    """
+    return ResponseCache(redis)